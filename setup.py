@@ -4,11 +4,16 @@ setup(
     name='WinningEdge',
     version='1.0.0',
     packages=find_packages(),  # Automatically discover and include all packages
+    package_data={'winedge': ['data/*.bin', 'data/*.npz']},
     install_requires=[
         # List your package dependencies here
         'numpy',
         'pandas'
     ],
+    extras_require={
+        # Parquet datasets of the dataset module
+        'parquet': ['pyarrow'],
+    },
     
         
     
@@ -1,8 +1,14 @@
 from .card import Card
 from .evaluator import Evaluator
+from .hand import Hand, Board
 from .lookup import LookupTable
+from .equity import equity
+from .preflop import preflop_equity
+from .ranges import Range, range_equity
+from .hand_history import parse_hand_histories
 from .adding_rank import add_rank_to_pkl_df
 from .straight_risk_eval import straight_eval_to_df
 from .bluff_eval import bluff_eval
-from .add_aggression_column import check_aggression
-from .add_fold_column import check_fold
\ No newline at end of file
+from .add_aggression_column import check_aggression, add_aggression_columns
+from .add_fold_column import check_fold, add_fold_columns
+from .features import run_pipeline
\ No newline at end of file
@@ -0,0 +1,215 @@
+"""
+actions Module
+
+The actions module packs the street actions of many games into flat arrays,
+so features over the actions (aggression, folds, bets) are computed for the
+whole dataset with a few NumPy operations instead of a loop per game.
+
+Every action is one uint8 holding its code (ACTIONS), its actor and its
+street, and one int32 amount in cents. The actions of game i are the slice
+offsets[i]:offsets[i + 1], street after street. The actor is the player who
+took the action, the small blind (0) or the big blind (1): heads up the small
+blind acts first preflop and the big blind acts first on the flop, turn and
+river.
+
+Classes:
+--------------
+- PackedActions:
+    The packed actions of a list of games, with vectorized accessors.
+
+Functions:
+--------------
+- pack_actions(df):
+    Packs the action columns of a poker_dataframe.
+
+- pack_table(table):
+    Packs the action columns of a dataset.to_table table without a Python
+    loop over the games.
+"""
+
+import numpy as np
+
+# action letters of process_street_actions in the order of their codes
+ACTIONS = 'fkcbr'
+ACTION_CODE = {action: i for i, action in enumerate(ACTIONS)}
+FOLD, CHECK, CALL, BET, RAISE = range(len(ACTIONS))
+STREETS = ('preflop', 'flop', 'turn', 'river')
+# poker_dataframe action column of each street
+ACTION_COLUMNS = ('Preflop actions', 'Flop actions', 'Turn actions', 'River actions')
+
+# layout of the packed uint8: code in bits 0-2, actor in bit 3, street in bits 4-5
+CODE_MASK = 0x7
+ACTOR_SHIFT = 3
+STREET_SHIFT = 4
+
+
+class PackedActions:
+    """
+    Street actions of n_games games as flat arrays.
+
+    Attributes:
+        - packed: uint8 array with the code, actor and street of every action.
+        - cents: int32 array with the amount of every action in cents.
+        - offsets: int64 array of shape (n_games + 1,), the actions of game i
+        are packed[offsets[i]:offsets[i + 1]].
+    """
+    __slots__ = ('packed', 'cents', 'offsets')
+
+    def __init__(self, packed, cents, offsets):
+        self.packed = np.asarray(packed, dtype=np.uint8)
+        self.cents = np.asarray(cents, dtype=np.int32)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        if len(self.packed) != len(self.cents) or self.offsets[-1] != len(self.packed):
+            raise ValueError("Packed actions and offsets do not match.")
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    @property
+    def codes(self):
+        return self.packed & CODE_MASK
+
+    @property
+    def actors(self):
+        return (self.packed >> ACTOR_SHIFT) & 1
+
+    @property
+    def streets(self):
+        return self.packed >> STREET_SHIFT
+
+    @property
+    def games(self):
+        """
+        Index of the game of every action.
+        """
+        return np.repeat(np.arange(len(self)), np.diff(self.offsets))
+
+    def _count(self, mask):
+        """
+        Number of actions matching mask in each game.
+        """
+        return np.bincount(self.games[mask], minlength=len(self))
+
+    def _street_mask(self, street):
+        if street is None:
+            return np.ones(len(self.packed), dtype=bool)
+        return self.streets == STREETS.index(street)
+
+    def played(self, street):
+        """
+        Boolean array, True for the games with at least one action on street.
+        """
+        return self._count(self._street_mask(street)) > 0
+
+    def bet_counts(self, street=None):
+        """
+        Number of bets and raises by each player in every game, on one street
+        or on all of them.
+        Return:
+            - (sb, bb): int64 arrays of shape (n_games,).
+        """
+        aggressive = self._street_mask(street) & (self.codes >= BET)
+        actors = self.actors
+        return self._count(aggressive & (actors == 0)), self._count(aggressive & (actors == 1))
+
+    def aggressive(self, street, player):
+        """
+        Boolean array, True for the games where player ('SB' or 'BB') bet or
+        raised on street.
+        """
+        sb, bb = self.bet_counts(street)
+        return (sb if player == 'SB' else bb) > 0
+
+    def first_fold_actor(self):
+        """
+        Actor of the first fold of every game: 0 for the small blind, 1 for
+        the big blind and -1 when nobody folded.
+        """
+        first = np.full(len(self), len(self.packed))
+        folds = np.flatnonzero(self.codes == FOLD)
+        np.minimum.at(first, self.games[folds], folds)
+        actor = np.full(len(self), -1, dtype=np.int8)
+        folded = first < len(self.packed)
+        actor[folded] = self.actors[first[folded]]
+        return actor
+
+    def fold_flags(self):
+        """
+        Whether the small blind and the big blind folded on the street of
+        the first fold of every game, as check_fold.
+        Return:
+            - (fold_sb, fold_bb): boolean arrays of shape (n_games,).
+        """
+        folds = self.codes == FOLD
+        games = self.games
+        first_street = np.full(len(self), len(STREETS))
+        np.minimum.at(first_street, games[folds], self.streets[folds])
+        folds &= self.streets == first_street[games]
+        actors = self.actors
+        return self._count(folds & (actors == 0)) > 0, self._count(folds & (actors == 1)) > 0
+
+
+def _pack(codes, streets, positions):
+    """
+    Packs code, actor and street arrays into uint8. The small blind acts
+    first preflop (street 0), the big blind on the later streets.
+    """
+    actors = (positions & 1) ^ (np.asarray(streets) > 0)
+    return (codes | (actors << ACTOR_SHIFT) | (streets << STREET_SHIFT)).astype(np.uint8)
+
+
+def pack_actions(df):
+    """
+    Packs the 'Preflop actions' to 'River actions' columns of a poker_dataframe,
+    lists of (action, amount) tuples or None. Streets whose column is missing
+    from df are packed as not played.
+    Return:
+        - PackedActions of the rows of df, in order.
+    """
+    present = [(street, column) for street, column in enumerate(ACTION_COLUMNS) if column in df]
+    codes, streets, positions, cents, counts = [], [], [], [], []
+    for row in zip(*(df[column] for _, column in present)):
+        count = 0
+        for (street, _), actions in zip(present, row):
+            if actions is None:
+                continue
+            for position, (action, amount) in enumerate(actions):
+                codes.append(ACTION_CODE[action])
+                streets.append(street)
+                positions.append(position)
+                cents.append(round(float(amount) * 100))
+            count += len(actions)
+        counts.append(count)
+    offsets = np.concatenate([[0], np.cumsum(counts, dtype=np.int64)])
+    packed = _pack(np.array(codes, dtype=np.uint8), np.array(streets, dtype=np.uint8),
+                   np.array(positions, dtype=np.int64))
+    return PackedActions(packed, cents, offsets)
+
+
+def pack_table(table):
+    """
+    Packs the preflop_actions to river_actions columns of a pyarrow table with
+    the schema of dataset.py, straight from their offsets and values.
+    Return:
+        - PackedActions of the rows of table, in order.
+    """
+    n_games = table.num_rows
+    parts = []
+    for street, name in enumerate(STREETS):
+        column = table.column(f'{name}_actions').combine_chunks()
+        offsets = np.asarray(column.offsets)
+        values = column.values.slice(offsets[0], offsets[-1] - offsets[0])
+        lengths = np.diff(offsets)
+        starts = np.repeat(offsets[:-1] - offsets[0], lengths)
+        positions = np.arange(len(values)) - starts
+        games = np.repeat(np.arange(n_games), lengths)
+        codes = np.asarray(values.field('action')).astype(np.uint8)
+        parts.append((games, _pack(codes, street, positions), np.asarray(values.field('cents'))))
+
+    # order the actions by game, then street, then position
+    games = np.concatenate([part[0] for part in parts])
+    order = np.argsort(games, kind='stable')
+    packed = np.concatenate([part[1] for part in parts])[order]
+    cents = np.concatenate([part[2] for part in parts])[order]
+    offsets = np.concatenate([[0], np.cumsum(np.bincount(games, minlength=n_games))])
+    return PackedActions(packed, cents, offsets)
@@ -1,17 +1,23 @@
 """
 This is a module that add 4 new columns that indicate aggression levels
 4 possible output: 00,01,10,11
-saves output in new df
+add_aggression_columns(df) adds the aggression of both players on every street
+at once from the packed actions of winedge.actions.
 """
 
-import pandas as pd
+import numpy as np
 
-def check_aggression(action_list):
+from .actions import STREETS, pack_actions
+
+def check_aggression(action_list, street='preflop'):
     """
     This function looks at the actions that happened and outputs a 2 digit number
     The number represents aggression show by either player
 
-    Player counts as aggressive if they raised or bet
+    Player counts as aggressive if they raised or bet. Heads up the small blind
+    acts first preflop and the big blind acts first on the flop, turn and
+    river, so street ('preflop', 'flop', 'turn' or 'river') tells who took
+    each action.
 
     Ex:
     00 - means both passive
@@ -24,19 +30,34 @@ def check_aggression(action_list):
 
     if action_list==None:
         return None
+    # position of the small blind's actions on this street
+    sb_parity = 0 if street == 'preflop' else 1
     for index,action in enumerate(action_list):
         if action[0] in ('r','b'):
-            if index %2==0:
+            if index %2==sb_parity:
                 agg_sb=1
             else:
                 agg_bb=1
     return agg_sb, agg_bb
 
-#df = pd.read_pickle("../dataframe/poker_dataframe.pkl")
-
-#df['Aggr preflop'] = df['Preflop actions'].apply(check_aggression)
-#df['Aggr flop'] = df['Flop actions'].apply(check_aggression)
-#df['Aggr turn'] = df['Turn actions'].apply(check_aggression)
-#df['Aggr river'] = df['River actions'].apply(check_aggression)
-
-#df.to_pickle('poker_dataframe_with_agg_columns.pkl')
+def aggression_columns(packed):
+    """
+    The two values of check_aggression for every street of the games of a
+    PackedActions, as a dict of 'Aggr {street} SB' and 'Aggr {street} BB'
+    arrays, NaN when the street was not played.
+    """
+    columns = {}
+    for street in STREETS:
+        played = packed.played(street)
+        for player in ('SB', 'BB'):
+            columns[f'Aggr {street} {player}'] = np.where(played, packed.aggressive(street, player), np.nan)
+    return columns
+
+def add_aggression_columns(df):
+    """
+    Adds the columns of aggression_columns to df, computed in one pass over
+    the packed actions.
+    """
+    for column, values in aggression_columns(pack_actions(df)).items():
+        df[column] = values
+    return df
@@ -3,15 +3,18 @@ This is a module that adds 2 new columns to the dataframe:
 - 'Fold_sb', which is True if the small blind folds during the game, and False otherwise
 - 'Fold_bb', which is True if the big blind folds during the game, and False otherwise
 
-The output is saved in a new dataframe
+add_fold_columns(df) computes both columns for a whole dataframe at once from
+the packed actions of winedge.actions.
 """
 
-import pandas as pd
+from .actions import pack_actions
 
 def check_fold(preflop_actions, flop_actions, turn_actions, river_actions):
     """
     This function examines the actions throughout the course of the poker game, 
-    and determines if the small blind or big blind player folded
+    and determines if the small blind or big blind player folded. Heads up the
+    small blind acts first preflop and the big blind acts first on the flop,
+    turn and river.
     
     Args:
         preflop_actions (list of str): A list of action strings during the preflop phase
@@ -37,28 +40,29 @@ def check_fold(preflop_actions, flop_actions, turn_actions, river_actions):
         for index, action in enumerate(flop_actions):
             if action[0] == 'f':
                 if index % 2 == 0:
-                    fold_sb = True
-                else:
                     fold_bb = True
+                else:
+                    fold_sb = True
     if turn_actions is not None and fold_sb is False and fold_bb is False:
         for index, action in enumerate(turn_actions):
             if action[0] == 'f':
                 if index % 2 == 0:
-                    fold_sb = True
-                else:
                     fold_bb = True
+                else:
+                    fold_sb = True
     if river_actions is not None and fold_sb is False and fold_bb is False:
         for index, action in enumerate(river_actions):
             if action[0] == 'f':
                 if index % 2 == 0:
-                    fold_sb = True
-                else:
                     fold_bb = True
+                else:
+                    fold_sb = True
     return fold_sb, fold_bb
 
-df = pd.read_pickle("dataframe/poker_dataframe.pkl")
-df['fold_sb'], df['fold_bb'] = zip(*df.apply(lambda row: check_fold(row['Preflop actions'],
-                                                                    row['Flop actions'],
-                                                                    row['Turn actions'], 
-                                                                    row['River actions']), 
-                                                                    axis=1))
+def add_fold_columns(df):
+    """
+    Adds the 'fold_sb' and 'fold_bb' columns to df, computed in one pass over
+    the packed actions, with the values of check_fold.
+    """
+    df['fold_sb'], df['fold_bb'] = pack_actions(df).fold_flags()
+    return df
@@ -1,13 +1,66 @@
 """
 This module contains a function to quantify the risk of a flush being present based on
 the board card in our historical dataset at the river stage of the game.
+
+The suits of the board cards are read as the suit nibbles of Card.new, and
+counted per suit over the whole board matrix, so the flush count and risk of
+the flop, turn and river of every game come out of a few array operations.
 """
 import os
-import warnings
 
 import numpy as np
-import pandas as pd
-from collections import Counter
+
+from . import Card
+from .dataset import read_poker_dataframe
+
+# columns read from a Parquet dataset
+FLUSH_COLUMNS = ['Game ID', 'Flop', 'Turn', 'River']
+STREET_COLUMNS = ('Flop', 'Turn', 'River')
+
+SUIT_BITS = np.array([1, 2, 4, 8], dtype=np.uint8)
+
+
+def suit_nibbles(cards):
+    """
+    Suit nibbles of an array of card strings like 'Qh'.
+    """
+    return ((Card.new_many(cards) >> 12) & 0xF).astype(np.uint8)
+
+
+def board_suit_counts(df):
+    """
+    Number of board cards of each suit at the flop, turn and river of every
+    game, without changing the columns of df.
+    Args:
+        - df: dataframe with the 'Flop', 'Turn' and 'River' columns of the
+        poker_dataframe.
+    Return:
+        - counts: uint8 array of shape (len(df), 3, 4), the counts of the
+        suits s, h, d and c on each street.
+        - dealt: boolean array of shape (len(df), 3), False for streets the
+        game did not reach.
+    """
+    dealt = np.column_stack([df[column].notna().to_numpy() for column in STREET_COLUMNS])
+    counts = np.zeros((len(df), 3, 4), dtype=np.uint8)
+    flop = dealt[:, 0]
+    if flop.any():
+        nibbles = suit_nibbles(df['Flop'][flop].tolist())
+        counts[flop, 0] = ((nibbles[..., None] & SUIT_BITS) > 0).sum(axis=1)
+    for street in (1, 2):
+        counts[:, street] = counts[:, street - 1]
+        rows = dealt[:, street]
+        if rows.any():
+            nibbles = suit_nibbles(df[STREET_COLUMNS[street]][rows])
+            counts[rows, street] += (nibbles[:, None] & SUIT_BITS) > 0
+    return counts, dealt
+
+
+def flush_risk(flush_count):
+    """
+    'Flush' quantification of flush counts, see flush_eval_to_df.
+    """
+    return np.maximum(np.asarray(flush_count) - 2, 0)
+
 
 def flush_eval_to_df(poker_df_filepath):
     """
@@ -32,10 +85,13 @@ def flush_eval_to_df(poker_df_filepath):
         - Board: combing cards from flop, turn, and river column per game
         - Flush Count: max count of same suit on the board
         - Flush: conversion from flush count using quantification above
+        - Flop Flush Count, Flop Flush, Turn Flush Count, Turn Flush: the same
+        for the board at the flop and at the turn
     
     Args:
     --------------
-        - poker_df_filepath: .pkl dataframe file formated in same way as poker_dataframe.
+        - poker_df_filepath: .pkl dataframe file formated in same way as poker_dataframe,
+        or a Parquet dataset directory of which only FLUSH_COLUMNS of the river games are read.
 
     Return:
     --------------
@@ -45,49 +101,23 @@ def flush_eval_to_df(poker_df_filepath):
     --------------
         poker_dataframe_w_flush.pkl file exported to current working directory.
     """
-    fl_df = pd.read_pickle(poker_df_filepath)
-
-    #Creating new columns that are filled with NaN
-    warnings.filterwarnings('ignore')
-    fl_df['Board'] = np.nan
-    fl_df['Flush Count'] = np.nan
-    fl_df['Flush'] = np.nan
-
-    #Resetting index of new dataframe
-    fl_df = fl_df.reset_index()
-    #Creating board by taking flop cards, and appending the turn and river card. 
-    #then resetting the flop to its orignal form
-    for loc in fl_df.index:
-        fl_df['Board'][loc] = fl_df['Flop'][loc]
-        fl_df['Board'][loc].append(fl_df['Turn'][loc])
-        fl_df['Board'][loc].append(fl_df['River'][loc])
-        fl_df['Flop'][loc] = fl_df['Flop'][loc][slice(3)]
-    #Looking at board cards per game, per index of 'Board'. Counting the max instance 
-    #of a single suit on the board. If max count is 1 or 2, 'Flush' = 0, max count = 3,
-    #"Flush" = 1, max count = 4, 'Flush' = 2, max count = 5, 'Flush' = 3. These 'Flush' 
-    #values signify likelihood of a player to get a flush on the board with 0 = impossible, 
+    fl_df = read_poker_dataframe(poker_df_filepath, FLUSH_COLUMNS, streets=['river'])
+    fl_df = fl_df[fl_df['River'].notna()].reset_index()
+
+    #Creating board by taking flop cards, and appending the turn and river card.
+    fl_df['Board'] = [flop + [turn, river] for flop, turn, river in
+                      zip(fl_df['Flop'], fl_df['Turn'], fl_df['River'])]
+    #Counting the max instance of a single suit on the board at every street. If
+    #max count is 1 or 2, 'Flush' = 0, max count = 3, "Flush" = 1, max count = 4,
+    #'Flush' = 2, max count = 5, 'Flush' = 3. These 'Flush' values signify
+    #likelihood of a player to get a flush on the board with 0 = impossible,
     #and 3 = flush on board
-    for games in fl_df.index:
-        suits=[]
-        for i in range(5):
-            suits.append(fl_df['Board'][games][i][1])
-        counts = Counter(suits)
-        count = max(counts.values())
-        if count == 1:
-            flush = 0
-        elif count ==2:
-            flush = 0
-        elif count == 3:
-            flush = 1
-        elif count == 4:
-            flush = 2
-        else:
-            flush = 3
-        fl_df['Flush Count'][games] = count
-        fl_df['Flush'][games] = flush
+    counts, _ = board_suit_counts(fl_df)
+    flush_count = counts.max(axis=2).astype(float)
+    fl_df['Flush Count'] = flush_count[:, 2]
+    fl_df['Flush'] = flush_risk(flush_count[:, 2])
+    for street, column in enumerate(STREET_COLUMNS[:2]):
+        fl_df[f'{column} Flush Count'] = flush_count[:, street]
+        fl_df[f'{column} Flush'] = flush_risk(flush_count[:, street])
     poker_dataframe_flush_risk = os.path.join(os.getcwd(), "poker_dataframe_flush_risk.pkl")
     fl_df.to_pickle(poker_dataframe_flush_risk)
-
-    
-
-
@@ -9,14 +9,16 @@ of possible poker hands that the player beats) for both the small blind
 and big blind player to the dataframe and exports it to the current working
 directory.
 """
-import ast
 import os
 import warnings
 
 import numpy as np
-import pandas as pd
 
 from . import Card, Evaluator
+from .dataset import read_poker_dataframe
+
+# columns read from a Parquet dataset
+RANK_COLUMNS = ['Game ID', 'Flop', 'Turn', 'River', 'SB cards', 'BB cards']
 
 def add_rank_to_pkl_df(poker_dataframe_filepath):
     """
@@ -30,11 +32,11 @@ def add_rank_to_pkl_df(poker_dataframe_filepath):
 
     Metrics:
     --------------
-        - SB Handrank (str): Represents the type of hand the small blind
+        - SB Handrank (categorical str): Represents the type of hand the small blind
         player has
             (Ex. sb hand = 2,3,4,5,6 -> SB Handrank = 'Flush')
 
-        - BB Handrank (str): Represents the type of hand the big blind
+        - BB Handrank (categorical str): Represents the type of hand the big blind
         player has
             (Ex. bb hand = 5,5,8,8,10 -> SB Handrank = 'Two Pair')
 
@@ -48,7 +50,9 @@ def add_rank_to_pkl_df(poker_dataframe_filepath):
     Args:
     --------------
         filepath (str): Filepath to the poker_dataframe.pkl file containing
-        historical poker data formated with the create_dataframe.py module.
+        historical poker data formated with the create_dataframe.py module,
+        or a Parquet dataset directory from dataset.write_dataset, of which
+        only RANK_COLUMNS of the river games are read.
 
     Returns:
     --------------
@@ -60,7 +64,7 @@ def add_rank_to_pkl_df(poker_dataframe_filepath):
         working directory.
     """
     # Create pandas df from pickle dataframe
-    pk = pd.read_pickle(poker_dataframe_filepath)
+    pk = read_poker_dataframe(poker_dataframe_filepath, RANK_COLUMNS, streets=['river'])
     # Remove all entries where player cards are not revealed (game did not go to
     # river stage).
     pk_rvr = pk[(~pk['River'].isnull()) & (~pk['SB cards'].isnull()) & \
@@ -76,36 +80,23 @@ def add_rank_to_pkl_df(poker_dataframe_filepath):
     # Definal evaluator
     pkeval = Evaluator()
 
-    for loc in pk_rvr.index:
-        # Extract the board and player cards from the dataframe and format them
-        # for use in the Card.py module.
-        board_list = [pk_rvr['Turn'][loc], pk_rvr['River'][loc]] + \
-            pk_rvr['Flop'][loc]
-        hand_sb_list = ast.literal_eval(pk_rvr['SB cards'][loc].\
-            replace("[ ", "['").replace(" ]", "']").replace(", ", "', '"))
-        hand_bb_list = ast.literal_eval(pk_rvr['BB cards'][loc].\
-            replace("[ ", "['").replace(" ]", "']").replace(", ", "', '"))
-
-        # Replace the original df elements with the cleaned ones
-        pk_rvr['SB cards'][loc] = hand_sb_list
-        pk_rvr['BB cards'][loc] = hand_bb_list
-
-        # Create unique cards formatted for the evaluator using the Card.py
-        # module based on the player and board coards extracted from the
-        # dataframe.
-        hand_sb = [Card.new(card) for card in hand_sb_list]
-        hand_bb = [Card.new(card) for card in hand_bb_list]
-        board = [Card.new(card) for card in board_list]
-
-        pk_rvr['SB Handrank'][loc] = pkeval.class_to_string(
-            pkeval.get_rank_class(pkeval.evaluate(hand_sb, board)))
-        pk_rvr['SB Hand Strength'][loc] = pkeval.get_rank_percentage(
-            pkeval.evaluate(hand_sb, board))
-
-        pk_rvr['BB Handrank'][loc] = pkeval.class_to_string(
-            pkeval.get_rank_class(pkeval.evaluate(hand_bb, board)))
-        pk_rvr['BB Hand Strength'][loc] = pkeval.get_rank_percentage(
-            pkeval.evaluate(hand_bb, board))
+    # Create unique cards formatted for the evaluator using the Card.py
+    # module, parsing whole columns at once.
+    board = Card.new_many(np.column_stack([pk_rvr['Flop'].tolist(), pk_rvr['Turn'], pk_rvr['River']])
+                          .reshape(-1, 5))
+    hands = {player: Card.hole_cards_many(pk_rvr[player + ' cards']).reshape(-1, 2)
+             for player in ('SB', 'BB')}
+
+    # Replace the original df elements with the cleaned ones, the lists of
+    # the two card strings in '[ 9c, Qs ]'
+    for player in ('SB', 'BB'):
+        pk_rvr[player + ' cards'] = [[cards[2:4], cards[6:8]] for cards in pk_rvr[player + ' cards']]
+
+    # Evaluate every game at once, once per player.
+    for player, hand in hands.items():
+        rank = pkeval.evaluate_many(hand, board)
+        pk_rvr[player + ' Handrank'] = pkeval.class_to_string(pkeval.get_rank_class(rank))
+        pk_rvr[player + ' Hand Strength'] = pkeval.get_rank_percentage(rank)
 
     # Reset the index of the pandas poker_dataframec
     pk_rvr = pk_rvr.reset_index()
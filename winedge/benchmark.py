@@ -0,0 +1,350 @@
+"""
+benchmark Module
+
+The benchmark module times the hot paths of the package, so a change to
+Card, LookupTable, Evaluator or the feature stages that makes them slower
+shows up as a number instead of going unnoticed. Every benchmark reports its
+throughput (items per second, e.g. hands or games) and the latency
+percentiles of its calls. Results are saved as JSON baselines and a later
+run can be compared against a baseline, flagging every benchmark whose
+throughput dropped by more than a threshold fraction of the baseline.
+
+Benchmarks:
+--------------
+- lookup_table: Building the LookupTable, and loading the shipped table file.
+- evaluate: Evaluator.evaluate of fixed seeded 5, 6 and 7 card hands, one
+  call per hand, and evaluate_partial of 4 card hands.
+- evaluate_many: Evaluator.evaluate_many of a whole array of 7 card hands.
+- equity: Monte Carlo equity on the flop and exact equity on the turn.
+- features: Parsing a synthetic poker_dataframe and every feature stage.
+
+Functions:
+--------------
+- synthetic_games(n_games, seed):
+    A random poker_dataframe with the columns of the feature stages.
+
+- run_benchmarks(names=None, hands=HANDS, games=GAMES, seed=0):
+    Runs the benchmarks and returns their results.
+
+- save_results(results, path) / load_results(path):
+    Writes and reads a JSON baseline.
+
+- compare_results(results, baseline, threshold=THRESHOLD):
+    The throughput change of every benchmark against a baseline.
+
+Run `python -m winedge.benchmark --save baseline.json` to record a baseline
+and `python -m winedge.benchmark --compare baseline.json` to check a change
+against it. The command exits with status 1 when a benchmark regressed.
+"""
+
+import json
+import platform
+import random
+import time
+
+import numpy as np
+import pandas as pd
+
+from .card import CARD_INTS
+from .dataset import CARDS
+from .equity import equity, exact_equity
+from .evaluator import Evaluator
+from .features import FeatureFrame, aggregate_totals, resolve_stages
+from .lookup import LookupTable
+
+# hands per evaluate benchmark and games of the synthetic dataset
+HANDS = 10000
+GAMES = 100000
+# drop in items per second, as a fraction of the baseline, above which a
+# benchmark counts as a regression
+THRESHOLD = 0.3
+# version of the JSON format
+FORMAT_VERSION = 1
+
+# street actions of the synthetic games, the last one ends the game
+STREET_ACTIONS = ([('k', 0), ('k', 0)], [('b', '0.04'), ('c', '0.04')],
+                  [('k', 0), ('b', '0.06'), ('c', '0.06')],
+                  [('b', '0.04'), ('r', '0.10'), ('c', '0.06')])
+FOLD_ACTIONS = ([('b', '0.04'), ('f', 0)], [('k', 0), ('b', '0.06'), ('f', 0)])
+STREET_COLUMNS = ('Preflop actions', 'Flop actions', 'Turn actions', 'River actions')
+
+
+def synthetic_games(n_games=GAMES, seed=0):
+    """
+    A poker_dataframe of n_games random games: 10% end preflop, 10% on the
+    flop, 10% on the turn and the rest reach the river with both hands shown.
+    Args:
+        - n_games: Number of games.
+        - seed: Seed of the random generator, the same seed gives the same
+        games.
+    Return:
+        - pandas dataframe with the columns of hand_history.COLUMNS.
+    """
+    rng = np.random.default_rng(seed)
+    # 5 board cards and the two hands of every game, without duplicates
+    cards = np.argsort(rng.random((n_games, 52)), axis=1)[:, :9]
+    last_street = rng.choice(4, size=n_games, p=[0.1, 0.1, 0.1, 0.7])
+    actions = rng.integers(len(STREET_ACTIONS), size=(n_games, 4))
+    folds = rng.integers(len(FOLD_ACTIONS), size=n_games)
+
+    columns = {column: [] for column in ('Flop', 'Turn', 'River', 'SB cards', 'BB cards') + STREET_COLUMNS}
+    for game in range(n_games):
+        names = [CARDS[card] for card in cards[game]]
+        street = last_street[game]
+        columns['Flop'].append(names[:3] if street >= 1 else None)
+        columns['Turn'].append(names[3] if street >= 2 else None)
+        columns['River'].append(names[4] if street == 3 else None)
+        shown = street == 3
+        columns['SB cards'].append(f'[ {names[5]}, {names[6]} ]' if shown else None)
+        columns['BB cards'].append(f'[ {names[7]}, {names[8]} ]' if shown else None)
+        for i, column in enumerate(STREET_COLUMNS):
+            if i > street:
+                played = None
+            elif i == street and not shown:
+                played = [('f', 0)] if i == 0 else FOLD_ACTIONS[folds[game]]
+            elif i == 0:
+                played = [('c', '0.01'), ('k', 0)]
+            else:
+                played = STREET_ACTIONS[actions[game, i]]
+            columns[column].append(played)
+
+    df = pd.DataFrame({
+        'Game ID': [str(600000000 + game) for game in range(n_games)],
+        'File': 'synthetic.txt', 'Player SB': 'sb', 'Player BB': 'bb'})
+    for column in STREET_COLUMNS:
+        df[column] = columns[column]
+    for column in ('Flop', 'Turn', 'River'):
+        df[column] = columns[column]
+    df['SB stack'] = '1.00'
+    df['BB stack'] = '2.00'
+    df['SB cards'] = columns['SB cards']
+    df['BB cards'] = columns['BB cards']
+    df['Folded pre'] = last_street == 0
+    return df
+
+
+def _stats(times, items):
+    """
+    Throughput and latency percentiles of calls taking times seconds and
+    handling items items each.
+    """
+    times = np.asarray(times)
+    p50, p90, p99 = np.percentile(times, [50, 90, 99]) * 1e6
+    return {'calls': len(times), 'items_per_call': items,
+            'items_per_sec': items * len(times) / times.sum(),
+            'p50_us': p50, 'p90_us': p90, 'p99_us': p99}
+
+
+def _time_calls(func, args, items=1):
+    """
+    Times func(*arg) once for every arg of args.
+    """
+    times = []
+    clock = time.perf_counter
+    for arg in args:
+        start = clock()
+        func(*arg)
+        times.append(clock() - start)
+    return _stats(times, items)
+
+
+def _time_repeat(func, repeat, items=1):
+    """
+    Times repeat calls of func().
+    """
+    return _time_calls(func, [()] * repeat, items)
+
+
+def _seeded_hands(n_hands, n_cards, seed):
+    """
+    n_hands lists of n_cards distinct Card.new ints.
+    """
+    rng = random.Random(seed)
+    deck = CARD_INTS.tolist()
+    return [rng.sample(deck, n_cards) for _ in range(n_hands)]
+
+
+def _lookup_table(hands, games, seed):
+    return {'lookup_table.build': _time_repeat(LookupTable, 5),
+            'lookup_table.load': _time_repeat(LookupTable.load, 20)}
+
+
+def _evaluate(hands, games, seed):
+    evaluator = Evaluator()
+    results = {}
+    for n_cards in (5, 6, 7):
+        cards = _seeded_hands(hands, n_cards, seed)
+        results[f'evaluate.{n_cards}'] = _time_calls(
+            evaluator.evaluate, [(hand[:2], hand[2:]) for hand in cards])
+    cards = _seeded_hands(hands, 4, seed)
+    results['evaluate_partial.4'] = _time_calls(
+        evaluator.evaluate_partial, [(hand[:2], hand[2:]) for hand in cards])
+    return results
+
+
+def _evaluate_many(hands, games, seed):
+    evaluator = Evaluator()
+    cards = np.array(_seeded_hands(hands, 7, seed), dtype=np.int32)
+    return {'evaluate_many.7': _time_repeat(lambda: evaluator.evaluate_many(cards), 5, hands)}
+
+
+def _equity(hands, games, seed):
+    flops = _seeded_hands(20, 5, seed)
+    turns = _seeded_hands(20, 8, seed)
+    return {
+        'equity.flop': _time_calls(
+            lambda hand, i: equity(hand[:2], hand[2:], iterations=1000, seed=i, exact=False),
+            [(hand, i) for i, hand in enumerate(flops)]),
+        'exact_equity.turn': _time_calls(
+            lambda hand: exact_equity(hand[:2], hand[2:6], hand[6:]), [(hand,) for hand in turns])}
+
+
+def _features(hands, games, seed):
+    df = synthetic_games(games, seed)
+    stages = resolve_stages(None)
+    totals = aggregate_totals([df], stages)
+    times = {'features.parse': []}
+    times.update((f'features.{stage.name}', []) for stage in stages)
+    for _ in range(3):
+        frame = FeatureFrame(df, totals)
+        start = time.perf_counter()
+        # reading the cached properties forces parsing the cards and actions
+        for name in ('board', 'hands', 'actions'):
+            getattr(frame, name)
+        times['features.parse'].append(time.perf_counter() - start)
+        for stage in stages:
+            start = time.perf_counter()
+            columns = stage.compute(frame)
+            times[f'features.{stage.name}'].append(time.perf_counter() - start)
+            frame.features.update(columns)
+    return {name: _stats(stage_times, games) for name, stage_times in times.items()}
+
+
+BENCHMARKS = {'lookup_table': _lookup_table, 'evaluate': _evaluate,
+              'evaluate_many': _evaluate_many, 'equity': _equity, 'features': _features}
+
+
+def run_benchmarks(names=None, hands=HANDS, games=GAMES, seed=0):
+    """
+    Runs benchmarks.
+    Args:
+        - names: Names of the benchmarks to run (see BENCHMARKS), all by
+        default.
+        - hands: Number of hands of the evaluate benchmarks.
+        - games: Number of synthetic games of the features benchmark.
+        - seed: Seed of the hands and games.
+    Return:
+        - dict with the run configuration and, under 'results', the
+        items_per_sec, p50_us, p90_us and p99_us of every measurement.
+    Exceptions:
+        - KeyError: Raised for unknown benchmark names.
+    """
+    names = list(BENCHMARKS) if names is None else names
+    benchmarks = [BENCHMARKS[name] for name in names]
+    results = {}
+    for benchmark in benchmarks:
+        results.update(benchmark(hands, games, seed))
+    return {'version': FORMAT_VERSION,
+            'config': {'benchmarks': names, 'hands': hands, 'games': games, 'seed': seed},
+            'machine': {'python': platform.python_version(), 'numpy': np.__version__,
+                        'pandas': pd.__version__, 'platform': platform.platform()},
+            'results': results}
+
+
+def save_results(results, path):
+    """
+    Writes the results of run_benchmarks to a JSON file.
+    """
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+
+
+def load_results(path):
+    """
+    Reads results written by save_results.
+    """
+    with open(path) as f:
+        results = json.load(f)
+    if results.get('version') != FORMAT_VERSION:
+        raise ValueError(f"Unsupported benchmark file version in {path}")
+    return results
+
+
+def compare_results(results, baseline, threshold=THRESHOLD):
+    """
+    Compares the throughput of every benchmark in both results.
+    Args:
+        - results, baseline: Results of run_benchmarks or load_results.
+        - threshold: Largest drop in items per second, as a fraction of the
+        baseline, e.g. 0.3 flags benchmarks with more than 30% fewer items
+        per second than the baseline.
+    Return:
+        - List of (name, baseline items/s, items/s, change, regressed) in
+        the order of results, change being the relative change of items/s
+        (-0.3 for 30% fewer).
+    """
+    rows = []
+    for name, current in results['results'].items():
+        if name not in baseline['results']:
+            continue
+        before = baseline['results'][name]['items_per_sec']
+        after = current['items_per_sec']
+        rows.append((name, before, after, after / before - 1, after / before < 1 - threshold))
+    return rows
+
+
+def format_results(results):
+    """
+    Text table of the results of run_benchmarks.
+    """
+    lines = [f"{'benchmark':<24}{'items/s':>14}{'p50 us':>12}{'p90 us':>12}{'p99 us':>12}"]
+    for name, result in results['results'].items():
+        lines.append(f"{name:<24}{result['items_per_sec']:>14,.0f}{result['p50_us']:>12.1f}"
+                     f"{result['p90_us']:>12.1f}{result['p99_us']:>12.1f}")
+    return '\n'.join(lines)
+
+
+def format_comparison(rows):
+    """
+    Text table of the rows of compare_results.
+    """
+    lines = [f"{'benchmark':<24}{'baseline/s':>14}{'items/s':>14}{'change':>10}"]
+    for name, before, after, change, regressed in rows:
+        lines.append(f"{name:<24}{before:>14,.0f}{after:>14,.0f}{change:>+10.1%}"
+                     + ('  REGRESSION' if regressed else ''))
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Benchmark the evaluator and the feature stages.")
+    parser.add_argument('benchmarks', nargs='*',
+                        help=f"benchmarks to run among {', '.join(BENCHMARKS)}, all by default")
+    parser.add_argument('--hands', type=int, default=HANDS)
+    parser.add_argument('--games', type=int, default=GAMES)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--save', metavar='JSON', help="write the results as a baseline")
+    parser.add_argument('--compare', metavar='JSON', help="compare the results with a baseline")
+    parser.add_argument('--threshold', type=float, default=THRESHOLD,
+                        help="largest allowed drop of items per second, e.g. 0.3 for 30%%")
+    args = parser.parse_args()
+    unknown = set(args.benchmarks) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    results = run_benchmarks(args.benchmarks or None, args.hands, args.games, args.seed)
+    print(format_results(results))
+    if args.save:
+        save_results(results, args.save)
+    if args.compare:
+        baseline = load_results(args.compare)
+        sizes = {key: value for key, value in baseline['config'].items() if key != 'benchmarks'}
+        if any(results['config'][key] != value for key, value in sizes.items()):
+            print("\nThe baseline was run with different sizes:", sizes)
+        rows = compare_results(results, baseline, args.threshold)
+        print()
+        print(format_comparison(rows))
+        if any(row[-1] for row in rows):
+            sys.exit(1)
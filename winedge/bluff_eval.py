@@ -6,12 +6,15 @@ big blind players based on the poker_dataframe created by the
 create_dataframe.py module.
 """
 
-import ast
 import os
 import numpy as np
-import pandas as pd
 import warnings
 from . import Card, Evaluator
+from .actions import pack_actions
+from .dataset import read_poker_dataframe
+
+# columns read from a Parquet dataset
+BLUFF_COLUMNS = ['Game ID', 'Flop', 'Turn', 'River', 'SB cards', 'BB cards', 'River actions']
 
 def bluff_eval(df_filepath):
     """
@@ -31,6 +34,11 @@ def bluff_eval(df_filepath):
             = sum of bets 'b' and raises 'r' for specific game / average number
             of bets and raises for the big blind player
 
+        Heads up the big blind acts first on the river, so the first river
+        action and every second one after it count for the big blind. (Before
+        the packed actions of winedge.actions, the first river action counted
+        for the small blind, which swapped aggSB and aggBB.)
+
         -SB Bluff Metric: Metric quantifying the whether the small blind player
         was bluffing and how aggressively
             = (% of poker hands the sb player's hand loses to) * (aggSB)
@@ -42,7 +50,9 @@ def bluff_eval(df_filepath):
     Args:
     --------------
         df_filepath(str): Filepath to poker_dataframe.pkl containing poker data
-        created by the create_dataframe.py module.
+        created by the create_dataframe.py module, or a Parquet dataset
+        directory from dataset.write_dataset, of which only BLUFF_COLUMNS of
+        the river games are read.
     
     Returns:
     --------------
@@ -57,7 +67,7 @@ def bluff_eval(df_filepath):
 
     """
     # Import and clean dataframe and add columns
-    df = pd.read_pickle(df_filepath)
+    df = read_poker_dataframe(df_filepath, BLUFF_COLUMNS, streets=['river'])
     blf_df = df[(~df['River'].isnull()) & (~df['SB cards'].isnull()) & \
                 (~df['BB cards'].isnull()) & (~df['River actions'].isnull())]
 
@@ -68,23 +78,10 @@ def bluff_eval(df_filepath):
     blf_df['BB Bluff Metric'] = np.nan
     blf_df = blf_df.reset_index()
 
-    # Calculate Aggressiveness
-    for loc in blf_df.index:
-        sb_agg = 1
-        bb_agg = 1
-        for i, action in enumerate(blf_df['River actions'][loc]):
-            if i %2==0:
-                if action[0] == 'b' or action[0] == 'r':
-                    sb_agg += 1
-                else:
-                    sb_agg += 0
-            else:
-                if action[0] == 'b' or action[0] == 'r':
-                    bb_agg += 1
-                else:
-                    bb_agg += 0
-        blf_df['aggBB'][loc] = bb_agg
-        blf_df['aggSB'][loc] = sb_agg
+    # Calculate Aggressiveness: 1 + bets and raises of each player on the river
+    sb_bets, bb_bets = pack_actions(blf_df[['River actions']]).bet_counts('river')
+    blf_df['aggSB'] = 1. + sb_bets
+    blf_df['aggBB'] = 1. + bb_bets
 
     # Normalize aggressiveness to mean
     blf_df['aggSB'] = blf_df['aggSB']/blf_df['aggSB'].mean()
@@ -92,25 +89,18 @@ def bluff_eval(df_filepath):
 
     # Calculate handrank % and bluff metric
     eval = Evaluator()
-    for loc in blf_df.index:
-        board_list = blf_df['Flop'][loc] + \
-            [blf_df['Turn'][loc], blf_df['River'][loc]]
-        hand_sb_list = ast.literal_eval(blf_df['SB cards'][loc].\
-            replace("[ ", "['").replace(" ]", "']").replace(", ", "', '"))
-        hand_bb_list = ast.literal_eval(blf_df['BB cards'][loc].\
-            replace("[ ", "['").replace(" ]", "']").replace(", ", "', '"))
-
-        handSB = [Card.new(card) for card in hand_sb_list]
-        handBB = [Card.new(card) for card in hand_bb_list]
-        board = [Card.new(card) for card in board_list]
-
-        # Calc % of hands SB and BB player loses to
-        sb_per = 1 - eval.get_rank_percentage(eval.evaluate(handSB, board))
-        bb_per = 1 - eval.get_rank_percentage(eval.evaluate(handBB, board))
-
-        # Calc bluff metric
-        blf_df['SB Bluff Metric'][loc] = sb_per*blf_df['aggSB'][loc]
-        blf_df['BB Bluff Metric'][loc] = bb_per*blf_df['aggBB'][loc]
+    board = Card.new_many(np.column_stack([blf_df['Flop'].tolist(), blf_df['Turn'], blf_df['River']])
+                          .reshape(-1, 5))
+    handSB = Card.hole_cards_many(blf_df['SB cards']).reshape(-1, 2)
+    handBB = Card.hole_cards_many(blf_df['BB cards']).reshape(-1, 2)
+
+    # Calc % of hands SB and BB player loses to
+    sb_per = 1 - eval.get_rank_percentage_many(eval.evaluate_many(handSB, board))
+    bb_per = 1 - eval.get_rank_percentage_many(eval.evaluate_many(handBB, board))
+
+    # Calc bluff metric
+    blf_df['SB Bluff Metric'] = sb_per*blf_df['aggSB']
+    blf_df['BB Bluff Metric'] = bb_per*blf_df['aggBB']
 
     # Export new df with normalized aggressiveness and bluff metric
     poker_df_w_bluff = os.path.join(os.getcwd(), "poker_df_w_bluff.pkl")
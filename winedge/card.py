@@ -5,8 +5,29 @@ The class is a 32-bit structure, storing info about rank, suit and prime number.
 Also contains functions that map the card rank to prime numbers so each
 rank is assigned with a unique prime number. This allows us to generate
 unique identifiers, aka prime product, for different hands.
+
+Hands that only differ by a relabelling of the suits are strategically
+identical; Card.canonicalize maps them to one canonical form so results can
+be cached once for all of them.
+
+Card.new_many and Card.hole_cards_many parse whole arrays or dataframe
+columns of card strings at once: the bytes of the strings are decoded with
+lookup tables into an index into the 52 precomputed Card.new ints.
 """
 
+import numpy as np
+
+
+def _byte_table(chars):
+    """
+    256-entry table with the position of each character of chars at its byte
+    value, and -1 for every other byte.
+    """
+    table = np.full(256, -1, dtype=np.int8)
+    table[np.frombuffer(chars.encode(), dtype=np.uint8)] = np.arange(len(chars))
+    return table
+
+
 class Card ():
     """
     Card class structure:
@@ -40,6 +61,12 @@ class Card ():
         'c' : 8, # clubs
     }
     INT_SUIT_TO_CHAR_SUIT = 'xshxdxxxc'
+    # suit bits in the order canonical suits are handed out
+    INT_SUITS = (1, 2, 4, 8)
+    # byte decoders and Card.new int of card index rank * 4 + suit
+    STR_SUITS = 'shdc'
+    RANK_BYTES = _byte_table(STR_RANKS)
+    SUIT_BYTES = _byte_table(STR_SUITS)
 
 
     @staticmethod
@@ -61,6 +88,64 @@ class Card ():
 
         return bitrank | suit | rank | rank_prime
 
+    @staticmethod
+    def new_many(cards):
+        """
+        Batch version of new. Converts an array-like of card strings (a list,
+        nested lists like the flops of the poker_dataframe, a numpy array or a
+        pandas column) to an int32 array of the same shape.
+        Exceptions:
+            - ValueError: Raised for anything that is not a two character card
+            string, like '1h', 'Ahh' or None.
+        """
+        values = np.asarray(cards)
+        codes = Card._char_codes(values, 3)
+        return Card._decode(codes[..., 0], codes[..., 1], codes[..., 2] != 0, values)
+
+    @staticmethod
+    def hole_cards_many(cards):
+        """
+        Converts an array-like of hand history hole card strings like
+        '[ 9c, Qs ]' (the 'SB cards' and 'BB cards' columns) to an int32
+        array of shape (N, 2).
+        Exceptions:
+            - ValueError: Raised for strings not in that format, or None.
+        """
+        values = np.asarray(cards)
+        codes = Card._char_codes(values, 11)
+        # the bytes around the two cards of '[ 9c, Qs ]'
+        layout = np.frombuffer(b'[ ,  ]', dtype=np.uint8)
+        invalid = ((codes[..., [0, 1, 4, 5, 8, 9]] != layout).any(axis=-1)
+                   | (codes[..., 10] != 0))
+        invalid = np.stack([invalid, invalid], axis=-1)
+        return Card._decode(codes[..., [2, 6]], codes[..., [3, 7]], invalid, values)
+
+    @staticmethod
+    def _char_codes(values, length):
+        """
+        Character codes of the first length characters of an array of
+        strings, with a trailing axis of size length, 0 after the end of
+        shorter strings. Non-ASCII characters are clipped to 255.
+        """
+        if values.dtype.kind == 'S':
+            return values.astype(f'S{length}').view(np.uint8).reshape(values.shape + (length,))
+        codes = values.astype(f'U{length}').view(np.uint32).reshape(values.shape + (length,))
+        return np.minimum(codes, 255)
+
+    @staticmethod
+    def _decode(rank_bytes, suit_bytes, invalid, values):
+        """
+        Card.new ints of the rank and suit bytes of cards, checking every card.
+        """
+        ranks = Card.RANK_BYTES[rank_bytes]
+        suits = Card.SUIT_BYTES[suit_bytes]
+        invalid = invalid | (ranks < 0) | (suits < 0)
+        if invalid.any():
+            position = np.argwhere(invalid)[0]
+            bad = values[tuple(position[:values.ndim])]
+            raise ValueError(f"Malformed card string {bad!r} at position {tuple(position.tolist())}")
+        return CARD_INTS[ranks * 4 + suits]
+
     @staticmethod
     def int_to_str(card_int):
         """
@@ -68,7 +153,7 @@ class Card ():
         """
         rank_int = Card.get_rank_int(card_int)
         suit_int = Card.get_suit_int(card_int)
-        return Card.STR_RANKS[rank_int] + Card.INT_SUIT_TO_CHAR_SUIT[suit_int]
+        return Card.STR_RANKS[rank_int - 2] + Card.INT_SUIT_TO_CHAR_SUIT[suit_int]
 
     @staticmethod
     def get_rank_int(card_int):
@@ -151,3 +236,52 @@ class Card ():
                 product *= Card.PRIMES[i]
 
         return product
+
+    @staticmethod
+    def canonicalize(hole, board, villain=None):
+        """
+        Relabels the suits of a situation into a canonical form, so that all
+        situations that only differ by a permutation of the suits (e.g.
+        AsKs/Qs7h2d and AhKh/Qh7s2d) give the same result.
+
+        Each suit is described by the ranks it holds in the hole cards, on
+        the board and in the villain hand, and the suits are handed the
+        canonical suits s, h, d, c in decreasing order of that description.
+        Suits with the same description are interchangeable, so ties do not
+        matter. The board is treated as a set of cards.
+
+        Params:
+            hole = list of cards in integer form
+            board = list of cards in integer form
+            villain = optional list of cards in integer form
+
+        Returns (hole, board, permutation), or (hole, board, villain,
+        permutation) when villain is given, where the card lists are sorted
+        from high to low and permutation maps each original suit int to its
+        canonical suit int (see permute_suits).
+        """
+        groups = [hole, board] + ([] if villain is None else [villain])
+        signature = {}
+        for suit in Card.INT_SUITS:
+            signature[suit] = tuple(
+                sum(c >> 16 for c in group if (c >> 12) & 0xF == suit) for group in groups)
+
+        order = sorted(Card.INT_SUITS, key=lambda suit: signature[suit], reverse=True)
+        permutation = dict(zip(order, Card.INT_SUITS))
+        canonical = [sorted(Card.permute_suits(group, permutation), reverse=True) for group in groups]
+        return tuple(canonical) + (permutation,)
+
+    @staticmethod
+    def permute_suits(card_ints, permutation):
+        """
+        Expects a list of cards in integer form and a dict mapping suit ints
+        to suit ints. Returns the cards with their suits replaced. The
+        inverse of a permutation from canonicalize maps canonical cards back:
+            {new: old for old, new in permutation.items()}
+        """
+        return [(c & ~0xF000) | (permutation[(c >> 12) & 0xF] << 12) for c in card_ints]
+
+
+# Card.new int of every card index rank * 4 + suit, the order of equity.DECK
+CARD_INTS = np.array([Card.new(rank + suit) for rank in Card.STR_RANKS for suit in Card.STR_SUITS],
+                     dtype=np.int32)
@@ -0,0 +1,316 @@
+"""
+dataset Module
+
+The dataset module stores the games of poker_dataframe.pkl as a columnar,
+partitioned Parquet dataset. Cards are uint8 indices into CARDS, actions are
+lists of (action code, amount in cents) and stacks are integer cents, so the
+columns load straight into arrays and every stage can read only the columns
+and streets it needs.
+
+Schema (one row per game):
+--------------
+- game_id (int64), file, player_sb, player_bb (string)
+- board, sb_cards, bb_cards (list<uint8>): card indices, null when unknown
+- preflop_actions, flop_actions, turn_actions, river_actions
+  (list<struct<action: uint8, cents: int32>>): null for streets not played
+- sb_stack, bb_stack (int32): stacks in cents
+- folded_pre (bool)
+- street (string): last street dealt, the partition key of the dataset
+
+Dependencies:
+--------------
+- pyarrow, an optional dependency installed with `pip install .[parquet]`
+
+Functions:
+--------------
+- to_table(df) / to_dataframe(table):
+    Converts between the poker_dataframe format and the columnar schema.
+
+- write_dataset(df, root, append=False):
+    Writes a poker_dataframe as a Parquet dataset partitioned by street,
+    replacing the streets it holds or adding to them.
+
+- read_dataset(root, columns=None, streets=None):
+    Reads the columns of the given streets back as a poker_dataframe.
+
+- read_poker_dataframe(path, columns=None, streets=None):
+    Reads either a pickled poker_dataframe or a Parquet dataset.
+
+- iter_dataset(root, columns=None, streets=None, batch_size=BATCH_SIZE):
+    Reads a Parquet dataset as a sequence of poker_dataframes of at most
+    batch_size games, one record batch at a time.
+
+- iter_poker_dataframe(path, columns=None, streets=None, batch_size=BATCH_SIZE):
+    Chunked version of read_poker_dataframe.
+
+Run `python -m winedge.dataset poker_dataframe.pkl <dataset directory>` to
+convert a pickled poker_dataframe.
+
+Exception:
+--------------
+- ImportError: Raised when pyarrow is needed but not installed.
+"""
+
+import os
+import uuid
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - optional dependency
+    pa = ds = pq = None
+
+from .actions import ACTIONS, ACTION_CODE, STREETS
+from .card import Card
+
+# card strings in the order of their uint8 index, the same order as equity.DECK
+CARDS = [rank + suit for rank in Card.STR_RANKS for suit in 'shdc']
+CARD_INDEX = {card: i for i, card in enumerate(CARDS)}
+
+# games per chunk of iter_dataset
+BATCH_SIZE = 65536
+
+# poker_dataframe column of each dataset column
+COLUMN_NAMES = {
+    'Game ID': 'game_id', 'File': 'file', 'Player SB': 'player_sb', 'Player BB': 'player_bb',
+    'Preflop actions': 'preflop_actions', 'Flop actions': 'flop_actions',
+    'Turn actions': 'turn_actions', 'River actions': 'river_actions',
+    'Flop': 'board', 'Turn': 'board', 'River': 'board', 'SB stack': 'sb_stack',
+    'BB stack': 'bb_stack', 'SB cards': 'sb_cards', 'BB cards': 'bb_cards',
+    'Folded pre': 'folded_pre'}
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("The Parquet dataset needs pyarrow: pip install pyarrow")
+
+
+def schema():
+    """
+    The pyarrow schema of the dataset, with the street partition column.
+    """
+    _require_pyarrow()
+    cards = pa.list_(pa.uint8())
+    actions = pa.list_(pa.struct([('action', pa.uint8()), ('cents', pa.int32())]))
+    return pa.schema([
+        ('game_id', pa.int64()), ('file', pa.string()),
+        ('player_sb', pa.string()), ('player_bb', pa.string()),
+        ('board', cards), ('sb_cards', cards), ('bb_cards', cards),
+        ('preflop_actions', actions), ('flop_actions', actions),
+        ('turn_actions', actions), ('river_actions', actions),
+        ('sb_stack', pa.int32()), ('bb_stack', pa.int32()),
+        ('folded_pre', pa.bool_()), ('street', pa.string())])
+
+
+def to_cents(amount):
+    """
+    Converts an amount string like '0.04' (or the 0 of folds and checks) to
+    integer cents.
+    """
+    return round(float(amount) * 100)
+
+
+def from_cents(cents):
+    """
+    Formats integer cents like the amounts of process_street_actions.
+    """
+    return f'{cents // 100}.{cents % 100:02d}'
+
+
+def _hole_cards(cards):
+    """
+    Card indices of a '[ 9c, Qs ]' string, or None.
+    """
+    if cards is None:
+        return None
+    return [CARD_INDEX[card] for card in cards.strip('[ ]').split(', ')]
+
+
+def _actions(actions):
+    """
+    (action code, cents) of a street's actions, or None.
+    """
+    if actions is None:
+        return None
+    return [{'action': ACTION_CODE[action], 'cents': to_cents(amount)} for action, amount in actions]
+
+
+def _legacy_actions(actions):
+    """
+    Inverse of _actions.
+    """
+    if actions is None:
+        return None
+    # folds and checks have the int 0 as amount
+    return [(ACTIONS[action['action']], from_cents(action['cents']) if action['action'] > 1 else 0)
+            for action in actions]
+
+
+def to_table(df):
+    """
+    Converts a poker_dataframe (see hand_history.COLUMNS) to a pyarrow Table
+    with the schema of this module.
+    """
+    _require_pyarrow()
+    boards = []
+    streets = []
+    for flop, turn, river in zip(df['Flop'], df['Turn'], df['River']):
+        cards = ([] if flop is None else list(flop)) + [card for card in (turn, river) if card is not None]
+        boards.append([CARD_INDEX[card] for card in cards] if cards else None)
+        streets.append(STREETS[{0: 0, 3: 1, 4: 2, 5: 3}[len(cards)]])
+
+    columns = {
+        'game_id': pd.to_numeric(df['Game ID']).to_numpy('int64'),
+        'file': df['File'].tolist(),
+        'player_sb': df['Player SB'].tolist(),
+        'player_bb': df['Player BB'].tolist(),
+        'board': boards,
+        'sb_cards': [_hole_cards(cards) for cards in df['SB cards']],
+        'bb_cards': [_hole_cards(cards) for cards in df['BB cards']],
+        'preflop_actions': [_actions(actions) for actions in df['Preflop actions']],
+        'flop_actions': [_actions(actions) for actions in df['Flop actions']],
+        'turn_actions': [_actions(actions) for actions in df['Turn actions']],
+        'river_actions': [_actions(actions) for actions in df['River actions']],
+        'sb_stack': [to_cents(stack) for stack in df['SB stack']],
+        'bb_stack': [to_cents(stack) for stack in df['BB stack']],
+        'folded_pre': df['Folded pre'].astype(bool).tolist(),
+        'street': streets,
+    }
+    return pa.table(columns, schema=schema())
+
+
+def to_dataframe(table):
+    """
+    Converts a table with (some of) the columns of this module back to a
+    poker_dataframe, with only the poker_dataframe columns the table holds.
+    """
+    _require_pyarrow()
+    names = set(table.column_names)
+    df = pd.DataFrame(index=pd.RangeIndex(table.num_rows))
+    for legacy, column in COLUMN_NAMES.items():
+        if column not in names:
+            continue
+        values = table.column(column).to_pylist()
+        if column == 'game_id':
+            values = [str(game_id) for game_id in values]
+        elif column == 'board':
+            position = {'Flop': slice(0, 3), 'Turn': 3, 'River': 4}[legacy]
+            size = {'Flop': 3, 'Turn': 4, 'River': 5}[legacy]
+            values = [None if board is None or len(board) < size else
+                      [CARDS[card] for card in board[position]] if legacy == 'Flop' else
+                      CARDS[board[position]] for board in values]
+        elif column in ('sb_cards', 'bb_cards'):
+            values = [None if cards is None else '[ ' + ', '.join(CARDS[card] for card in cards) + ' ]'
+                      for cards in values]
+        elif column.endswith('_actions'):
+            values = [_legacy_actions(actions) for actions in values]
+        elif column in ('sb_stack', 'bb_stack'):
+            values = [from_cents(stack) for stack in values]
+        df[legacy] = pd.Series(values, dtype=bool if column == 'folded_pre' else object)
+    return df
+
+
+def write_dataset(df, root, append=False):
+    """
+    Writes a poker_dataframe as a Parquet dataset under root, one directory
+    per street (street=river, ...).
+    Args:
+        - df: poker_dataframe to write.
+        - root: Directory of the dataset.
+        - append: By default every street present in df replaces that whole
+        street on disk, deleting the games stored there before, while the
+        other streets are kept. With append=True the games are written to new
+        files next to the existing ones, e.g. to add a new batch of hand
+        histories; writing the same games twice then stores them twice.
+    """
+    _require_pyarrow()
+    if append:
+        pq.write_to_dataset(to_table(df), root, partition_cols=['street'],
+                            basename_template=f'part-{uuid.uuid4().hex}-{{i}}.parquet',
+                            existing_data_behavior='overwrite_or_ignore')
+    else:
+        pq.write_to_dataset(to_table(df), root, partition_cols=['street'],
+                            existing_data_behavior='delete_matching')
+
+
+def _dataset_scan(root, columns, streets):
+    """
+    The pyarrow dataset under root, the dataset columns needed for the
+    poker_dataframe columns and the street filter.
+    """
+    dataset = ds.dataset(root, format='parquet', partitioning='hive')
+    needed = list(dict.fromkeys(COLUMN_NAMES[column] for column in columns))
+    row_filter = None if streets is None else ds.field('street').isin(list(streets))
+    return dataset, needed, row_filter
+
+
+def read_dataset(root, columns=None, streets=None):
+    """
+    Reads a Parquet dataset written by write_dataset back as a poker_dataframe.
+    Args:
+        - root: Directory of the dataset.
+        - columns: poker_dataframe columns to read, all of them by default.
+        Only the dataset columns they need are loaded.
+        - streets: Last streets to read, e.g. ['river'], all by default.
+    Return:
+        - pandas dataframe with the requested columns, grouped by street.
+    """
+    _require_pyarrow()
+    if columns is None:
+        columns = list(COLUMN_NAMES)
+    dataset, needed, row_filter = _dataset_scan(root, columns, streets)
+    df = to_dataframe(dataset.to_table(columns=needed, filter=row_filter))
+    return df[list(columns)]
+
+
+def iter_dataset(root, columns=None, streets=None, batch_size=BATCH_SIZE):
+    """
+    Reads a Parquet dataset written by write_dataset one record batch at a
+    time, so only one chunk of games is in memory.
+    Args:
+        - root, columns, streets: As in read_dataset.
+        - batch_size: Maximum number of games per chunk.
+    Return:
+        - Generator of pandas dataframes with the requested columns.
+    """
+    _require_pyarrow()
+    if columns is None:
+        columns = list(COLUMN_NAMES)
+    dataset, needed, row_filter = _dataset_scan(root, columns, streets)
+    for batch in dataset.to_batches(columns=needed, filter=row_filter, batch_size=batch_size):
+        if batch.num_rows:
+            yield to_dataframe(pa.Table.from_batches([batch]))[list(columns)]
+
+
+def read_poker_dataframe(path, columns=None, streets=None):
+    """
+    Reads a poker_dataframe from a pickle file, or from a Parquet dataset
+    directory with only the given columns and streets.
+    """
+    if os.path.isdir(path):
+        return read_dataset(path, columns, streets)
+    return pd.read_pickle(path)
+
+
+def iter_poker_dataframe(path, columns=None, streets=None, batch_size=BATCH_SIZE):
+    """
+    Chunked version of read_poker_dataframe. A Parquet dataset is streamed
+    with iter_dataset; a pickle can only be loaded whole, and is then split
+    into chunks of batch_size games.
+    """
+    if os.path.isdir(path):
+        yield from iter_dataset(path, columns, streets, batch_size)
+        return
+    df = pd.read_pickle(path)
+    for start in range(0, len(df), batch_size):
+        yield df[start:start + batch_size]
+
+
+if __name__ == '__main__':
+    import sys
+    if len(sys.argv) != 3:
+        sys.exit("usage: python -m winedge.dataset <poker_dataframe.pkl> <dataset directory>")
+    write_dataset(pd.read_pickle(sys.argv[1]), sys.argv[2])
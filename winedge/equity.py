@@ -0,0 +1,304 @@
+"""
+Equity Module
+
+The equity module estimates how often a heads up hand wins before the board is
+complete. The remaining deck is sampled in batches and every sampled runout is
+scored at once with Evaluator.evaluate_many, so an estimate at the flop takes a
+few milliseconds.
+
+When there are only a few possible runouts (the turn, or a known villain hand on
+the flop) they are all enumerated instead, giving the exact equity. Exact results
+are memoized, so repeated queries for the same spot return instantly.
+
+Dependencies:
+--------------
+- card.py
+- evaluator.py
+
+Functions:
+--------------
+- equity(hero_cards, board, villain, iterations, seed, target_width, exact):
+    Win, tie and loss probabilities of the hero hand against a known villain hand
+    or a random one, with a confidence interval on the equity. Exact when the
+    number of runouts is at most EXACT_LIMIT, Monte Carlo otherwise.
+
+- exact_equity(hero_cards, board, villain):
+    Exact win, tie and loss probabilities by enumerating every runout.
+
+Exception:
+--------------
+- ValueError: Raised for invalid hand or board sizes and duplicate cards.
+"""
+
+import functools
+from collections import namedtuple
+from math import comb
+from statistics import NormalDist
+
+import numpy as np
+
+from .card import Card
+from .evaluator import Evaluator
+
+# every card of the deck as 32 bit ints generated by the card.py module
+DECK = np.array([Card.new(rank + suit) for rank in Card.STR_RANKS for suit in 'shdc'],
+                dtype=np.int32)
+DECK_INDEX = {card: i for i, card in enumerate(DECK.tolist())}
+
+# equity picks exact enumeration up to this many runouts
+EXACT_LIMIT = 50000
+# number of exact results kept by the memoization
+EXACT_CACHE_SIZE = 4096
+# rows scored per batch when enumerating against a random villain hand
+EXACT_BATCH_SIZE = 200000
+
+EquityResult = namedtuple('EquityResult', ['win', 'tie', 'loss', 'equity', 'interval', 'iterations'])
+EquityResult.__doc__ = """
+Outcome of an equity calculation, from the hero's point of view.
+    - win, tie, loss: Fraction of the runouts the hero wins, ties and loses.
+    - equity: Share of the pot the hero wins on average (win + tie / 2).
+    - interval: (low, high) confidence interval of the equity, a single point when exact.
+    - iterations: Number of runouts evaluated.
+"""
+
+
+def check_cards(hero_cards, board, villain=None):
+    """
+    Checks the cards of an equity calculation.
+    Args:
+        - hero_cards: The two hole cards of the hero (ints from Card.new).
+        - board: The 0 to 5 board cards dealt so far.
+        - villain: The two hole cards of the villain, or None when unknown.
+    Return:
+        - (hero, board, villain, deck): int32 arrays of the cards and of the
+        cards left in the deck.
+    Exceptions:
+        - ValueError: Raised for invalid hand or board sizes and duplicate cards.
+    """
+    hero = np.asarray(hero_cards, dtype=np.int32).reshape(-1)
+    board = np.asarray(board, dtype=np.int32).reshape(-1)
+    villain = None if villain is None else np.asarray(villain, dtype=np.int32).reshape(-1)
+    if len(hero) != 2 or (villain is not None and len(villain) != 2):
+        raise ValueError("Hole cards must be exactly two cards.")
+    if len(board) > 5:
+        raise ValueError("The board holds at most five cards.")
+
+    dead = hero.tolist() + board.tolist() + ([] if villain is None else villain.tolist())
+    if len(set(dead)) < len(dead):
+        raise ValueError("Duplicate cards found in the input.")
+    if not all(card in DECK_INDEX for card in dead):
+        raise ValueError("Unknown card found in the input.")
+    live = np.ones(len(DECK), dtype=bool)
+    live[[DECK_INDEX[card] for card in dead]] = False
+    return hero, board, villain, DECK[live]
+
+
+def deal(rng, deck, n_runouts, n_cards):
+    """
+    Deals n_cards from the deck without replacement, independently for each of
+    n_runouts rows. Returns an int32 array of shape (n_runouts, n_cards).
+    """
+    keys = rng.random((n_runouts, len(deck)))
+    order = np.argpartition(keys, n_cards - 1, axis=1)[:, :n_cards]
+    # argpartition leaves the dealt cards in deck order, so shuffle them by
+    # their keys before they are split between the board and the villain
+    order = np.take_along_axis(order, np.argsort(np.take_along_axis(keys, order, axis=1), axis=1), axis=1)
+    return deck[order]
+
+
+def showdown(evaluator, hero, villain, board):
+    """
+    Compares the hero and villain hands on complete boards, one runout per row.
+    The board cards are only counted once for both players.
+    Args:
+        - evaluator: The Evaluator used to rank the hands.
+        - hero, villain: int32 arrays of shape (N, 2) or (2,) of hole cards.
+        - board: int32 array of shape (N, 5) of board cards.
+    Return:
+        - int8 array with 1 where the hero wins, 0 on a tie and -1 on a loss.
+    """
+    board_state = evaluator._card_state(board)
+    hero_state = evaluator._card_state(np.reshape(hero, (-1, 2)))
+    villain_state = evaluator._card_state(np.reshape(villain, (-1, 2)))
+    hero_rank = evaluator._state_ranks(evaluator._add_states(board_state, hero_state))
+    villain_rank = evaluator._state_ranks(evaluator._add_states(board_state, villain_state))
+    return np.sign(villain_rank.astype(np.int32) - hero_rank).astype(np.int8)
+
+
+def summarize(wins, ties, losses, confidence=0.95):
+    """
+    Builds the EquityResult of win, tie and loss counts, with a normal
+    approximation confidence interval on the equity.
+    """
+    total = wins + ties + losses
+    win, tie, loss = wins / total, ties / total, losses / total
+    share = win + tie / 2
+    # each runout pays 1, 1/2 or 0 of the pot
+    variance = max(win + tie / 4 - share ** 2, 0.0)
+    margin = NormalDist().inv_cdf(0.5 + confidence / 2) * np.sqrt(variance / total)
+    return EquityResult(win, tie, loss, share, (max(share - margin, 0.0), min(share + margin, 1.0)),
+                        total)
+
+
+def count_runouts(n_deck, n_board, villain_known):
+    """
+    Number of distinct runouts with n_board cards still to come from a deck of
+    n_deck cards, times the villain hands when the villain is unknown.
+    """
+    runouts = comb(n_deck, n_board)
+    return runouts if villain_known else runouts * comb(n_deck - n_board, 2)
+
+
+@functools.lru_cache(maxsize=None)
+def combinations(n, k):
+    """
+    Read-only int array of shape (comb(n, k), k) with every k-subset of range(n).
+    """
+    combos = index_combinations(n, k)
+    combos.flags.writeable = False
+    return combos
+
+
+def index_combinations(n, k, dtype=np.intp):
+    """
+    Every k-subset of range(n) as rows of an array, in the same lexicographic
+    order as itertools.combinations, built one column at a time with numpy.
+    """
+    combos = np.zeros((1, 0), dtype=dtype)
+    for position in range(k):
+        start = combos[:, -1].astype(np.intp) + 1 if position else np.zeros(1, dtype=np.intp)
+        lengths = np.maximum(n - k + position + 1 - start, 0)
+        rows = np.repeat(np.arange(len(combos)), lengths)
+        # every value from start up to the last one that leaves room for the rest
+        values = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths - start, lengths)
+        combos = np.column_stack([combos[rows], values.astype(dtype)])
+    return combos
+
+
+def exact_equity(hero_cards, board, villain=None):
+    """
+    Computes the exact equity of a heads up hand by enumerating every remaining
+    runout, and every villain hand when the villain is unknown. The board part
+    of each runout is counted once and shared by both players. Results are
+    memoized per canonical (hand, board, villain) from Card.canonicalize, so
+    the order of the cards and relabellings of the suits share one entry.
+    Args:
+        - hero_cards: The two hole cards of the hero (ints from Card.new).
+        - board: The 0 to 5 board cards dealt so far (ints from Card.new).
+        - villain: The two hole cards of the villain, or None for a random hand.
+    Return:
+        - EquityResult with the exact probabilities, a single point interval and
+        the number of runouts as iterations.
+    Exceptions:
+        - ValueError: Raised for invalid hand or board sizes and duplicate cards.
+    """
+    # check before canonicalizing, which cannot relabel unknown cards
+    hero, board, villain, _ = check_cards(hero_cards, board, villain)
+    hero_cards = hero.tolist()
+    board = board.tolist()
+    if villain is None:
+        hero_cards, board, _ = Card.canonicalize(hero_cards, board)
+        return _exact_equity(tuple(hero_cards), tuple(board), None)
+    hero_cards, board, villain, _ = Card.canonicalize(hero_cards, board, villain.tolist())
+    return _exact_equity(tuple(hero_cards), tuple(board), tuple(villain))
+
+
+@functools.lru_cache(maxsize=EXACT_CACHE_SIZE)
+def _exact_equity(hero, board, villain):
+    """
+    Memoized body of exact_equity, keyed by the canonical card tuples. Invalid
+    cards raise before anything is cached.
+    """
+    hero, board, villain, deck = check_cards(hero, board, villain)
+    evaluator = Evaluator()
+
+    runouts = deck[combinations(len(deck), 5 - len(board))]
+    boards = np.concatenate([np.broadcast_to(board, (len(runouts), len(board))), runouts], axis=1)
+    board_state = evaluator._card_state(boards)
+    hero_rank = evaluator._state_ranks(
+        evaluator._add_states(board_state, evaluator._card_state(hero[None])))
+
+    counts = np.zeros(3, dtype=np.int64)
+    if villain is not None:
+        villain_rank = evaluator._state_ranks(
+            evaluator._add_states(board_state, evaluator._card_state(villain[None])))
+        counts += np.bincount(np.sign(villain_rank.astype(np.int32) - hero_rank) + 1, minlength=3)
+    else:
+        villains = deck[combinations(len(deck), 2)]
+        villain_state = evaluator._card_state(villains)
+        step = max(1, EXACT_BATCH_SIZE // len(villains))
+        for start in range(0, len(runouts), step):
+            board_index = np.repeat(np.arange(start, min(start + step, len(runouts))), len(villains))
+            villain_index = np.tile(np.arange(len(villains)), len(board_index) // len(villains))
+            # drop villain hands holding a card of the runout
+            free = ~(villains[villain_index][:, :, None] ==
+                     runouts[board_index][:, None, :]).any(axis=(1, 2))
+            board_index, villain_index = board_index[free], villain_index[free]
+            villain_rank = evaluator._state_ranks(evaluator._add_states(
+                tuple(part[board_index] for part in board_state),
+                tuple(part[villain_index] for part in villain_state)))
+            counts += np.bincount(
+                np.sign(villain_rank.astype(np.int32) - hero_rank[board_index]) + 1, minlength=3)
+
+    result = summarize(int(counts[2]), int(counts[1]), int(counts[0]))
+    return result._replace(interval=(result.equity, result.equity))
+
+
+def equity(hero_cards, board, villain=None, iterations=10000, seed=None,
+           target_width=None, confidence=0.95, batch_size=1000, exact=None,
+           exact_limit=EXACT_LIMIT):
+    """
+    Estimates the equity of a heads up hand by sampling the rest of the board,
+    and the villain hand when it is not known, from the remaining deck.
+    Args:
+        - hero_cards: The two hole cards of the hero (ints from Card.new).
+        - board: The 0 to 5 board cards dealt so far (ints from Card.new).
+        - villain: The two hole cards of the villain, or None to play against
+        a random hand.
+        - iterations: Maximum number of runouts to sample.
+        - seed: Seed of the random generator, for reproducible results.
+        - target_width: If set, stop as soon as the confidence interval is
+        narrower than this (e.g. 0.02 for +/- 1%), checked after every batch.
+        - confidence: Confidence level of the interval.
+        - batch_size: Number of runouts evaluated per numpy batch.
+        - exact: True to enumerate every runout with exact_equity, False to
+        always sample, None to enumerate when there are at most exact_limit
+        runouts (e.g. on the turn, or on the flop against a known hand).
+        - exact_limit: Largest number of runouts enumerated when exact is None.
+    Return:
+        - EquityResult with the win, tie and loss probabilities of the hero,
+        the equity and its confidence interval.
+    Exceptions:
+        - ValueError: Raised for invalid hand or board sizes, duplicate cards
+        and fewer than 1 iteration.
+    """
+    if iterations < 1:
+        raise ValueError("At least one iteration is needed.")
+    hero, board, villain, deck = check_cards(hero_cards, board, villain)
+    n_runouts = count_runouts(len(deck), 5 - len(board), villain is not None)
+    if exact or (exact is None and n_runouts <= exact_limit):
+        return exact_equity(hero, board, villain)
+
+    evaluator = Evaluator()
+    rng = np.random.default_rng(seed)
+
+    n_board = 5 - len(board)
+    n_cards = n_board + (2 if villain is None else 0)
+    counts = np.zeros(3, dtype=np.int64)
+    while counts.sum() < iterations:
+        size = min(batch_size, iterations - counts.sum())
+        if n_cards:
+            dealt = deal(rng, deck, size, n_cards)
+        else:
+            dealt = np.zeros((size, 0), dtype=np.int32)
+        runout = np.concatenate([np.broadcast_to(board, (size, len(board))), dealt[:, :n_board]],
+                                axis=1)
+        opponent = dealt[:, n_board:] if villain is None else villain
+        counts += np.bincount(showdown(evaluator, hero, opponent, runout) + 1, minlength=3)
+
+        if target_width is not None:
+            low, high = summarize(counts[2], counts[1], counts[0], confidence).interval
+            if high - low <= target_width:
+                break
+
+    return summarize(int(counts[2]), int(counts[1]), int(counts[0]), confidence)
@@ -32,20 +32,78 @@ Evaluator Functions:
 - class_to_string(class_int):
     Converts the class integer generated by the get_rank_class function and the lookup.py module 
     and converts it to a string indicating the type of hand a player has. (e.g. "Two Pair")
+    Arrays of classes give a pandas Categorical.
 
 - get_rank_percentage(hand_rank):
     Normalizes the hand rank score from integers ranging in [1, 7462] to floating numbers ranging
     from 0 to 1 indicating the percentage of poker hands that a given hand beats.
 
+get_rank_class and get_rank_percentage index tables with an entry for every
+hand rank, so they take a single rank or a numpy array of ranks.
+
+- evaluate_mask(cards_mask, board_mask):
+    Version of evaluate for the Hand and Board card masks of the hand.py module.
+
+- evaluate_many(cards, board), get_rank_class_many(hand_ranks),
+  get_rank_percentage_many(hand_ranks):
+    Batch versions of the functions above working on numpy arrays with one hand per row.
+
+- state(cards, board):
+    Starts a HandState, which updates the rank of a hand card by card as
+    the board is dealt.
+
+- evaluate_partial(cards, board):
+    Made hand class and draws of 2 to 6 cards, e.g. the hole cards alone or
+    the hole cards and the flop.
+
+Classes:
+--------------
+- HandState:
+    Incremental evaluation of one hand, street by street.
+
 Exception:
 --------------
 - ValueError: Raised when an invalid hand rank is encountered.
 """
 
-import itertools
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
 from .card import Card
+from .hand import CardSet, INDEX_INTS, INDEX_PRIMES, INDEX_SUIT_COUNTS, SUIT_MASKS, card_index
 from .lookup import LookupTable
 
+PartialEvaluation = namedtuple('PartialEvaluation',
+                               ['rank_class', 'flush_draw', 'open_ended', 'gutshot', 'outs'])
+
+
+def _read_only(array):
+    array.setflags(write=False)
+    return array
+
+
+def _straight_draw_table():
+    """
+    For every 13-bit rank mask without a straight, the mask of the ranks
+    that would complete one (0 for masks that hold a straight). Aces also
+    count low.
+    """
+    masks = np.arange(1 << 13)
+    low = (masks << 1) | (masks >> 12 & 1)
+    straight = np.zeros(1 << 13, dtype=bool)
+    for start in range(10):
+        window = 0x1F << start
+        straight |= (low & window) == window
+    draws = np.zeros(1 << 13, dtype=np.int64)
+    for rank in range(13):
+        missing = (masks >> rank & 1) == 0
+        draws |= (missing & straight[masks | 1 << rank]).astype(np.int64) << rank
+    draws[straight] = 0
+    return draws.tolist()
+
+
 class Evaluator(object):
     """
     The Evaluator class provides methods for evaluating the hand strength of a Texas Hold'em poker
@@ -59,7 +117,7 @@ class Evaluator(object):
 
     Attributes:
     --------------
-    - table: An instance of the LookupTable class.
+    - table: The process-wide LookupTable shared by all evaluators (LookupTable.shared).
 
     - hand_size_map: A dictionary mapping the number of cards on the board to corresponding
     evaluation functions.
@@ -75,16 +133,48 @@ class Evaluator(object):
 
     - class_to_string(class_int):
         Converts the class integer generated by the get_rank_class function to a string indicating
-        the type of hand a player has (e.g., "Two Pair").
+        the type of hand a player has (e.g., "Two Pair"), or an array of classes to a Categorical.
 
     - get_rank_percentage(hand_rank):
         Normalizes the hand rank score from integers ranging in [1, 7462] to floating numbers
         ranging from 0 to 1, indicating the percentage of poker hands that a given hand beats.
+
+    - state(cards, board):
+        Returns a HandState to evaluate a hand incrementally as cards are added.
+
+    - evaluate_many(cards, board):
+        Evaluates a whole array of hands at once with numpy.
+
+    - get_rank_class_many(hand_ranks), get_rank_percentage_many(hand_ranks):
+        Array versions of get_rank_class and get_rank_percentage.
     """
 
+    # highest hand rank of each rank class, in class order
+    RANK_CLASS_MAX = np.array(sorted(LookupTable.MAX_TO_RANK_CLASS))
+    # class and percentage of every hand rank from 0 to 7462, and the class
+    # names in class order (class - 1 is the code of a Categorical)
+    RANK_CLASSES = _read_only(np.searchsorted(RANK_CLASS_MAX,
+                                              np.arange(LookupTable.MAX_HIGH_CARD + 1)) + 1)
+    RANK_PERCENTAGES = _read_only(1 - np.arange(LookupTable.MAX_HIGH_CARD + 1)
+                                  / float(LookupTable.MAX_HIGH_CARD))
+    CLASS_NAMES = [LookupTable.RANK_CLASS_TO_STRING[rank_class]
+                   for rank_class in range(1, len(RANK_CLASS_MAX) + 1)]
+    # tuple copies, faster to index with a Python int
+    _RANK_CLASS_TUPLE = tuple(RANK_CLASSES.tolist())
+    _RANK_PERCENTAGE_TUPLE = tuple(RANK_PERCENTAGES.tolist())
+
+    # one 4-bit counter per suit, indexed by the cdhs bits of a card
+    SUIT_NIBBLE = (0, 0x1, 0x10, 0, 0x100, 0, 0, 0, 0x1000)
+    # suit bits of the flush, keyed by the top bit of its full counter
+    FLUSH_NIBBLE_TO_SUIT = {0x8: 0x1000, 0x80: 0x2000, 0x800: 0x4000, 0x8000: 0x8000}
+    # column of each suit in the batch evaluator, indexed by the cdhs bits of a card
+    SUIT_INDEX = np.array([0, 0, 1, 0, 2, 0, 0, 0, 3])
+    # ranks completing a straight for every rank mask, see evaluate_partial
+    STRAIGHT_DRAWS = _straight_draw_table()
+
     def __init__(self):
 
-        self.table = LookupTable()
+        self.table = LookupTable.shared()
 
         self.hand_size_map = {
             5: self._flop,
@@ -99,22 +189,111 @@ class Evaluator(object):
         hands.
         Arg:
             - cards: List of 32 bit int generated by the card.py module detailing the number and
-            suite of the players hand cards.
+            suite of the players hand cards, or a hand.Hand.
             - board: List of 32 bit int generated by the card.py module detailing the number and
-            suite of the board cards.
+            suite of the board cards, or a hand.Board. A list given with a hand.Hand or a
+            hand.Board is converted to a card mask.
         Return:
             - (int) rank from 1 to 7462 of the poker hand out of all possible poker hands.
             Lower rank indicates a stronger hand. (e.g. Royal Flush Rank = 1)
         """
 
+        if isinstance(cards, CardSet) or isinstance(board, CardSet):
+            # a list given with a Hand or a Board is converted to a card mask
+            cards_mask = cards.mask if isinstance(cards, CardSet) else CardSet(cards).mask
+            board_mask = board.mask if isinstance(board, CardSet) else CardSet(board).mask
+            return self.evaluate_mask(cards_mask, board_mask)
+
         all_cards = cards + board
-        
+
         # Check for duplicate cards
         if len(set(all_cards)) < len(all_cards):
             raise ValueError("Duplicate cards found in the input.")
 
         return self.hand_size_map[len(all_cards)](all_cards)
 
+    def evaluate_mask(self, cards_mask, board_mask):
+        """
+        Version of evaluate for the card masks of the hand.py module, the
+        duplicate check is a bitwise AND and the cards are read from the
+        bits of the mask without building a list.
+        Args:
+            - cards_mask, board_mask: Card masks of the hole cards and the board.
+        Return:
+            - (int) rank from 1 to 7462 of the poker hand.
+        """
+        if cards_mask & board_mask:
+            raise ValueError("Duplicate cards found in the input.")
+        mask = cards_mask | board_mask
+        if mask.bit_count() not in self.hand_size_map:
+            raise ValueError("Expected 5, 6 or 7 cards.")
+
+        suit_counts = 0
+        product = 1
+        rest = mask
+        while rest:
+            low = rest & -rest
+            index = low.bit_length() - 1
+            suit_counts += INDEX_SUIT_COUNTS[index]
+            product *= INDEX_PRIMES[index]
+            rest ^= low
+
+        # adding 3 to each 4-bit suit count sets its top bit once it reaches 5
+        flush = (suit_counts + 0x3333) & 0x8888
+        if flush:
+            rankbits = 0
+            rest = mask & SUIT_MASKS[flush.bit_length() // 4 - 1]
+            while rest:
+                low = rest & -rest
+                rankbits |= INDEX_INTS[low.bit_length() - 1]
+                rest ^= low
+            return self.table.flush_lookup_7[rankbits >> 16]
+
+        return self.table.unsuited_lookup_7[product]
+
+    def state(self, cards=(), board=()):
+        """
+        Starts the incremental evaluation of a hand.
+        Args:
+            - cards, board: Card strings or 32 bit ints of the hole cards and
+            of the board dealt so far.
+        Return:
+            - HandState holding the cards, see HandState.add_card.
+        """
+        state = HandState(self.table)
+        for card in list(cards) + list(board):
+            state.add_card(card)
+        return state
+
+    def evaluate_partial(self, cards, board=()):
+        """
+        Evaluates 2 to 6 cards, e.g. the hole cards preflop or the hole cards
+        and the flop, without enumerating the cards to come. The made hand
+        comes from the rank bits of the suits and the draws from a table of
+        the ranks that complete a straight for every rank mask.
+        Args:
+            - cards, board: Card strings or 32 bit ints, or a hand.Hand and a
+            hand.Board.
+        Return:
+            - PartialEvaluation(rank_class, flush_draw, open_ended, gutshot,
+            outs): the class (1 to 9, see class_to_string) of the best hand
+            made so far, whether 4 cards share a suit, whether 2 ranks (open
+            ended or double gutshot) or 1 rank (gutshot) complete a straight,
+            and the number of unseen cards that complete a straight or a
+            flush. Only draws to a better hand count: no straight draws once
+            a straight or better is made, no flush draw once a flush or
+            better is made.
+        Exceptions:
+            - ValueError: Raised for duplicate cards and for fewer than 2 or
+            more than 6 cards.
+        """
+        if isinstance(cards, CardSet):
+            cards, board = list(cards), list(board)
+        state = self.state(cards, board)
+        if not 2 <= state.size <= 6:
+            raise ValueError("Expected 2 to 6 cards.")
+        return state.partial()
+
     def _flop(self, cards):
         """
         Fundamental evaluation function. It provides a rank in the range [1, 7462].
@@ -123,71 +302,56 @@ class Evaluator(object):
         # check flush
         if cards[0] & cards[1] & cards[2] & cards[3] & cards[4] & 0xF000:
             handOR = (cards[0] | cards[1] | cards[2] | cards[3] | cards[4]) >> 16
-            prime = Card.prime_product_from_rankbits(handOR)
-            return self.table.flush_lookup[prime]
+            return self.table.flush_lookup_7[handOR]
 
         # other patterns
         else:
             prime = Card.prime_product_from_hand(cards)
-            return self.table.unsuited_lookup[prime]
+            return self.table.unsuited_lookup_7[prime]
 
     def _turn(self, cards):
         """
-        Iterate all possible combinations of 5 cards from a 
-        total of 6 cards and apply the five-card evaluation 
-        on each combination. Then determine the combination with
-        the best rank.
+        Evaluates a 6 card hand. Shares the direct lookup of the _river
+        function since the 7 card tables also cover 6 card hands.
         Args:
             cards: Six card objects (ints) generated by the card.py module.
         Returns:
             max_rank: The maximum rank of all the five card hads possible given
             the six input cards. (int from 1 to 7462)
         """
-
-        # set initial rank to be the lowest(unsuited 7-5-4-3-2), which
-        # numerically is essentially the largest: 7462
-        max_rank = LookupTable.MAX_HIGH_CARD
-
-        allcombos = itertools.combinations(cards, 5)
-
-        for combo in allcombos:
-
-            score = self._flop(combo)
-            if score < max_rank:
-                # since the strength of a given hand is higher when the rank is smaller,
-                # we should always return the smallest possible score.
-                max_rank = score
-
-        return max_rank
+        return self._river(cards)
 
     def _river(self, cards):
         """
-        Iterate all possible combinations of 5 cards from a 
-        total of 7 cards and apply the five-card evaluation 
-        on each combination. Then determine the combination with
-        the best rank.
+        Evaluates the best 5 card hand out of 6 or 7 cards without trying
+        every combination. The suits are counted first: if 5 or more cards
+        share a suit the rankbits of that suit give the best flush directly,
+        otherwise the prime product of all the cards gives the best unsuited
+        hand. Either way it is a single lookup in the 7 card tables built by
+        LookupTable.best_of_seven.
         Args:
             cards: Seven card objects (ints) generated by the card.py module.
         Returns:
             max_rank: The maximum rank of all the five card hads possible given
             the seven input cards. (int from 1 to 7462)
         """
-
-        # set initial rank to be the lowest(unsuited 7-5-4-3-2),
-        # which numerically is essentially the largest: 7462
-        max_rank = LookupTable.MAX_HIGH_CARD
-
-        allcombos = itertools.combinations(cards, 5)
-
-        for combo in allcombos:
-
-            score = self._flop(combo)
-            if score < max_rank:
-                # since the strength of a given hand is higher when the rank is smaller, we
-                # should always return the smallest possible score.
-                max_rank = score
-
-        return max_rank
+        suit_counts = 0
+        product = 1
+        for c in cards:
+            suit_counts += self.SUIT_NIBBLE[(c >> 12) & 0xF]
+            product *= c & 0xFF
+
+        # adding 3 to each 4-bit suit count sets its top bit once it reaches 5
+        flush = (suit_counts + 0x3333) & 0x8888
+        if flush:
+            suit = self.FLUSH_NIBBLE_TO_SUIT[flush]
+            rankbits = 0
+            for c in cards:
+                if c & suit:
+                    rankbits |= c
+            return self.table.flush_lookup_7[rankbits >> 16]
+
+        return self.table.unsuited_lookup_7[product]
 
     def get_rank_class(self, hand_rank):
         """
@@ -205,33 +369,40 @@ class Evaluator(object):
             9: "High Card"
         Arg:
             - hand_rank(int): Hand rank generated by the evaluate function. Int within
-            range [1,7462].
+            range [1,7462], or an array of hand ranks.
         Return:
-            - Hand class (int) of the poker hand rank.
+            - Hand class (int) of the poker hand rank, or an array of classes.
         Exceptions:
             - ValueError: Raise if input is not an integer from 1 to 7462.
         """
-        if hand_rank >= 0 and hand_rank <= LookupTable.MAX_STRAIGHT_FLUSH:
-            return LookupTable.MAX_TO_RANK_CLASS[LookupTable.MAX_STRAIGHT_FLUSH]
-        elif hand_rank >= 0 and hand_rank <= LookupTable.MAX_FOUR_OF_A_KIND:
-            return LookupTable.MAX_TO_RANK_CLASS[LookupTable.MAX_FOUR_OF_A_KIND]
-        elif hand_rank >= 0 and hand_rank <= LookupTable.MAX_FULL_HOUSE:
-            return LookupTable.MAX_TO_RANK_CLASS[LookupTable.MAX_FULL_HOUSE]
-        elif hand_rank >= 0 and hand_rank <= LookupTable.MAX_FLUSH:
-            return LookupTable.MAX_TO_RANK_CLASS[LookupTable.MAX_FLUSH]
-        elif hand_rank >= 0 and hand_rank <= LookupTable.MAX_STRAIGHT:
-            return LookupTable.MAX_TO_RANK_CLASS[LookupTable.MAX_STRAIGHT]
-        elif hand_rank >= 0 and hand_rank <= LookupTable.MAX_THREE_OF_A_KIND:
-            return LookupTable.MAX_TO_RANK_CLASS[LookupTable.MAX_THREE_OF_A_KIND]
-        elif hand_rank >= 0 and hand_rank >= 0 and hand_rank <= LookupTable.MAX_TWO_PAIR:
-            return LookupTable.MAX_TO_RANK_CLASS[LookupTable.MAX_TWO_PAIR]
-        elif hand_rank >= 0 and hand_rank <= LookupTable.MAX_PAIR:
-            return LookupTable.MAX_TO_RANK_CLASS[LookupTable.MAX_PAIR]
-        elif hand_rank >= 0 and hand_rank <= LookupTable.MAX_HIGH_CARD:
-            return LookupTable.MAX_TO_RANK_CLASS[LookupTable.MAX_HIGH_CARD]
-        else:
-            raise ValueError("Inavlid hand rank, cannot return rank class")
+        if type(hand_rank) is int and 0 <= hand_rank <= LookupTable.MAX_HIGH_CARD:
+            return self._RANK_CLASS_TUPLE[hand_rank]
+        return self._rank_lookup(self.RANK_CLASSES, hand_rank, "class")
 
+    @staticmethod
+    def _rank_lookup(table, hand_rank, name):
+        """
+        The entry of table for a hand rank, as a Python scalar, or the array of
+        entries for an array of hand ranks. name is the kind of entry, for the
+        error message.
+        Exceptions:
+            - ValueError: Raised for ranks that are not integers from 0 to 7462.
+        """
+        message = f"Invalid hand rank, cannot return rank {name}"
+        if np.ndim(hand_rank) == 0:
+            try:
+                rank = int(hand_rank)
+            except (TypeError, ValueError):
+                raise ValueError(message) from None
+            if rank != hand_rank or not 0 <= rank <= LookupTable.MAX_HIGH_CARD:
+                raise ValueError(message)
+            return table[rank].item()
+        hand_ranks = np.asarray(hand_rank)
+        if hand_ranks.dtype.kind == 'f' and (hand_ranks != np.floor(hand_ranks)).any():
+            raise ValueError(message)
+        if ((hand_ranks < 0) | (hand_ranks > LookupTable.MAX_HIGH_CARD)).any():
+            raise ValueError(message)
+        return table[hand_ranks.astype(np.intp, copy=False)]
 
     def class_to_string(self, class_int):
         """
@@ -252,17 +423,229 @@ class Evaluator(object):
                 8: "Pair",
                 9: "High Card"
         """
-        return LookupTable.RANK_CLASS_TO_STRING[class_int]
+        if isinstance(class_int, (int, np.integer)):
+            return LookupTable.RANK_CLASS_TO_STRING[class_int]
+        return pd.Categorical.from_codes(np.asarray(class_int) - 1, categories=self.CLASS_NAMES)
 
     def get_rank_percentage(self, hand_rank):
         """
         Normalizes the hand rank score from integers ranging in [1, 7462] to floating numbers
         ranging from 0 to 1 indicating the percentage of poker hands that a given hand beats.
         Arg:
-            - hand_rank: The hand rank generated by the evaluate function. Int from 1-7462.
+            - hand_rank: The hand rank generated by the evaluate function. Int from 1-7462,
+            or an array of hand ranks.
         Returns:
             Float from 0-1 indicating the percentage of possible poker hands that the input
             poker hand
-            beats.
+            beats, or an array of floats.
+        Exceptions:
+            - ValueError: Raise if input is not an integer from 0 to 7462.
+        """
+        if type(hand_rank) is int and 0 <= hand_rank <= LookupTable.MAX_HIGH_CARD:
+            return self._RANK_PERCENTAGE_TUPLE[hand_rank]
+        return self._rank_lookup(self.RANK_PERCENTAGES, hand_rank, "percentage")
+
+    def evaluate_many(self, cards, board=None):
+        """
+        Batch version of the evaluate function. Every hand is evaluated at once
+        with numpy array operations on the flat lookup tables, so there is no
+        python loop over the hands.
+        Arg:
+            - cards: Integer array of shape (N, 5), (N, 6) or (N, 7) of 32 bit ints generated
+            by the card.py module, one hand per row.
+            - board: Optional integer array of shape (N, k) with the board cards of each
+            row. It is appended to cards, so cards can hold just the two hole cards.
+        Return:
+            - (np.ndarray of int16) rank from 1 to 7462 of every row.
+        Exceptions:
+            - ValueError: Raised for hand sizes other than 5, 6 or 7 cards and for rows
+            with duplicate cards.
+        """
+        cards = np.asarray(cards, dtype=np.int32)
+        if board is not None:
+            cards = np.concatenate([cards, np.asarray(board, dtype=np.int32)], axis=1)
+        if cards.ndim != 2 or cards.shape[1] not in self.hand_size_map:
+            raise ValueError("Expected an array of shape (N, 5), (N, 6) or (N, 7).")
+
+        ordered = np.sort(cards, axis=1)
+        if (ordered[:, 1:] == ordered[:, :-1]).any():
+            raise ValueError("Duplicate cards found in the input.")
+
+        return self._evaluate_many(cards)
+
+    def _evaluate_many(self, cards):
+        """
+        evaluate_many without input checks, for callers that deal the cards
+        themselves. cards must be an int32 array of shape (N, 5|6|7).
+        """
+        return self._state_ranks(self._card_state(cards))
+
+    def _card_state(self, cards):
+        """
+        Summarizes rows of cards for the batch evaluator: the number of cards
+        of each rank, the number of cards of each suit and the rankbits of
+        each suit. States of disjoint cards can be added with _add_states, so
+        the board part of many hands is only counted once.
+        Args:
+            cards: int32 array of shape (N, k) of 32 bit ints from Card.new.
+        Returns:
+            (rank_counts, suit_counts, suit_rankbits) arrays of shape (N, 13),
+            (N, 4) and (N, 4).
+        """
+        cards = np.asarray(cards, dtype=np.int32)
+        rows = np.arange(cards.shape[0])
+        rank_counts = np.zeros((cards.shape[0], 13), dtype=np.intp)
+        suit_counts = np.zeros((cards.shape[0], 4), dtype=np.intp)
+        suit_rankbits = np.zeros((cards.shape[0], 4), dtype=np.intp)
+        for column in cards.T:
+            suit = self.SUIT_INDEX[(column >> 12) & 0xF]
+            rank_counts[rows, ((column >> 8) & 0xF) - 2] += 1
+            suit_counts[rows, suit] += 1
+            suit_rankbits[rows, suit] |= (column >> 16) & 0x1FFF
+        return rank_counts, suit_counts, suit_rankbits
+
+    @staticmethod
+    def _add_states(first, second):
+        """
+        Card state of the union of two disjoint sets of cards, broadcasting
+        over rows.
+        """
+        return first[0] + second[0], first[1] + second[1], first[2] | second[2]
+
+    def _state_ranks(self, state):
+        """
+        Hand rank of every row of a card state holding 5 to 7 cards.
+        """
+        rank_counts, suit_counts, suit_rankbits = state
+        ranks = self.table.unsuited_ranks[LookupTable.rank_hash(rank_counts)]
+
+        # flushes: at most one suit can hold 5 of the cards
+        flush_rows, flush_suit = np.nonzero(suit_counts >= 5)
+        ranks[flush_rows] = self.table.flush_ranks[suit_rankbits[flush_rows, flush_suit]]
+
+        return ranks.astype(np.int16)
+
+    def get_rank_class_many(self, hand_ranks):
+        """
+        Array version of the get_rank_class function.
+        Arg:
+            - hand_ranks: Integer array of hand ranks generated by evaluate_many.
+        Return:
+            - (np.ndarray of int) hand class from 1 to 9 of every rank.
+        Exceptions:
+            - ValueError: Raise if any rank is outside the range [0, 7462].
+        """
+        return self._rank_lookup(self.RANK_CLASSES, np.asarray(hand_ranks), "class")
+
+    def get_rank_percentage_many(self, hand_ranks):
+        """
+        Array version of the get_rank_percentage function.
+        Arg:
+            - hand_ranks: Integer array of hand ranks generated by evaluate_many.
+        Returns:
+            (np.ndarray of float) percentage of possible poker hands each hand beats.
+        Exceptions:
+            - ValueError: Raise if any rank is outside the range [0, 7462].
+        """
+        return self._rank_lookup(self.RANK_PERCENTAGES, np.asarray(hand_ranks), "percentage")
+
+
+class HandState:
+    """
+    Incremental evaluation of one hand. The state keeps what the lookup of
+    _river needs: the prime product of the cards (their rank multiset), one
+    4-bit counter per suit and the rankbits of every suit, 13 bits per suit
+    in 16 bit slots. Adding a card updates them in constant time and looks
+    up the best rank of the cards so far, so a live hand costs one step per
+    street instead of a new evaluation.
+
+    Attributes:
+        - mask: Card mask of the cards (see the hand.py module).
+        - size: Number of cards.
+        - rank: Rank from 1 to 7462 of the best 5 card hand, None below 5
+        cards.
+    """
+    __slots__ = ('table', 'mask', 'size', 'product', 'suit_counts', 'suit_rankbits', 'rank')
+
+    def __init__(self, table=None):
+        self.table = LookupTable.shared() if table is None else table
+        self.mask = 0
+        self.size = 0
+        self.product = 1
+        self.suit_counts = 0
+        self.suit_rankbits = 0
+        self.rank = None
+
+    def add_card(self, card):
+        """
+        Adds a hole or board card, a string or a 32 bit int from card.py.
+        Return:
+            - The rank of the hand with the new card, None below 5 cards.
+        Exceptions:
+            - ValueError: Raised for duplicate cards and beyond 7 cards.
+        """
+        index = card_index(card)
+        if self.mask >> index & 1:
+            raise ValueError("Duplicate cards found in the input.")
+        if self.size == 7:
+            raise ValueError("A hand holds at most 7 cards.")
+        self.mask |= 1 << index
+        self.size += 1
+        self.product *= INDEX_PRIMES[index]
+        self.suit_counts += INDEX_SUIT_COUNTS[index]
+        self.suit_rankbits |= 1 << (16 * (index % 4) + index // 4)
+        if self.size < 5:
+            return None
+
+        # adding 3 to each 4-bit suit count sets its top bit once it reaches 5
+        flush = (self.suit_counts + 0x3333) & 0x8888
+        if flush:
+            suit = flush.bit_length() // 4 - 1
+            self.rank = self.table.flush_lookup_7[(self.suit_rankbits >> (16 * suit)) & 0x1FFF]
+        else:
+            self.rank = self.table.unsuited_lookup_7[self.product]
+        return self.rank
+
+    def partial(self):
+        """
+        Made hand class and draws of the cards so far, see
+        Evaluator.evaluate_partial.
+        """
+        suits = [(self.suit_rankbits >> (16 * suit)) & 0x1FFF for suit in range(4)]
+        if self.rank is not None:
+            rank_class = Evaluator.RANK_CLASSES[self.rank].item()
+        else:
+            # ranks held by at least 2, 3 and 4 suits
+            s, h, d, c = suits
+            pairs = (s & h) | (s & d) | (s & c) | (h & d) | (h & c) | (d & c)
+            trips = (s & h & d) | (s & h & c) | (s & d & c) | (h & d & c)
+            quads = s & h & d & c
+            if quads:
+                rank_class = 2
+            elif trips:
+                rank_class = 6
+            elif pairs.bit_count() >= 2:
+                rank_class = 7
+            else:
+                rank_class = 8 if pairs else 9
+
+        # draws only count when they beat the hand already made
+        straight_ranks = 0
+        if rank_class > 5:
+            straight_ranks = Evaluator.STRAIGHT_DRAWS[suits[0] | suits[1] | suits[2] | suits[3]].bit_count()
+        outs = 4 * straight_ranks
+        flush_draw = rank_class > 4 and any(bits.bit_count() == 4 for bits in suits)
+        if flush_draw:
+            # the flush suit card of each straight rank is counted once
+            outs += 9 - straight_ranks
+        return PartialEvaluation(rank_class, flush_draw, straight_ranks >= 2,
+                                 straight_ranks == 1, outs)
+
+    def copy(self):
+        """
+        An independent copy, e.g. to try every river card from the turn.
         """
-        return 1 - (float(hand_rank) / float(LookupTable.MAX_HIGH_CARD))
+        state = HandState.__new__(HandState)
+        for name in HandState.__slots__:
+            setattr(state, name, getattr(self, name))
+        return state
@@ -0,0 +1,423 @@
+"""
+features Module
+
+The features module computes the features of the adding_rank, adding_flush,
+straight_risk_eval, bluff_eval, add_aggression_column and add_fold_column
+modules in one pass. The poker_dataframe is read once with only the columns
+the requested stages need, the cards and actions are parsed once into arrays
+shared by all stages, and the features are joined to the games at the end.
+
+Every stage declares the columns it reads and the columns it adds. Inputs
+that are the outputs of another stage (the bluff metric needs the hand
+strength) pull that stage in and run it first.
+
+With a cache directory, the outputs of every stage are saved under a key
+made of the stage name and version and of the hash of the values of its
+input columns. A stage whose inputs and version did not change is loaded
+from the cache instead of being computed again.
+
+Datasets larger than memory are processed in chunks of games with
+iter_pipeline. Dataset-wide statistics, like the mean aggressiveness the
+bluff metric is normalized with, are summed over all chunks in a first pass
+over the data, and the enriched chunks are yielded in a second pass.
+
+Classes:
+--------------
+- Stage:
+    A feature stage: name, input and output columns, version and function.
+
+- FeatureFrame:
+    The games of a poker_dataframe with their cards and actions parsed once,
+    and the features computed so far.
+
+Functions:
+--------------
+- run_pipeline(source, stages=None, output=None, cache_dir=None, stats=None):
+    Computes the features of the given stages for every game of a
+    poker_dataframe, pickle file or Parquet dataset.
+
+- iter_pipeline(source, stages=None, batch_size=BATCH_SIZE, cache_dir=None, stats=None):
+    Chunked version of run_pipeline, yielding the games with their features
+    one chunk at a time.
+
+- stage_key(stage, frame):
+    The cache key of the outputs of a stage.
+
+Run `python -m winedge.features <poker_dataframe.pkl or dataset> <output.pkl>
+[stage ...]` to save the features of every stage, or of the listed ones. The
+stage outputs are cached in <output>.cache.
+"""
+
+import hashlib
+import os
+from collections import Counter, namedtuple
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+from .actions import ACTION_COLUMNS, pack_actions
+from .add_aggression_column import aggression_columns
+from .adding_flush import SUIT_BITS, flush_risk
+from .card import Card
+from .dataset import BATCH_SIZE, iter_poker_dataframe, read_poker_dataframe
+from .evaluator import Evaluator
+from .straight_risk_eval import straight_risk_table
+
+BOARD_COLUMNS = ['Flop', 'Turn', 'River']
+HOLE_COLUMNS = ['SB cards', 'BB cards']
+
+Stage = namedtuple('Stage', ['name', 'inputs', 'outputs', 'version', 'compute', 'aggregate'],
+                   defaults=[None])
+Stage.__doc__ = """
+A feature stage. compute(frame) returns a dict with an array of len(frame)
+for every column of outputs, computed from the inputs columns. The version
+changes whenever the values compute returns change.
+
+Stages that depend on statistics of the whole dataset also have an
+aggregate(frame) function, which returns a dict of sums over the games of
+frame computed from its raw columns. The sums over every chunk of the
+dataset are in frame.totals[name] when compute is called.
+"""
+
+
+class FeatureFrame:
+    """
+    Games of a poker_dataframe with the arrays shared by the stages, each
+    parsed once on first use, and the features computed so far.
+    """
+    def __init__(self, df, totals=None):
+        self.df = df
+        self.features = {}
+        self.totals = {} if totals is None else totals
+
+    def __len__(self):
+        return len(self.df)
+
+    def __getitem__(self, column):
+        if column in self.features:
+            return self.features[column]
+        return self.df[column].to_numpy()
+
+    @cached_property
+    def board(self):
+        """
+        int32 array of shape (n, 5) with the Card.new ints of the flop, turn
+        and river cards, 0 for cards not dealt.
+        """
+        board = np.zeros((len(self), 5), dtype=np.int32)
+        dealt = self.dealt
+        if dealt[:, 0].any():
+            board[dealt[:, 0], :3] = Card.new_many(self.df['Flop'][dealt[:, 0]].tolist())
+        for street in (1, 2):
+            if dealt[:, street].any():
+                board[dealt[:, street], street + 2] = Card.new_many(
+                    self.df[BOARD_COLUMNS[street]][dealt[:, street]])
+        return board
+
+    @cached_property
+    def dealt(self):
+        """
+        Boolean array of shape (n, 3), whether the flop, turn and river were
+        dealt.
+        """
+        return np.column_stack([self.df[column].notna().to_numpy() for column in BOARD_COLUMNS])
+
+    @cached_property
+    def hands(self):
+        """
+        int32 array of shape (n, 2, 2) with the Card.new ints of the small
+        and big blind hole cards, 0 when they were not shown.
+        """
+        hands = np.zeros((len(self), 2, 2), dtype=np.int32)
+        for player, column in enumerate(HOLE_COLUMNS):
+            shown = self.df[column].notna().to_numpy()
+            if not shown.any():
+                continue
+            hands[shown, player] = Card.hole_cards_many(self.df[column][shown])
+        return hands
+
+    @cached_property
+    def showdown(self):
+        """
+        Boolean array, True for the games that reached the river with both
+        hands shown.
+        """
+        return self.dealt[:, 2] & (self.hands != 0).all(axis=(1, 2))
+
+    @cached_property
+    def actions(self):
+        """
+        PackedActions of the games.
+        """
+        return pack_actions(self.df)
+
+
+def _nan(n):
+    return np.full(n, np.nan)
+
+
+def _rank(frame):
+    rows = frame.showdown
+    evaluator = Evaluator()
+    columns = {}
+    for player, name in enumerate(('SB', 'BB')):
+        rank = evaluator.evaluate_many(frame.hands[rows, player], frame.board[rows])
+        # class - 1 is the category code, -1 (missing) for games without showdown
+        codes = np.full(len(frame), -1, dtype=np.int8)
+        codes[rows] = evaluator.get_rank_class(rank) - 1
+        strength = _nan(len(frame))
+        strength[rows] = evaluator.get_rank_percentage(rank)
+        columns[f'{name} Handrank'] = pd.Categorical.from_codes(codes, categories=evaluator.CLASS_NAMES)
+        columns[f'{name} Hand Strength'] = strength
+    return columns
+
+
+def _flush(frame):
+    nibbles = (frame.board >> 12) & 0xF
+    # suit counts of the board after the flop, turn and river
+    counts = np.cumsum((nibbles[..., None] & SUIT_BITS) > 0, axis=1)[:, 2:]
+    flush_count = np.where(frame.dealt, counts.max(axis=2), np.nan)
+    columns = {}
+    for street, prefix in enumerate(('Flop ', 'Turn ', '')):
+        columns[f'{prefix}Flush Count'] = flush_count[:, street]
+        columns[f'{prefix}Flush'] = flush_risk(flush_count[:, street])
+    return columns
+
+
+def _straight(frame):
+    rank_bits = (frame.board >> 16) & 0x1FFF
+    masks = np.bitwise_or.accumulate(rank_bits, axis=1)[:, 2:]
+    risk = np.where(frame.dealt, straight_risk_table()[masks], np.nan)
+    return {f'{column} Straight Risk': risk[:, street] for street, column in enumerate(BOARD_COLUMNS)}
+
+
+def _bluff_rows(frame):
+    return frame.showdown & frame.actions.played('river')
+
+
+def _bluff_aggregate(frame):
+    rows = _bluff_rows(frame)
+    sb_bets, bb_bets = frame.actions.bet_counts('river')
+    # sums of 1 + bets and raises on the river
+    return {'games': int(rows.sum()), 'SB': int(rows.sum() + sb_bets[rows].sum()),
+            'BB': int(rows.sum() + bb_bets[rows].sum())}
+
+
+def _bluff(frame):
+    rows = _bluff_rows(frame)
+    totals = frame.totals['bluff']
+    columns = {}
+    for name, bets in zip(('SB', 'BB'), frame.actions.bet_counts('river')):
+        # 1 + bets and raises on the river, normalized to the mean of the games
+        aggression = _nan(len(frame))
+        aggression[rows] = 1. + bets[rows]
+        if totals['games']:
+            aggression /= totals[name] / totals['games']
+        columns[f'agg{name}'] = aggression
+        columns[f'{name} Bluff Metric'] = (1 - frame[f'{name} Hand Strength']) * aggression
+    return columns
+
+
+def _aggression(frame):
+    return aggression_columns(frame.actions)
+
+
+def _fold(frame):
+    fold_sb, fold_bb = frame.actions.fold_flags()
+    return {'fold_sb': fold_sb, 'fold_bb': fold_bb}
+
+
+STAGES = {stage.name: stage for stage in [
+    Stage('rank', BOARD_COLUMNS + HOLE_COLUMNS,
+          ['SB Handrank', 'BB Handrank', 'SB Hand Strength', 'BB Hand Strength'], '2', _rank),
+    Stage('flush', BOARD_COLUMNS,
+          ['Flop Flush Count', 'Flop Flush', 'Turn Flush Count', 'Turn Flush', 'Flush Count', 'Flush'],
+          '1', _flush),
+    Stage('straight', BOARD_COLUMNS,
+          ['Flop Straight Risk', 'Turn Straight Risk', 'River Straight Risk'], '1', _straight),
+    Stage('bluff', BOARD_COLUMNS + HOLE_COLUMNS + ['River actions', 'SB Hand Strength', 'BB Hand Strength'],
+          ['aggSB', 'aggBB', 'SB Bluff Metric', 'BB Bluff Metric'], '2', _bluff, _bluff_aggregate),
+    Stage('aggression', list(ACTION_COLUMNS),
+          [f'Aggr {street} {player}' for street in ('preflop', 'flop', 'turn', 'river')
+           for player in ('SB', 'BB')], '2', _aggression),
+    Stage('fold', list(ACTION_COLUMNS), ['fold_sb', 'fold_bb'], '2', _fold),
+]}
+
+
+def resolve_stages(stages=None):
+    """
+    Orders the named stages (all of STAGES by default) so that every stage
+    runs after the stages whose outputs it reads, adding those stages.
+    Exception:
+        - KeyError: Raised for unknown stage names.
+    """
+    producers = {column: stage.name for stage in STAGES.values() for column in stage.outputs}
+    order = []
+
+    def visit(name):
+        for column in STAGES[name].inputs:
+            if column in producers and producers[column] not in order:
+                visit(producers[column])
+        if name not in order:
+            order.append(name)
+
+    for name in STAGES if stages is None else stages:
+        visit(name)
+    return [STAGES[name] for name in order]
+
+
+def input_columns(stages):
+    """
+    poker_dataframe columns read by the stages, without the columns other
+    stages compute.
+    """
+    computed = {column for stage in stages for column in stage.outputs}
+    columns = ['Game ID']
+    for stage in stages:
+        columns += [column for column in stage.inputs if column not in computed]
+    return list(dict.fromkeys(columns))
+
+
+def column_digest(values):
+    """
+    sha256 digest of the values of a column, the same for equal values.
+    Object columns (card lists, action lists) are hashed by the str of
+    their elements.
+    """
+    values = np.asarray(values)
+    if values.dtype == object:
+        values = pd.util.hash_array(np.array([str(value) for value in values], dtype=object))
+    digest = hashlib.sha256(f'{values.dtype.str}{values.shape}'.encode())
+    digest.update(np.ascontiguousarray(values).tobytes())
+    return digest.digest()
+
+
+def stage_key(stage, frame):
+    """
+    Cache key of the outputs of stage for the games of frame: a hex digest
+    of the stage name and version, of the values of its inputs and of its
+    dataset-wide totals.
+    """
+    key = hashlib.sha256(f'{stage.name}:{stage.version}'.encode())
+    for column in stage.inputs:
+        key.update(column.encode())
+        key.update(column_digest(frame[column]))
+    if stage.aggregate is not None:
+        key.update(repr(sorted(frame.totals[stage.name].items())).encode())
+    return key.hexdigest()
+
+
+def _run_stage(stage, frame, cache_dir, stats):
+    """
+    Outputs of stage, from cache_dir when they were computed before.
+    """
+    if cache_dir is None:
+        stats['computed'] += 1
+        return stage.compute(frame)
+    path = os.path.join(cache_dir, f'{stage.name}-{stage_key(stage, frame)}.pkl')
+    if os.path.exists(path):
+        stats['cached'] += 1
+        cached = pd.read_pickle(path)
+        return {column: cached[column].values for column in stage.outputs}
+    stats['computed'] += 1
+    columns = stage.compute(frame)
+    os.makedirs(cache_dir, exist_ok=True)
+    pd.DataFrame(columns).to_pickle(path + '.tmp')
+    os.replace(path + '.tmp', path)
+    return columns
+
+
+def run_pipeline(source, stages=None, output=None, cache_dir=None, stats=None):
+    """
+    Computes the features of the given stages for every game.
+    Args:
+        - source: poker_dataframe, or the path of a pickled poker_dataframe or
+        of a Parquet dataset, of which only the needed columns are read.
+        - stages: Names of the stages to run (see STAGES), all by default.
+        The stages they depend on are run as well.
+        - output: Optional path to pickle the result to.
+        - cache_dir: Optional directory of the cached stage outputs.
+        - stats: Optional Counter, incremented with the number of stages
+        'computed' and loaded from the cache ('cached').
+    Return:
+        - pandas dataframe with the input columns and the outputs of every
+        stage, one row per game. Features a game does not have (e.g. the
+        hand rank of games without showdown) are NaN or missing.
+    """
+    stages = resolve_stages(stages)
+    if isinstance(source, pd.DataFrame):
+        df = source.reset_index(drop=True)
+    else:
+        df = read_poker_dataframe(source, input_columns(stages))
+    result = _enrich(df, stages, aggregate_totals([df], stages), cache_dir, stats)
+    if output is not None:
+        result.to_pickle(output)
+    return result
+
+
+def iter_pipeline(source, stages=None, batch_size=BATCH_SIZE, cache_dir=None, stats=None):
+    """
+    Chunked version of run_pipeline for datasets larger than memory. The
+    source is read twice, once for the totals of the stages with an
+    aggregate function and once for the features.
+    Args:
+        - source: Path of a Parquet dataset, read one record batch at a time,
+        of a pickled poker_dataframe or a poker_dataframe, split in chunks,
+        or a function returning a new iterator of poker_dataframe chunks
+        (e.g. Parquet row groups) on every call.
+        - stages, cache_dir, stats: As in run_pipeline.
+        - batch_size: Maximum number of games per chunk.
+    Return:
+        - Generator of the chunks of the dataframe run_pipeline returns, with
+        the same index.
+    """
+    stages = resolve_stages(stages)
+
+    def chunks():
+        if callable(source):
+            return source()
+        if isinstance(source, pd.DataFrame):
+            df = source.reset_index(drop=True)
+            return (df[start:start + batch_size] for start in range(0, len(df), batch_size))
+        return iter_poker_dataframe(source, input_columns(stages), batch_size=batch_size)
+
+    totals = aggregate_totals(chunks(), stages)
+    start = 0
+    for df in chunks():
+        df = df.set_axis(pd.RangeIndex(start, start + len(df)))
+        start += len(df)
+        yield _enrich(df, stages, totals, cache_dir, stats)
+
+
+def aggregate_totals(chunks, stages):
+    """
+    Sums of the aggregate functions of the stages over chunks of games.
+    """
+    totals = {stage.name: Counter() for stage in stages if stage.aggregate is not None}
+    if totals:
+        for df in chunks:
+            frame = FeatureFrame(df)
+            for stage in stages:
+                if stage.aggregate is not None:
+                    totals[stage.name].update(stage.aggregate(frame))
+    return {name: dict(total) for name, total in totals.items()}
+
+
+def _enrich(df, stages, totals, cache_dir, stats):
+    """
+    df with the outputs of the stages as new columns.
+    """
+    frame = FeatureFrame(df, totals)
+    stats = Counter() if stats is None else stats
+    for stage in stages:
+        columns = _run_stage(stage, frame, cache_dir, stats)
+        frame.features.update((column, columns[column]) for column in stage.outputs)
+    return pd.concat([df, pd.DataFrame(frame.features, index=df.index)], axis=1)
+
+
+if __name__ == '__main__':
+    import sys
+    if len(sys.argv) < 3:
+        sys.exit("usage: python -m winedge.features <poker_dataframe.pkl or dataset> <output.pkl> [stage ...]")
+    run_pipeline(sys.argv[1], sys.argv[3:] or None, sys.argv[2], sys.argv[2] + '.cache')
@@ -0,0 +1,168 @@
+"""
+hand Module
+
+The hand module is a compact alternative to the lists of Card.new ints. Every
+card is an index from 0 to 51, rank * 4 + suit in the order of dataset.CARDS
+and equity.DECK, and a set of cards is a 52-bit mask with bit index set for
+every card (the layout of preflop.COMBO_MASKS). Converting between an index
+and its Card.new int is a table lookup, a duplicate card is a bitwise AND of
+two masks, and evaluating Hand and Board objects never builds a list.
+
+Classes:
+--------------
+- CardSet:
+    A set of cards stored as a card mask, with __slots__.
+
+- Hand:
+    The two hole cards of a player.
+
+- Board:
+    The up to five board cards.
+
+Functions:
+--------------
+- card_index(card):
+    Index of a card string or Card.new int.
+
+- index_to_int(index), index_to_str(index):
+    Card.new int and string of a card index.
+
+Exception:
+--------------
+- ValueError: Raised for unknown cards, duplicate cards and too many cards.
+"""
+
+import numpy as np
+
+from .card import Card, CARD_INTS
+
+# card string and Card.new int of every index, and the index of both
+INDEX_STRS = tuple(rank + suit for rank in Card.STR_RANKS for suit in Card.STR_SUITS)
+INDEX_INTS = tuple(CARD_INTS.tolist())
+CARD_INDEX = {**{card: i for i, card in enumerate(INDEX_STRS)},
+              **{card: i for i, card in enumerate(INDEX_INTS)}}
+# prime and 4-bit suit counter (see Evaluator.SUIT_NIBBLE) of every index
+INDEX_PRIMES = tuple(card & 0x3F for card in INDEX_INTS)
+INDEX_SUIT_COUNTS = tuple(1 << (4 * (i % 4)) for i in range(52))
+# cards of each suit, the suit order of the suit counters
+SUIT_MASKS = tuple(sum(1 << (rank * 4 + suit) for rank in range(13)) for suit in range(4))
+
+
+def card_index(card):
+    """
+    Index from 0 to 51 of a card string like 'Ah' or a Card.new int.
+    """
+    try:
+        return CARD_INDEX[card]
+    except (KeyError, TypeError):
+        raise ValueError(f"Unknown card {card!r}") from None
+
+
+def index_to_int(index):
+    """
+    Card.new int of a card index.
+    """
+    return INDEX_INTS[index]
+
+
+def index_to_str(index):
+    """
+    Card string of a card index.
+    """
+    return INDEX_STRS[index]
+
+
+class CardSet:
+    """
+    A set of at most MAX_CARDS cards, stored as the int mask of their
+    indices. Cards are given as strings or Card.new ints.
+    """
+    __slots__ = ('mask',)
+    MAX_CARDS = 52
+
+    def __init__(self, cards=()):
+        self.mask = 0
+        for card in cards:
+            self.add(card)
+
+    @classmethod
+    def from_mask(cls, mask):
+        """
+        The set of the cards of a card mask.
+        """
+        mask = int(mask)
+        if mask < 0 or mask >> 52 or mask.bit_count() > cls.MAX_CARDS:
+            raise ValueError(f"Invalid card mask for {cls.__name__}: {mask:#x}")
+        cards = cls.__new__(cls)
+        cards.mask = mask
+        return cards
+
+    def add(self, card):
+        """
+        Adds a card to the set.
+        """
+        bit = 1 << card_index(card)
+        if self.mask & bit:
+            raise ValueError(f"Duplicate card {card!r}")
+        if self.mask.bit_count() >= self.MAX_CARDS:
+            raise ValueError(f"{type(self).__name__} holds at most {self.MAX_CARDS} cards")
+        self.mask |= bit
+
+    def isdisjoint(self, other):
+        """
+        True when the two sets share no card.
+        """
+        return not self.mask & other.mask
+
+    def _indices(self):
+        mask = self.mask
+        while mask:
+            low = mask & -mask
+            yield low.bit_length() - 1
+            mask ^= low
+
+    def indices(self):
+        """
+        uint8 array of the card indices, in increasing order.
+        """
+        return np.fromiter(self._indices(), dtype=np.uint8)
+
+    def to_ints(self):
+        """
+        List of the Card.new ints of the cards, for the list based functions.
+        """
+        return [INDEX_INTS[index] for index in self._indices()]
+
+    def __iter__(self):
+        return (INDEX_INTS[index] for index in self._indices())
+
+    def __len__(self):
+        return self.mask.bit_count()
+
+    def __contains__(self, card):
+        return bool(self.mask >> card_index(card) & 1)
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.mask == other.mask
+
+    def __hash__(self):
+        return hash((type(self).__name__, self.mask))
+
+    def __repr__(self):
+        return f"{type(self).__name__}({[INDEX_STRS[index] for index in self._indices()]})"
+
+
+class Hand(CardSet):
+    """
+    The hole cards of a player.
+    """
+    __slots__ = ()
+    MAX_CARDS = 2
+
+
+class Board(CardSet):
+    """
+    The board cards, from the flop to the river.
+    """
+    __slots__ = ()
+    MAX_CARDS = 5
@@ -0,0 +1,423 @@
+"""
+hand_history Module
+
+The hand_history module reads the raw 888poker hand history text files and
+turns every game into one record with the relevant game info. Files are read
+line by line and each game is parsed as soon as its last line has been read,
+so memory use does not depend on the number of files.
+
+An example game is shown in the README. Games start with a '#Game No' line;
+the last game of a file ends with the file.
+
+Functions:
+--------------
+- find_hand_histories(root):
+    Paths of every file below a directory, in a stable order.
+
+- parse_hand_histories(paths, stats=None):
+    Generator of one GameRecord per game of the given files.
+
+- hand_histories_to_dataframe(paths, stats=None):
+    The records of parse_hand_histories as a dataframe with COLUMNS.
+
+- ingest_hand_histories(paths, processes=None, files_per_task=64, stats=None):
+    The same dataframe, parsed on a pool of worker processes.
+
+- update_hand_histories(paths, dataframe_path, manifest_path=None, processes=None):
+    Parses only the files that are new or changed since the last update and
+    adds their games to a saved dataframe, using a manifest of parsed files.
+
+Exception:
+--------------
+- ValueError: Raised by parse_game for games missing the expected lines.
+"""
+
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+from collections import Counter, namedtuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+GameRecord = namedtuple('GameRecord', [
+    'game_id', 'file', 'player_sb', 'player_bb', 'preflop_actions', 'flop_actions',
+    'turn_actions', 'river_actions', 'flop', 'turn', 'river', 'sb_stack', 'bb_stack',
+    'sb_cards', 'bb_cards', 'folded_pre'])
+GameRecord.__doc__ = """
+One game of a hand history file. Actions are lists of (action, amount) tuples
+with the action one of 'f' (fold), 'k' (check), 'c' (call), 'b' (bet) or
+'r' (raise), and streets that were not played are None.
+"""
+
+# dataframe column of each GameRecord field
+COLUMNS = ['Game ID', 'File', 'Player SB', 'Player BB', 'Preflop actions', 'Flop actions',
+           'Turn actions', 'River actions', 'Flop', 'Turn', 'River', 'SB stack', 'BB stack',
+           'SB cards', 'BB cards', 'Folded pre']
+
+# columns holding lists
+LIST_COLUMNS = ('Preflop actions', 'Flop actions', 'Turn actions', 'River actions', 'Flop')
+
+# bump when the parser output changes, so update_hand_histories reparses everything
+MANIFEST_VERSION = 1
+
+GAME_START = '#Game'
+SUMMARY = '** Summary **'
+STREET_HEADERS = ('** Dealing flop', '** Dealing turn', '** Dealing river')
+
+
+def find_hand_histories(root):
+    """
+    Returns the paths of every file below the root directory, sorted so the
+    games always come out in the same order.
+    """
+    return sorted(os.path.join(directory, name)
+                  for directory, _, names in os.walk(root) for name in names)
+
+
+def process_street_actions(game, start_index, end_index):
+    """
+    This function loops over the actions that players made during the game
+    and stores them in a list of tuples
+    """
+    street_list = []
+    for line in game[start_index:end_index]:
+        if 'folds' in line:
+            street_list.append(('f', 0))
+        if 'calls' in line or 'bets' in line or 'raises' in line:
+            amount = line[line.index('$') + 1:-1]
+            first_space = line.index(' ')
+            street_list.append((line[first_space + 1], amount))
+        if 'checks' in line:
+            street_list.append(('k', 0))
+    return street_list
+
+
+def get_hole_cards(game, summary_index, small_blind_name):
+    """
+    This function captures hole cards if they are available and correctly
+    assigns them to players. Only games where the first line of the summary
+    shows a hand have hole cards.
+    """
+    hole_cards1 = None
+    hole_cards2 = None
+    if 'shows' in game[summary_index + 1]:
+        hole_cards1 = game[summary_index + 1][-10:]
+        hole_cards2 = game[summary_index + 2][-10:]
+
+    hole_cards1_player = game[summary_index + 1][:game[summary_index + 1].index(' ') + 1]
+    if hole_cards1_player == small_blind_name:
+        return hole_cards1, hole_cards2
+    return hole_cards2, hole_cards1
+
+
+def parse_game(game, file_name):
+    """
+    Parses the lines of one game, without line endings, into a GameRecord.
+    Exceptions:
+        - ValueError: Raised for games missing the expected lines.
+    """
+    if len(game) < 11:
+        raise ValueError("Game is too short.")
+    if 'posts small blind' not in game[8] or 'posts big blind' not in game[9]:
+        raise ValueError("Game has no blinds.")
+    small_blind_name = game[8][:game[8].index('posts small blind')]  # with a trailing space
+    big_blind_name = game[9][:game[9].index('posts big blind')]
+    stack_sb = game[6][game[6].find('$') + 1:-2]
+    stack_bb = game[7][game[7].find('$') + 1:-2]
+
+    # indices of the flop, turn and river headers and of the summary
+    street_indices = [i for i, line in enumerate(game)
+                      if line.startswith(SUMMARY) or any(header in line for header in STREET_HEADERS)]
+    if not street_indices or not game[street_indices[-1]].startswith(SUMMARY):
+        raise ValueError("Game has no summary.")
+    sb_hole_cards, bb_hole_cards = get_hole_cards(game, street_indices[-1], small_blind_name)
+
+    # line 10 is ** Dealing down cards **
+    preflop = process_street_actions(game, 10, street_indices[0])
+    if not preflop:
+        raise ValueError("Game has no preflop actions.")
+    flop_cards = turn_card = river_card = None
+    flop = turn = river = None
+    if len(street_indices) > 1:
+        header = game[street_indices[0]]
+        flop_cards = [header[-12:-10], header[-8:-6], header[-4:-2]]
+        flop = process_street_actions(game, street_indices[0], street_indices[1]) or None
+    if len(street_indices) > 2:
+        turn_card = game[street_indices[1]][-4:-2]
+        turn = process_street_actions(game, street_indices[1], street_indices[2]) or None
+    if len(street_indices) > 3:
+        river_card = game[street_indices[2]][-4:-2]
+        river = process_street_actions(game, street_indices[2], street_indices[3]) or None
+
+    return GameRecord(game[0].strip()[11:], file_name, small_blind_name, big_blind_name,
+                      preflop, flop, turn, river, flop_cards, turn_card, river_card,
+                      stack_sb, stack_bb, sb_hole_cards, bb_hole_cards, preflop[0][0] == 'f')
+
+
+def _read_games(path):
+    """
+    Yields the lines of each game of a hand history file, one game at a time.
+    """
+    game = []
+    with open(path, 'r') as file:
+        for line in file:
+            line = line.rstrip('\r\n')
+            if line.strip().startswith(GAME_START):
+                if game:
+                    yield game
+                game = [line]
+            elif game:
+                game.append(line)
+    if game:
+        yield game
+
+
+def parse_hand_histories(paths, stats=None):
+    """
+    Streams the games of 888poker hand history files, one record per game.
+    Games that cannot be parsed are logged as warnings and skipped.
+    Args:
+        - paths: Iterable of hand history file paths.
+        - stats: Optional collections.Counter, incremented with the number of
+        'files', 'games', games 'folded_pre' and parse 'errors'.
+    Yields:
+        - GameRecord of every game, in file order.
+    """
+    for path in paths:
+        file_name = os.path.basename(path)
+        if stats is not None:
+            stats['files'] += 1
+        for game in _read_games(path):
+            try:
+                record = parse_game(game, file_name)
+            except (ValueError, IndexError) as e:
+                logger.warning("An error occurred in %s: %s", file_name, e)
+                if stats is not None:
+                    stats['errors'] += 1
+                continue
+            if stats is not None:
+                stats['games'] += 1
+                stats['folded_pre'] += record.folded_pre
+            yield record
+
+
+def hand_histories_to_dataframe(paths, stats=None):
+    """
+    Parses hand history files into a dataframe with one row per game and the
+    columns of COLUMNS, the format of poker_dataframe.pkl.
+    """
+    return pd.DataFrame.from_records(parse_hand_histories(paths, stats), columns=COLUMNS)
+
+
+def _encode_column(values):
+    """
+    Dictionary encodes a column: the distinct values in order of first
+    appearance, lists compared by content, and the index of the value of
+    every row as an array of the smallest unsigned integer dtype.
+    """
+    index = {}
+    uniques = []
+    codes = []
+    for value in values:
+        key = tuple(value) if isinstance(value, list) else value
+        code = index.get(key)
+        if code is None:
+            code = index[key] = len(uniques)
+            uniques.append(value)
+        codes.append(code)
+    return np.array(codes, dtype=np.min_scalar_type(max(len(uniques) - 1, 0))), uniques
+
+
+def _decode_column(codes, uniques, column):
+    """
+    Inverse of _encode_column. The lists of LIST_COLUMNS are copied, so rows
+    never share a list.
+    """
+    values = np.empty(len(uniques), dtype=object)
+    for i, value in enumerate(uniques):
+        values[i] = value
+    decoded = values[codes].tolist()
+    if column in LIST_COLUMNS:
+        return [value if value is None else value.copy() for value in decoded]
+    return decoded
+
+
+def parse_files_to_columns(paths):
+    """
+    Parses a shard of hand history files into dictionary encoded columns, the
+    unit of work of ingest_hand_histories. Files, players, stacks, action
+    sequences and cards repeat across games, so each distinct value travels
+    back from the worker once per shard, with an array of small integer
+    codes per column.
+    Return:
+        - (columns, stats, file_games): a tuple with one (codes, uniques) pair
+        per GameRecord field, the Counter of parse_hand_histories and the
+        number of games parsed from each file.
+    """
+    stats = Counter()
+    records = []
+    file_games = []
+    for path in paths:
+        records.extend(parse_hand_histories([path], stats))
+        file_games.append(stats['games'] - sum(file_games))
+    fields = zip(*records) if records else ([] for _ in COLUMNS)
+    return tuple(map(_encode_column, fields)), stats, file_games
+
+
+def ingest_hand_histories(paths, processes=None, files_per_task=64, stats=None, file_games=None):
+    """
+    Parses hand history files into the dataframe of hand_histories_to_dataframe
+    on a pool of worker processes. The files are split into shards of
+    consecutive files and the shards are merged back in order, so the rows
+    come out in the same order as with a single process.
+    Args:
+        - paths: Sequence of hand history file paths.
+        - processes: Number of worker processes, all CPUs by default. With 1
+        the files are parsed in this process.
+        - files_per_task: Number of files per shard.
+        - stats: Optional collections.Counter, incremented with the merged
+        counters of parse_hand_histories.
+        - file_games: Optional list, extended with the number of rows of each
+        file, in the order of paths.
+    Return:
+        - pandas dataframe with one row per game and the columns of COLUMNS.
+    """
+    paths = list(paths)
+    shards = [paths[i:i + files_per_task] for i in range(0, len(paths), files_per_task)]
+    columns = [[] for _ in COLUMNS]
+    if processes == 1:
+        _merge_chunks(map(parse_files_to_columns, shards), columns, stats, file_games)
+    else:
+        with multiprocessing.Pool(processes) as pool:
+            _merge_chunks(pool.imap(parse_files_to_columns, shards), columns, stats, file_games)
+    return pd.DataFrame(dict(zip(COLUMNS, columns)), columns=COLUMNS)
+
+
+def _merge_chunks(chunks, columns, stats, file_games):
+    """
+    Appends the decoded columns of each chunk in order and adds up the
+    counters.
+    """
+    for chunk_columns, chunk_stats, chunk_file_games in chunks:
+        for column, name, (codes, uniques) in zip(columns, COLUMNS, chunk_columns):
+            column.extend(_decode_column(codes, uniques, name))
+        if stats is not None:
+            stats.update(chunk_stats)
+        if file_games is not None:
+            file_games.extend(chunk_file_games)
+
+
+def file_digest(path):
+    """
+    sha256 hex digest of the content of a file.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_manifest(manifest_path):
+    """
+    Reads the manifest of update_hand_histories: for each parsed file, keyed
+    by absolute path, its size, mtime, sha256, number of games and first and
+    last game ID. Returns an empty manifest when the file is missing or was
+    written by another parser version.
+    """
+    if os.path.exists(manifest_path):
+        with open(manifest_path, 'r') as file:
+            manifest = json.load(file)
+        if manifest.get('version') == MANIFEST_VERSION:
+            return manifest
+    return {'version': MANIFEST_VERSION, 'files': {}}
+
+
+def save_manifest(manifest, manifest_path):
+    """
+    Writes the manifest atomically, so an interrupted update leaves the last
+    complete one behind.
+    """
+    temporary = manifest_path + '.tmp'
+    with open(temporary, 'w') as file:
+        json.dump(manifest, file, indent=1, sort_keys=True)
+    os.replace(temporary, manifest_path)
+
+
+def update_hand_histories(paths, dataframe_path, manifest_path=None, processes=None, stats=None):
+    """
+    Adds the games of new or changed hand history files to a saved dataframe.
+    A file is skipped when its size and mtime match the manifest, or when only
+    the mtime changed but the content hash still matches. The other files are
+    parsed with ingest_hand_histories: their old rows (matched on 'File') are
+    dropped, so games removed from a file disappear as in a full rebuild, and
+    their games are appended to the saved dataframe and de-duplicated on
+    'Game ID', keeping the newest parse. Without a dataframe or manifest every
+    file is parsed, as in a full rebuild.
+    Args:
+        - paths: Sequence of hand history file paths.
+        - dataframe_path: Pickled dataframe of hand_histories_to_dataframe,
+        created when missing.
+        - manifest_path: JSON manifest of the parsed files, next to the
+        dataframe by default.
+        - processes: Number of worker processes for ingest_hand_histories.
+        - stats: Optional collections.Counter, incremented with the counters
+        of parse_hand_histories and the number of 'skipped' files.
+    Return:
+        - The updated dataframe, also saved to dataframe_path.
+    """
+    if manifest_path is None:
+        manifest_path = os.path.splitext(dataframe_path)[0] + '.manifest.json'
+    manifest = load_manifest(manifest_path)
+    if not os.path.exists(dataframe_path):
+        manifest['files'] = {}
+    known = manifest['files']
+    stats = Counter() if stats is None else stats
+
+    paths = list(map(os.path.abspath, paths))
+    status = {}
+    for path in paths:
+        info = os.stat(path)
+        entry = known.get(path)
+        if entry and (entry['size'], entry['mtime']) == (info.st_size, info.st_mtime):
+            continue
+        digest = file_digest(path)
+        if entry and (entry['size'], entry['sha256']) == (info.st_size, digest):
+            entry['mtime'] = info.st_mtime
+            continue
+        status[path] = (info, digest)
+    # the dataframe only holds file names, so the files named as a changed
+    # file are parsed again with it and all their old rows are dropped
+    names = {os.path.basename(path) for path in status}
+    for path in paths:
+        if path not in status and os.path.basename(path) in names:
+            status[path] = (os.stat(path), file_digest(path))
+    changed = [(path, *status[path]) for path in paths if path in status]
+    stats['skipped'] += len(paths) - len(changed)
+
+    file_games = []
+    new = ingest_hand_histories([path for path, _, _ in changed], processes,
+                                stats=stats, file_games=file_games)
+    offsets = np.cumsum([0] + file_games)
+    game_ids = new['Game ID'].tolist()
+    for (path, info, digest), start, stop in zip(changed, offsets[:-1], offsets[1:]):
+        # numeric IDs in numeric order, without failing on other IDs
+        ids = sorted(game_ids[start:stop], key=lambda game_id: (len(game_id), game_id))
+        known[path] = {'size': info.st_size, 'mtime': info.st_mtime, 'sha256': digest,
+                       'games': int(stop - start),
+                       'first_game': ids[0] if ids else None, 'last_game': ids[-1] if ids else None}
+
+    if os.path.exists(dataframe_path):
+        old = pd.read_pickle(dataframe_path)
+        old = old[~old['File'].isin(names)]
+        new = pd.concat([old, new], ignore_index=True)
+        new = new.drop_duplicates('Game ID', keep='last', ignore_index=True)
+    if changed or not os.path.exists(dataframe_path):
+        new.to_pickle(dataframe_path)
+    save_manifest(manifest, manifest_path)
+    return new
@@ -1,10 +1,52 @@
 """
 This module generates the lookup table containing all the prime 
 number keys that maps to the rank and other info of the given card
+
+The flat tables are also shipped as a versioned binary file (TABLE_PATH)
+so LookupTable.load can memory map them instead of rebuilding them. Run
+`python -m winedge.lookup` to regenerate the file after changing the tables.
+
+Evaluators share a single read-only table per process, see LookupTable.shared.
 """
+import hashlib
 import itertools
+import os
+import struct
+import threading
+
+import numpy as np
+
 from .card import Card
 
+
+def _rank_hash_tables():
+    """
+    Offsets of a perfect hash over rank multisets of up to 7 cards with at
+    most 4 cards of a rank. ways[m][k] counts the ways to spread k cards over
+    m ranks, offsets[r][k][q] counts the multisets that sort before putting q
+    of the k cards left on rank r, and base[n] stacks the hands of n cards
+    after all the smaller ones.
+    """
+    ways = [[0] * 8 for _ in range(14)]
+    ways[0][0] = 1
+    for m in range(1, 14):
+        for k in range(8):
+            ways[m][k] = sum(ways[m - 1][k - q] for q in range(min(k, 4) + 1))
+
+    offsets = np.zeros((13, 8, 5), dtype=np.int64)
+    for r in range(13):
+        for k in range(8):
+            for q in range(1, 5):
+                below = ways[12 - r][k - q + 1] if k - q + 1 >= 0 else 0
+                offsets[r, k, q] = offsets[r, k, q - 1] + below
+
+    base = np.cumsum([0] + ways[13][:7])
+    return offsets, base, sum(ways[13])
+
+
+TABLE_VERSION = 1
+TABLE_PATH = os.path.join(os.path.dirname(__file__), 'data', f'lookup_v{TABLE_VERSION}.bin')
+
 class LookupTable(object):
     """
     Number of Distinct Hand Values:
@@ -27,6 +69,11 @@ class LookupTable(object):
     Examples:
     * Royal flush (best hand possible)          => 1
     * 7-5-4-3-2 unsuited (worst hand possible)  => 7462
+
+    The 5 card tables are then extended to 6 and 7 card hands so the best
+    five card rank of a turn or river hand is a single lookup:
+        13-bit rankbits of the flush suit           => best flush rank
+        prime product of a 5, 6 or 7 card hand      => best unsuited rank
     """
     MAX_STRAIGHT_FLUSH = 10
     MAX_FOUR_OF_A_KIND = 166
@@ -50,6 +97,20 @@ class LookupTable(object):
         MAX_HIGH_CARD: 9
     }
 
+    RANK_HASH_OFFSETS, RANK_HASH_BASE, RANK_HASH_SIZE = _rank_hash_tables()
+
+    # binary file layout: header padded to FILE_OFFSET bytes, then the little
+    # endian uint16 flush_ranks and unsuited_ranks arrays
+    FILE_MAGIC = b'WEDGELUT'
+    FILE_HEADER = struct.Struct('<8sIII32s')
+    FILE_OFFSET = 64
+    # rebuilt from the arrays on first use when the table is loaded from disk
+    PYTHON_TABLES = ('flush_lookup', 'unsuited_lookup', 'flush_lookup_7', 'unsuited_lookup_7')
+
+    # process-wide table, see shared()
+    _shared = None
+    _lock = threading.RLock()
+
     RANK_CLASS_TO_STRING = {
         1: "Straight Flush",
         2: "Four of a Kind",
@@ -70,9 +131,80 @@ class LookupTable(object):
         self.flush_lookup = {}
         self.unsuited_lookup = {}
 
+        # best rank of any 5, 6 or 7 card hand, see best_of_seven()
+        self.flush_lookup_7 = [0] * (1 << 13)
+        self.unsuited_lookup_7 = {}
+
         # create the lookup table in a piecewise fashion
         self.flushes()
         self.multiples()
+        self.best_of_seven()
+        self.arrays()
+
+    def __getattr__(self, name):
+        """
+        A table loaded from disk only holds the flat arrays; the python
+        dictionaries are built from them the first time they are used.
+        """
+        if name in self.PYTHON_TABLES and 'unsuited_ranks' in self.__dict__:
+            with self._lock:
+                if name not in self.__dict__:
+                    self.python_tables()
+            return self.__dict__[name]
+        raise AttributeError(name)
+
+    @classmethod
+    def shared(cls):
+        """
+        Returns the process-wide table, loading it on first use. Every
+        evaluator references this one table instead of owning a copy, so it
+        must be treated as immutable; its arrays are read only. Thread safe,
+        and inherited by worker processes that fork after it is loaded.
+        """
+        if cls._shared is None:
+            with cls._lock:
+                if cls._shared is None:
+                    table = cls.load()
+                    table.flush_ranks.flags.writeable = False
+                    table.unsuited_ranks.flags.writeable = False
+                    cls._shared = table
+        return cls._shared
+
+    @classmethod
+    def warmup(cls):
+        """
+        Loads the shared table and builds its python dictionaries up front,
+        so a server pays for it at startup rather than on its first request.
+        """
+        table = cls.shared()
+        for name in cls.PYTHON_TABLES:
+            getattr(table, name)
+        return table
+
+    def python_tables(self):
+        """
+        Rebuilds the prime product dictionaries from the flat arrays.
+        Other threads read the tables without the lock as soon as they are
+        attributes, so each one is only assigned once complete, with
+        unsuited_lookup_7 (the one __getattr__ is asked for first) last.
+        """
+        flush_lookup_7 = self.flush_ranks.tolist()
+        flush_lookup = {
+            self.prime_product_from_rankbits(bits): rank
+            for bits, rank in enumerate(flush_lookup_7) if bin(bits).count('1') == 5}
+
+        unsuited_lookup_7 = {}
+        for size in (5, 6, 7):
+            index, products = self.rank_multisets(size)
+            ranks = self.unsuited_ranks[index]
+            unsuited_lookup_7.update(zip(products.tolist(), ranks.tolist()))
+            if size == 5:
+                unsuited_lookup = dict(zip(products.tolist(), ranks.tolist()))
+
+        self.flush_lookup_7 = flush_lookup_7
+        self.flush_lookup = flush_lookup
+        self.unsuited_lookup = unsuited_lookup
+        self.unsuited_lookup_7 = unsuited_lookup_7
 
     def prime_product_from_rankbits(self, bits):
         """
@@ -116,12 +248,14 @@ class LookupTable(object):
         for sf in straight_flushes:
             prime_product = self.prime_product_from_rankbits(sf)
             self.flush_lookup[prime_product] = rank
+            self.flush_lookup_7[sf] = rank
             rank += 1
 
         rank = self.MAX_FULL_HOUSE + 1
         for f in flushes:
             prime_product = self.prime_product_from_rankbits(f)
             self.flush_lookup[prime_product] = rank
+            self.flush_lookup_7[f] = rank
             rank += 1
 
         self.straight_and_highcards(straight_flushes, flushes)
@@ -232,6 +366,174 @@ class LookupTable(object):
                 self.unsuited_lookup[product] = rank
                 rank += 1
 
+    def best_of_seven(self):
+        """
+        Extends the 5 card tables to hands of 6 and 7 cards.
+
+        A hand of n cards is best evaluated by its best n - 1 card subset, so
+        both tables are filled one card at a time from the 5 card entries:
+
+        * flush_lookup_7 is indexed by the 13-bit rankbits of the suited cards
+          and holds the best flush among every 5 of those (5 to 7 bits set).
+        * unsuited_lookup_7 maps the prime product of a 5, 6 or 7 card hand
+          to the best unsuited rank among all its 5 card subsets. Prime
+          products are unique per rank multiset so the sizes never collide.
+
+        Flushes need no unsuited fallback: with 5 suited cards out of at most
+        7 there are not enough cards left for quads or a full house, which
+        are the only hands that beat a flush.
+        """
+        # flushes: rankbits only grow when a bit is added, so every subset
+        # with one bit less has already been filled in.
+        for bits in range(1 << 13):
+            if bin(bits).count('1') in (6, 7):
+                best = self.MAX_HIGH_CARD
+                for i in Card.INT_RANKS:
+                    if bits & (1 << i):
+                        best = min(best, self.flush_lookup_7[bits ^ (1 << i)])
+                self.flush_lookup_7[bits] = best
+
+        # unsuited: add one more rank to every hand of the previous size,
+        # skipping fifth cards of the same rank.
+        self.unsuited_lookup_7.update(self.unsuited_lookup)
+        previous = self.unsuited_lookup
+        for _ in range(2):
+            current = {}
+            for product, rank in previous.items():
+                for prime in Card.PRIMES:
+                    extended = product * prime
+                    if extended % prime ** 5 == 0:
+                        continue
+                    if rank < current.get(extended, self.MAX_HIGH_CARD + 1):
+                        current[extended] = rank
+            self.unsuited_lookup_7.update(current)
+            previous = current
+
+    def arrays(self):
+        """
+        Flat numpy copies of the 7 card tables for batch evaluation:
+
+        * flush_ranks: uint16 array indexed by 13-bit rankbits.
+        * unsuited_ranks: uint16 array indexed by rank_hash of the rank counts.
+        """
+        self.flush_ranks = np.array(self.flush_lookup_7, dtype=np.uint16)
+
+        products = np.fromiter(self.unsuited_lookup_7.keys(), dtype=np.int64,
+                               count=len(self.unsuited_lookup_7))
+        ranks = np.fromiter(self.unsuited_lookup_7.values(), dtype=np.uint16,
+                            count=len(self.unsuited_lookup_7))
+
+        # factor the prime products back into rank counts
+        counts = np.zeros((len(products), 13), dtype=np.int64)
+        for i, prime in enumerate(Card.PRIMES):
+            for power in range(1, 5):
+                counts[:, i] += products % prime ** power == 0
+
+        self.unsuited_ranks = np.zeros(self.RANK_HASH_SIZE, dtype=np.uint16)
+        self.unsuited_ranks[self.rank_hash(counts)] = ranks
+
+    @classmethod
+    def rank_hash(cls, counts):
+        """
+        Perfect hash of rank multisets, vectorized over rows.
+
+        Args:
+            counts: int array of shape (N, 13), the number of cards of each
+                rank (0 to 4, at most 7 in total) with 2 in the first column.
+
+        Returns:
+            int array of shape (N,) with distinct values in [0, RANK_HASH_SIZE).
+        """
+        counts = np.asarray(counts)
+        remaining = counts.sum(axis=1)
+        index = cls.RANK_HASH_BASE[remaining]
+        for r in Card.INT_RANKS:
+            index = index + cls.RANK_HASH_OFFSETS[r, remaining, counts[:, r]]
+            remaining = remaining - counts[:, r]
+        return index
+
+    def save(self, filepath=TABLE_PATH):
+        """
+        Writes flush_ranks and unsuited_ranks to a versioned binary file with
+        a sha256 checksum of the arrays, for LookupTable.load.
+        """
+        payload = self.flush_ranks.astype('<u2').tobytes() + \
+            self.unsuited_ranks.astype('<u2').tobytes()
+        header = self.FILE_HEADER.pack(self.FILE_MAGIC, TABLE_VERSION, len(self.flush_ranks),
+                                       len(self.unsuited_ranks), hashlib.sha256(payload).digest())
+
+        os.makedirs(os.path.dirname(os.path.abspath(filepath)), exist_ok=True)
+        # write next to the target and rename so readers never see half a file
+        with open(filepath + '.tmp', 'wb') as f:
+            f.write(header.ljust(self.FILE_OFFSET, b'\0'))
+            f.write(payload)
+        os.replace(filepath + '.tmp', filepath)
+
+    @classmethod
+    def load(cls, filepath=TABLE_PATH, verify=True):
+        """
+        Memory maps a table written by save. The arrays are read only and the
+        pages are shared by every process on the host that loads the file.
+        Falls back to building the tables when the shipped file is missing.
+
+        Args:
+            filepath: path of the binary table file.
+            verify: check the sha256 checksum of the arrays.
+
+        Returns:
+            LookupTable backed by the file.
+
+        Exceptions:
+            ValueError: Raised when the file is not a table file, has another
+            version or layout, or fails the checksum.
+        """
+        if filepath == TABLE_PATH and not os.path.exists(filepath):
+            return cls()
+
+        with open(filepath, 'rb') as f:
+            header = f.read(cls.FILE_OFFSET)
+        if len(header) < cls.FILE_OFFSET:
+            raise ValueError(f"{filepath} is not a lookup table file")
+        magic, version, n_flush, n_unsuited, digest = cls.FILE_HEADER.unpack_from(header)
+        if magic != cls.FILE_MAGIC:
+            raise ValueError(f"{filepath} is not a lookup table file")
+        if version != TABLE_VERSION:
+            raise ValueError(f"{filepath} has table version {version}, expected {TABLE_VERSION}")
+        if n_flush != 1 << 13 or n_unsuited != cls.RANK_HASH_SIZE:
+            raise ValueError(f"{filepath} has an unexpected table layout")
+
+        table = cls.__new__(cls)
+        table.flush_ranks = np.memmap(filepath, dtype='<u2', mode='r',
+                                      offset=cls.FILE_OFFSET, shape=(n_flush,))
+        table.unsuited_ranks = np.memmap(filepath, dtype='<u2', mode='r',
+                                         offset=cls.FILE_OFFSET + 2 * n_flush, shape=(n_unsuited,))
+        if verify:
+            checksum = hashlib.sha256(table.flush_ranks)
+            checksum.update(table.unsuited_ranks)
+            if checksum.digest() != digest:
+                raise ValueError(f"{filepath} failed its checksum")
+        return table
+
+    @classmethod
+    def rank_multisets(cls, size):
+        """
+        Enumerates every rank multiset of a hand size, one rank at a time.
+
+        Returns:
+            (index, products): the rank_hash and the prime product of every
+            multiset of `size` cards with at most 4 cards of a rank.
+        """
+        index = cls.RANK_HASH_BASE[[size]]
+        products = np.ones(1, dtype=np.int64)
+        remaining = np.array([size])
+        for r, prime in enumerate(Card.PRIMES):
+            parts = [(q, remaining >= q) for q in range(5)]
+            index = np.concatenate([
+                index[keep] + cls.RANK_HASH_OFFSETS[r, remaining[keep], q] for q, keep in parts])
+            products = np.concatenate([products[keep] * prime ** q for q, keep in parts])
+            remaining = np.concatenate([remaining[keep] - q for q, keep in parts])
+        return index[remaining == 0], products[remaining == 0]
+
     def write_table_to_disk(self, table, filepath):
         """
         Writes lookup table to disk
@@ -255,3 +557,7 @@ class LookupTable(object):
             t = (next_val | (next_val - 1)) + 1
             next_val = t | ((((t & -t) // (next_val & -next_val)) >> 1) - 1)
             yield next_val
+
+
+if __name__ == '__main__':
+    LookupTable().save()
@@ -0,0 +1,253 @@
+"""
+Preflop Module
+
+The evaluator needs at least 5 cards, so before the flop hand strength comes
+from a precomputed table instead: the exact heads up all-in equity of each of
+the 169 starting hand classes against each other and against a random hand.
+The table ships with the package (PREFLOP_PATH) and is loaded once, after
+which every query is a single array lookup.
+
+The 169 classes are laid out on a 13 x 13 grid of ranks from ace to deuce:
+pairs on the diagonal, suited hands above it and offsuit hands below it, so
+'AKs' is class 1 and 'AKo' is class 13.
+
+Dependencies:
+--------------
+- card.py
+- evaluator.py
+- equity.py
+
+Functions:
+--------------
+- hand_class(hole_cards):
+    Class index (0 to 168) of two hole cards, or of a class name like 'AKs'.
+
+- preflop_equity(hero, villain=None):
+    Equity of the hero class against a villain class or a random hand.
+
+- build_preflop_table(processes=None):
+    Computes the table exactly by enumerating every board, on a process pool.
+    Run `python -m winedge.preflop` to regenerate the shipped file.
+
+Exception:
+--------------
+- ValueError: Raised for invalid hole cards or class names.
+"""
+
+import functools
+import multiprocessing
+import os
+
+import numpy as np
+
+from .card import Card
+from .equity import DECK, index_combinations
+from .evaluator import Evaluator
+
+RANKS = 'AKQJT98765432'
+CLASS_NAMES = [
+    RANKS[i] * 2 if i == j else
+    RANKS[i] + RANKS[j] + 's' if i < j else
+    RANKS[j] + RANKS[i] + 'o'
+    for i in range(13) for j in range(13)]
+CLASS_INDEX = {name: i for i, name in enumerate(CLASS_NAMES)}
+
+PREFLOP_PATH = os.path.join(os.path.dirname(__file__), 'data', 'preflop_v1.npz')
+
+# every two card combination as deck indices, sorted by class
+_COMBOS = index_combinations(len(DECK), 2)
+_HIGH, _LOW = 12 - _COMBOS[:, 1] // 4, 12 - _COMBOS[:, 0] // 4
+_COMBO_CLASS = np.where(_HIGH == _LOW, _HIGH * 14,
+                        np.where(_COMBOS[:, 0] % 4 == _COMBOS[:, 1] % 4,
+                                 _HIGH * 13 + _LOW, _LOW * 13 + _HIGH))
+_ORDER = np.argsort(_COMBO_CLASS, kind='stable')
+COMBOS, COMBO_CLASS = _COMBOS[_ORDER], _COMBO_CLASS[_ORDER]
+COMBO_MASKS = (np.uint64(1) << COMBOS[:, 0].astype(np.uint64)) | \
+    (np.uint64(1) << COMBOS[:, 1].astype(np.uint64))
+
+
+def hand_class(hole_cards):
+    """
+    Returns the class index (0 to 168) of a starting hand.
+    Args:
+        - hole_cards: Two hole cards (ints from Card.new), or a class name such
+        as 'AA', 'AKs' or 'T9o'.
+    Return:
+        - (int) index of the class in CLASS_NAMES.
+    Exceptions:
+        - ValueError: Raised for unknown class names or invalid hole cards.
+    """
+    if isinstance(hole_cards, str):
+        if hole_cards not in CLASS_INDEX:
+            raise ValueError(f"Unknown starting hand class {hole_cards!r}")
+        return CLASS_INDEX[hole_cards]
+
+    if len(hole_cards) != 2 or hole_cards[0] == hole_cards[1]:
+        raise ValueError("Hole cards must be two different cards.")
+    first, second = sorted((14 - Card.get_rank_int(card) for card in hole_cards))
+    if first == second:
+        return first * 14
+    if Card.get_suit_int(hole_cards[0]) == Card.get_suit_int(hole_cards[1]):
+        return first * 13 + second
+    return second * 13 + first
+
+
+@functools.lru_cache(maxsize=None)
+def load_preflop_table(filepath=PREFLOP_PATH):
+    """
+    Loads the preflop table once per process.
+    Return:
+        - (equity, vs_random): read-only float32 arrays of shape (169, 169)
+        with the equity of the row class against the column class, and of
+        shape (169,) with the equity of each class against a random hand.
+    """
+    with np.load(filepath) as table:
+        equity, vs_random = table['equity'], table['vs_random']
+    equity.flags.writeable = False
+    vs_random.flags.writeable = False
+    return equity, vs_random
+
+
+def preflop_equity(hero, villain=None):
+    """
+    Heads up all-in equity of a starting hand before the flop, read from the
+    precomputed table. Hands are averaged over the combinations of their
+    class, so the suits only matter through suited or offsuit.
+    Args:
+        - hero: Two hole cards (ints from Card.new) or a class name.
+        - villain: Two hole cards or a class name, or None for a random hand.
+    Return:
+        - (float) share of the pot the hero wins on average.
+    Exceptions:
+        - ValueError: Raised for unknown class names or invalid hole cards.
+    """
+    equity, vs_random = load_preflop_table()
+    if villain is None:
+        return float(vs_random[hand_class(hero)])
+    return float(equity[hand_class(hero), hand_class(villain)])
+
+
+def canonical_boards():
+    """
+    Every 5 card board up to a relabelling of the suits, with the number of
+    boards it stands for. Matchups between classes do not change when the
+    suits are relabelled, so the table only needs one board of each kind.
+    Return:
+        - (boards, weights): deck indices of shape (M, 5) and int64 counts.
+    """
+    boards = index_combinations(len(DECK), 5, dtype=np.uint8)
+    rows = np.arange(len(boards))
+    masks = np.zeros((len(boards), 4), dtype=np.int64)
+    for column in boards.T:
+        masks[rows, column % 4] |= 1 << (column // 4).astype(np.int64)
+    masks.sort(axis=1)
+    keys = (masks[:, 0] << 39) | (masks[:, 1] << 26) | (masks[:, 2] << 13) | masks[:, 3]
+    _, first, weights = np.unique(keys, return_index=True, return_counts=True)
+    return boards[first], weights
+
+
+def board_matchup_counts(boards, weights):
+    """
+    Counts the heads up showdowns between every pair of classes on the given
+    boards. Every hand is ranked once per board and counted in a histogram of
+    ranks per class, the showdowns between two classes are then products of
+    their histograms, and pairs of hands sharing a card are taken back out.
+    Args:
+        - boards: int array of shape (M, 5) of deck indices.
+        - weights: number of boards each row stands for.
+    Return:
+        - (wins, ties, pairs): float64 arrays of shape (169, 169) counting the
+        row class winning, tying and all showdowns against the column class.
+    """
+    evaluator = Evaluator()
+    combo_state = evaluator._card_state(DECK[COMBOS])
+    shared = (COMBO_MASKS[:, None] & COMBO_MASKS[None, :]) != 0
+    first, second = np.nonzero(shared)
+    conflict_class = COMBO_CLASS[first] * 169 + COMBO_CLASS[second]
+
+    wins = np.zeros((169, 169))
+    ties = np.zeros((169, 169))
+    pairs = np.zeros((169, 169))
+    for board, weight in zip(np.asarray(boards), weights):
+        board_mask = np.bitwise_or.reduce(np.uint64(1) << board.astype(np.uint64))
+        valid = (COMBO_MASKS & board_mask) == 0
+        board_state = evaluator._card_state(DECK[board][None])
+        ranks = evaluator._state_ranks(evaluator._add_states(
+            board_state, tuple(part[valid] for part in combo_state)))
+        classes = COMBO_CLASS[valid]
+
+        # histogram of hand ranks per class on the distinct ranks of the board,
+        # a hand beats the villain hands of a class ranked above it
+        distinct, position = np.unique(ranks, return_inverse=True)
+        hist = np.bincount(classes * len(distinct) + position,
+                           minlength=169 * len(distinct)).reshape(169, len(distinct)).astype(float)
+        at_most = np.cumsum(hist, axis=1)
+        total = at_most[:, -1]
+        wins += weight * (hist @ (total[:, None] - at_most).T)
+        ties += weight * (hist @ hist.T)
+        pairs += weight * np.outer(total, total)
+
+        # take out pairs of hands sharing a card, including a hand with itself
+        index = np.cumsum(valid) - 1
+        both = valid[first] & valid[second]
+        hero_rank = ranks[index[first[both]]]
+        villain_rank = ranks[index[second[both]]]
+        flat = conflict_class[both]
+        wins -= weight * np.bincount(flat, weights=hero_rank < villain_rank,
+                                     minlength=169 * 169).reshape(169, 169)
+        ties -= weight * np.bincount(flat, weights=hero_rank == villain_rank,
+                                     minlength=169 * 169).reshape(169, 169)
+        pairs -= weight * np.bincount(flat, minlength=169 * 169).reshape(169, 169)
+
+    return wins, ties, pairs
+
+
+def _board_matchup_counts(args):
+    """
+    Pool worker for board_matchup_counts.
+    """
+    return board_matchup_counts(*args)
+
+
+def build_preflop_table(processes=None, chunk_size=500):
+    """
+    Computes the exact heads up all-in equity of every class against every
+    class and against a random hand, by enumerating every board on a pool of
+    worker processes. All counts are integers, so the result does not depend
+    on how the boards are split between the workers.
+    Args:
+        - processes: Number of worker processes, all CPUs by default.
+        - chunk_size: Number of boards per task.
+    Return:
+        - (equity, vs_random): float32 arrays of shape (169, 169) and (169,).
+    """
+    boards, weights = canonical_boards()
+    tasks = [(boards[i:i + chunk_size], weights[i:i + chunk_size])
+             for i in range(0, len(boards), chunk_size)]
+
+    wins = np.zeros((169, 169))
+    ties = np.zeros((169, 169))
+    pairs = np.zeros((169, 169))
+    with multiprocessing.Pool(processes) as pool:
+        for chunk_wins, chunk_ties, chunk_pairs in pool.imap_unordered(_board_matchup_counts, tasks):
+            wins += chunk_wins
+            ties += chunk_ties
+            pairs += chunk_pairs
+
+    pot = wins + ties / 2
+    equity = pot / pairs
+    vs_random = pot.sum(axis=1) / pairs.sum(axis=1)
+    return equity.astype(np.float32), vs_random.astype(np.float32)
+
+
+def save_preflop_table(equity, vs_random, filepath=PREFLOP_PATH):
+    """
+    Writes the arrays of build_preflop_table for load_preflop_table.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(filepath)), exist_ok=True)
+    with open(filepath, 'wb') as f:
+        np.savez(f, equity=equity, vs_random=vs_random)
+
+
+if __name__ == '__main__':
+    save_preflop_table(*build_preflop_table())
@@ -0,0 +1,337 @@
+"""
+Ranges Module
+
+A range is what a player could be holding: a weight for each of the 1326 two
+card combinations, in the order of preflop.COMBOS. Ranges are parsed from the
+usual shorthand, e.g. "QQ+, AKs, T9s, A5s-A2s, KQo:0.5, AhKh".
+
+range_equity compares two ranges on a board. Every combination is ranked once
+per runout with the batch evaluator, then the villain weight each hero
+combination beats or ties is read off a cumulative sum of the sorted ranks.
+Villain combinations sharing a card with the hero combination are taken back
+out with the same sums over the 51 combinations holding each card, so the
+cost grows with the number of combinations instead of the number of pairs.
+
+Dependencies:
+--------------
+- card.py
+- evaluator.py
+- equity.py
+- preflop.py
+
+Classes:
+--------------
+- Range:
+    Weight vector over the 1326 combinations, parsed from a string.
+
+Functions:
+--------------
+- range_equity(hero_range, villain_range, board, iterations, seed, exact):
+    Win, tie and loss probabilities of a range against a range. Exact when
+    the number of runouts is at most RANGE_EXACT_LIMIT, Monte Carlo otherwise.
+
+Exception:
+--------------
+- ValueError: Raised for invalid range strings, board sizes and duplicate cards.
+"""
+
+import re
+from math import comb
+from statistics import NormalDist
+
+import numpy as np
+
+from .card import Card
+from .equity import DECK, DECK_INDEX, EquityResult, deal, index_combinations
+from .evaluator import Evaluator
+from .preflop import CLASS_INDEX, COMBO_CLASS, COMBO_MASKS, COMBOS, RANKS
+
+# combination index of each pair of deck indices, in both orders
+COMBO_INDEX = {pair: i for i, combo in enumerate(COMBOS.tolist())
+               for pair in (tuple(combo), tuple(combo[::-1]))}
+# the 51 combinations holding each card of the deck
+CARD_COMBOS = np.array([np.flatnonzero((COMBOS == card).any(axis=1)) for card in range(len(DECK))])
+
+# range_equity picks exact enumeration up to this many runouts
+RANGE_EXACT_LIMIT = 2000
+# runouts scored per batch
+RANGE_BATCH_SIZE = 64
+
+_RANK = '[2-9TJQKA]'
+_COMBO = re.compile(f'({_RANK}[shdc])({_RANK}[shdc])')
+_PAIR = re.compile(f'({_RANK})\\1(\\+)?')
+_PAIR_SPAN = re.compile(f'({_RANK})\\1-({_RANK})\\2')
+_HAND = re.compile(f'({_RANK})({_RANK})([so]?)(\\+)?')
+_HAND_SPAN = re.compile(f'({_RANK})({_RANK})([so]?)-\\1({_RANK})\\3')
+
+
+class Range:
+    """
+    Weights of the 1326 two card combinations a player could hold.
+
+    Attributes:
+        - weights: float64 array of shape (1326,) in the order of preflop.COMBOS.
+    """
+
+    def __init__(self, weights=None):
+        """
+        Builds a range from a weight vector, or from a range string as in
+        Range.parse. An empty range by default.
+        """
+        if isinstance(weights, str):
+            weights = Range.parse(weights).weights
+        elif weights is None:
+            weights = np.zeros(len(COMBOS))
+        weights = np.array(weights, dtype=np.float64)
+        if weights.shape != (len(COMBOS),) or (weights < 0).any():
+            raise ValueError(f"A range needs {len(COMBOS)} non-negative weights.")
+        self.weights = weights
+
+    def __len__(self):
+        """
+        Number of combinations in the range.
+        """
+        return int(np.count_nonzero(self.weights))
+
+    def __repr__(self):
+        return f'Range({len(self)} combos)'
+
+    @classmethod
+    def parse(cls, text):
+        """
+        Parses a comma separated range string. Every part gets weight 1, or
+        the weight after a colon, and later parts overwrite earlier ones.
+        Args:
+            - text: Parts such as 'QQ+' (QQ, KK and AA), '22-55', 'AKs', 'AKo',
+            'AK' (suited and offsuit), 'ATs+' (ATs to AKs), 'A5s-A2s' or a
+            single combination like 'AhKh'.
+        Return:
+            - Range
+        Exceptions:
+            - ValueError: Raised for parts that cannot be parsed.
+        """
+        hand_range = cls()
+        for part in text.split(','):
+            part = part.strip()
+            if not part:
+                continue
+            part, _, weight = part.partition(':')
+            try:
+                weight = float(weight) if weight else 1.0
+            except ValueError:
+                raise ValueError(f"Invalid weight in range part {part!r}") from None
+            if weight < 0:
+                raise ValueError(f"Invalid weight in range part {part!r}")
+            hand_range.weights[cls._part_combos(part.strip())] = weight
+        return hand_range
+
+    @classmethod
+    def from_hand(cls, hole_cards):
+        """
+        Range holding only the given two hole cards (ints from Card.new).
+        """
+        if len(hole_cards) != 2:
+            raise ValueError("Hole cards must be exactly two cards.")
+        try:
+            index = COMBO_INDEX[DECK_INDEX[int(hole_cards[0])], DECK_INDEX[int(hole_cards[1])]]
+        except KeyError:
+            raise ValueError("Hole cards must be two different cards.") from None
+        hand_range = cls()
+        hand_range.weights[index] = 1.0
+        return hand_range
+
+    @staticmethod
+    def _part_combos(part):
+        """
+        Indices of the combinations of one part of a range string.
+        """
+        match = _COMBO.fullmatch(part)
+        if match:
+            first, second = (DECK_INDEX[Card.new(card)] for card in match.groups())
+            if first == second:
+                raise ValueError(f"Invalid range part {part!r}")
+            return [COMBO_INDEX[first, second]]
+
+        # RANKS runs from the ace down, so a '+' goes towards index 0
+        match = _PAIR.fullmatch(part)
+        if match:
+            rank = RANKS.index(match.group(1))
+            ranks = range(rank + 1) if match.group(2) else [rank]
+            return _class_combos([RANKS[r] * 2 for r in ranks])
+
+        match = _PAIR_SPAN.fullmatch(part)
+        if match:
+            low, high = sorted(RANKS.index(rank) for rank in match.groups())
+            return _class_combos([RANKS[r] * 2 for r in range(low, high + 1)])
+
+        match = _HAND.fullmatch(part)
+        span = _HAND_SPAN.fullmatch(part)
+        if match or span:
+            match = match or span
+            high, kicker = RANKS.index(match.group(1)), RANKS.index(match.group(2))
+            if span:
+                first, last = sorted((kicker, RANKS.index(span.group(4))))
+                kickers = range(first, last + 1)
+            elif match.group(4):
+                kickers = range(high + 1, kicker + 1)
+            else:
+                kickers = [kicker]
+            if kicker <= high or kickers[0] <= high:
+                raise ValueError(f"Invalid range part {part!r}")
+            suits = [match.group(3)] if match.group(3) else ['s', 'o']
+            return _class_combos([RANKS[high] + RANKS[k] + suit for k in kickers for suit in suits])
+
+        raise ValueError(f"Invalid range part {part!r}")
+
+
+def _class_combos(names):
+    """
+    Indices of the combinations of the given starting hand classes.
+    """
+    classes = [CLASS_INDEX[name] for name in names]
+    return np.flatnonzero(np.isin(COMBO_CLASS, classes))
+
+
+def _as_range(hand_range):
+    """
+    Range of a Range, a range string or two hole cards.
+    """
+    if isinstance(hand_range, Range):
+        return hand_range
+    if isinstance(hand_range, str):
+        return Range.parse(hand_range)
+    return Range.from_hand(hand_range)
+
+
+def _weight_above(keys, weights, queries):
+    """
+    Sums weights by group: keys hold a group number times 8192 plus a hand
+    rank. For every query key, returns the weight of its group ranked above it
+    (worse hands), at the same rank, and in total.
+    """
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    cumulative = np.concatenate([[0.0], np.cumsum(weights[order])])
+    group = queries // 8192 * 8192
+    group_start = cumulative[np.searchsorted(sorted_keys, group, side='left')]
+    group_end = cumulative[np.searchsorted(sorted_keys, group + 8192, side='left')]
+    at_most = cumulative[np.searchsorted(sorted_keys, queries, side='right')]
+    below = cumulative[np.searchsorted(sorted_keys, queries, side='left')]
+    return group_end - at_most, at_most - below, group_end - group_start
+
+
+def _runout_counts(evaluator, weights, boards):
+    """
+    Weighted wins, ties and showdowns of the hero range against the villain
+    range on each complete board.
+    Args:
+        - evaluator: The Evaluator used to rank the hands.
+        - weights: (hero, villain, active), the float64 weights of both ranges
+        on the combinations COMBOS[active] held by either range.
+        - boards: int array of shape (R, 5) of deck indices.
+    Return:
+        - (wins, ties, showdowns): float64 arrays of shape (R,).
+    """
+    hero, villain, active = weights
+    n_boards, n_combos = len(boards), len(active)
+    board_masks = np.bitwise_or.reduce(np.uint64(1) << boards.astype(np.uint64), axis=1)
+    valid = (COMBO_MASKS[active][None, :] & board_masks[:, None]) == 0
+    rows, combos = np.nonzero(valid)
+
+    # rank every combination once per board, sharing the board part
+    board_state = evaluator._card_state(DECK[boards])
+    combo_state = evaluator._card_state(DECK[COMBOS[active]])
+    state = evaluator._add_states(tuple(part[rows] for part in board_state),
+                                  tuple(part[combos] for part in combo_state))
+    ranks = np.zeros((n_boards, n_combos), dtype=np.int64)
+    ranks[rows, combos] = evaluator._state_ranks(state)
+    hero_weights = np.where(valid, hero, 0.0).ravel()
+    villain_weights = np.where(valid, villain, 0.0)
+
+    # villain weight ranked above and at each hero combination on its board
+    board_keys = np.arange(n_boards)[:, None]
+    keys = (board_keys * 8192 + ranks).ravel()
+    beaten, tied, total = _weight_above(keys, villain_weights.ravel(), keys)
+
+    # the same over the villain combinations holding each card of the hero
+    # combination, counting the combination itself (held twice) once
+    cards = COMBOS[active]
+    card_keys = ((board_keys * len(DECK) + cards.T.ravel()) * 8192 + np.tile(ranks, 2)).ravel()
+    card_weights = np.tile(villain_weights, 2).ravel()
+    for card in cards.T:
+        queries = ((board_keys * len(DECK) + card) * 8192 + ranks).ravel()
+        card_beaten, card_tied, card_total = _weight_above(card_keys, card_weights, queries)
+        beaten -= card_beaten
+        tied -= card_tied
+        total -= card_total
+    tied += villain_weights.ravel()
+    total += villain_weights.ravel()
+
+    return tuple((hero_weights * counts).reshape(n_boards, n_combos).sum(axis=1)
+                 for counts in (beaten, tied, total))
+
+
+def range_equity(hero_range, villain_range, board=(), iterations=1000, seed=None,
+                 confidence=0.95, exact=None, exact_limit=RANGE_EXACT_LIMIT):
+    """
+    Computes the equity of a range against a range. The weight of each pair of
+    combinations that do not share a card is the product of their weights, so
+    a single hand against a range is Range.from_hand against that range.
+    Args:
+        - hero_range, villain_range: Range, range string or two hole cards.
+        - board: The 0 to 5 board cards dealt so far (ints from Card.new).
+        - iterations: Number of sampled runouts for the Monte Carlo estimate.
+        - seed: Seed of the random generator for reproducible estimates.
+        - confidence: Confidence level of the interval on the equity.
+        - exact: True to enumerate every runout, False to sample, None to
+        enumerate when there are at most exact_limit runouts.
+    Return:
+        - EquityResult with the weighted win, tie and loss probabilities, and
+        the number of runouts as iterations.
+    Exceptions:
+        - ValueError: Raised for invalid ranges, board sizes or duplicate
+        cards, and for ranges that never meet on the board.
+    """
+    hero = _as_range(hero_range).weights
+    villain = _as_range(villain_range).weights
+    board = [int(card) for card in board]
+    if len(board) > 5:
+        raise ValueError("The board holds at most five cards.")
+    if len(set(board)) < len(board):
+        raise ValueError("Duplicate cards found in the input.")
+    if not all(card in DECK_INDEX for card in board):
+        raise ValueError("Unknown card found in the input.")
+
+    dealt = np.array([DECK_INDEX[card] for card in board], dtype=np.intp)
+    deck = np.setdiff1d(np.arange(len(DECK)), dealt)
+    missing = 5 - len(board)
+    if exact is None:
+        exact = comb(len(deck), missing) <= exact_limit
+    if exact:
+        runouts = deck[index_combinations(len(deck), missing)]
+    else:
+        runouts = deal(np.random.default_rng(seed), deck, iterations, missing)
+    boards = np.concatenate([np.broadcast_to(dealt, (len(runouts), len(dealt))), runouts], axis=1)
+
+    active = np.flatnonzero((hero > 0) | (villain > 0))
+    weights = (hero[active], villain[active], active)
+    evaluator = Evaluator()
+    counts = [np.concatenate(parts) for parts in zip(*(
+        _runout_counts(evaluator, weights, boards[i:i + RANGE_BATCH_SIZE])
+        for i in range(0, len(boards), RANGE_BATCH_SIZE)))]
+    wins, ties, showdowns = counts
+    total = showdowns.sum()
+    if total == 0:
+        raise ValueError("The ranges have no combinations left that can meet on the board.")
+
+    win, tie = wins.sum() / total, ties.sum() / total
+    share = win + tie / 2
+    if exact:
+        interval = (share, share)
+    else:
+        # ratio estimator over the sampled runouts
+        residual = wins + ties / 2 - share * showdowns
+        error = np.sqrt((residual ** 2).sum() * len(boards) / max(len(boards) - 1, 1)) / total
+        margin = NormalDist().inv_cdf(0.5 + confidence / 2) * error
+        interval = (max(share - margin, 0.0), min(share + margin, 1.0))
+    return EquityResult(win, tie, 1 - win - tie, share, interval, len(boards))
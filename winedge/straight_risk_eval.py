@@ -5,14 +5,93 @@ This module contains a function to quantify the risk of a straight being present
 based on the board card in our historical dataset at the flop, turn, and river
 stages of the game. Requires input dataframe generated by the
 create_dataframe.py module.
+
+Each board is reduced to a 13-bit mask of its ranks (bit 0 for deuces, bit 12
+for aces), and the risk of every mask is read from STRAIGHT_RISK, a table of
+all 8192 masks, so every street of the whole dataset is scored at once.
 """
 import os
-import warnings
+from functools import lru_cache
 
 import numpy as np
-import pandas as pd
 
 from . import Card
+from .dataset import read_poker_dataframe
+
+# columns read from a Parquet dataset
+STRAIGHT_COLUMNS = ['Game ID', 'Flop', 'Turn', 'River']
+STREET_COLUMNS = ('Flop', 'Turn', 'River')
+
+
+def straight_risk(int_ranks):
+    """
+    Straight risk of the board cards with the given integer ranks (2 to 14),
+    the rule of straight_eval_to_df: sort the distinct ranks, with aces also
+    counted as 1, and look at the runs of differences of 1 or 2 between them.
+    """
+    int_rank = sorted(set(int_ranks))
+    # Deal with aces being low and high.
+    if 14 in int_rank:
+        int_rank.insert(0, 1)
+    diff = ''.join(str(int_rank[i + 1] - int_rank[i]) for i in range(len(int_rank) - 1))
+    if not any(pattern in diff for pattern in ('11', '22', '12', '21')):
+        return 1
+    # If 2 consecutive differences of 2, risk 2
+    if '22' in diff:
+        return 2
+    # Otherwise the longest run of differences of 1 or 2 is the risk.
+    count = 0
+    max_count = 0
+    for i in range(len(int_rank) - 1):
+        if int_rank[i + 1] - int_rank[i] in (1, 2):
+            count += 1
+            max_count = max(max_count, count)
+        else:
+            count = 0
+    return max_count
+
+
+@lru_cache(maxsize=None)
+def straight_risk_table():
+    """
+    Straight risk of every 13-bit rank mask, as a read-only uint8 array.
+    """
+    table = np.array([straight_risk([rank + 2 for rank in range(13) if mask >> rank & 1])
+                      for mask in range(1 << 13)], dtype=np.uint8)
+    table.flags.writeable = False
+    return table
+
+
+def rank_bits(cards):
+    """
+    Rank bits of an array of card strings like 'Qh'.
+    """
+    return (Card.new_many(cards) >> 16).astype(np.uint16)
+
+
+def board_rank_masks(df):
+    """
+    Rank masks of the board at the flop, turn and river of every game.
+    Args:
+        - df: dataframe with the 'Flop', 'Turn' and 'River' columns of the
+        poker_dataframe.
+    Return:
+        - masks: uint16 array of shape (len(df), 3).
+        - dealt: boolean array of shape (len(df), 3), False for streets the
+        game did not reach.
+    """
+    dealt = np.column_stack([df[column].notna().to_numpy() for column in STREET_COLUMNS])
+    masks = np.zeros((len(df), 3), dtype=np.uint16)
+    flop = dealt[:, 0]
+    if flop.any():
+        masks[flop, 0] = np.bitwise_or.reduce(rank_bits(df['Flop'][flop].tolist()), axis=1)
+    for street in (1, 2):
+        masks[:, street] = masks[:, street - 1]
+        rows = dealt[:, street]
+        if rows.any():
+            masks[rows, street] |= rank_bits(df[STREET_COLUMNS[street]][rows])
+    return masks, dealt
+
 
 def straight_eval_to_df(poker_df_filepath):
     """
@@ -40,7 +119,8 @@ def straight_eval_to_df(poker_df_filepath):
     Args:
     --------------
         - poker_df_filepath: .pkl dataframe file formated in same way as
-        poker_dataframe created by the create_dataframe.py module.
+        poker_dataframe created by the create_dataframe.py module, or a
+        Parquet dataset directory of which only STRAIGHT_COLUMNS are read.
 
     Return:
     --------------
@@ -51,125 +131,14 @@ def straight_eval_to_df(poker_df_filepath):
         poker_df_straight_risk.pkl file with straight risk columns exported
         to current working directory.
     """
-    st_df = pd.read_pickle(poker_df_filepath)
+    st_df = read_poker_dataframe(poker_df_filepath, STRAIGHT_COLUMNS)
 
     #Add Columns to dataframe for Flop, Turn, and River straight risk.
-    warnings.filterwarnings('ignore')
-    st_df['Flop Straight Risk'] = np.nan
-    st_df['Turn Straight Risk'] = np.nan
-    st_df['River Straight Risk'] = np.nan
-
-    # Calculate straight risk at flop.
-    for loc in st_df.index:
-        if st_df['Flop'][loc] is not None:
-            # Create sorted list of integer rank of board cards ignoring
-            # repeats.
-            rank_char = [card[0] for card in st_df['Flop'][loc]]
-            rank_char = list(set(rank_char))
-            int_rank = [Card.CHAR_RANK_TO_INT_RANK[char] for char in rank_char]
-            # Deal with aces being low and high.
-            if 14 in int_rank:
-                int_rank.append(1)
-            int_rank = sorted(int_rank)
-            # set initial risk
-            risk = 1
-            # Calculate differences between board cards
-            diff = [int_rank[i + 1] - int_rank[i] \
-                    for i in range(len(int_rank) - 1)]
-            # If there are consecutive differences of 1 or 2 analyze further
-            if '11' in ''.join(map(str, diff)) or '22' in ''.join(
-                map(str, diff)) or '12' in ''.join(
-                    map(str, diff)) or '21' in ''.join(map(str, diff)):
-
-                # If 2 consecutive differences of 2, risk -2
-                if '22' in ''.join(map(str, diff)):
-                    risk = 2
-
-                # The number of consecutive 1's or 2's in difference list
-                # will equal the risk value.
-                else:
-                    count = 0
-                    max_count = 0
-                    for num in diff:
-                        if num == 1 or num ==2:
-                            count +=1
-                            max_count = max(max_count,count)
-                        else:
-                            count = 0
-                    risk = max_count
-            else:
-                risk = 1
-            st_df['Flop Straight Risk'][loc] = risk
-        else:
-            continue
-
-    # Calc straight risk at turn.
-    for loc in st_df.index:
-        if st_df['Turn'][loc] is not None:
-            rank_char = [card[0] for card in st_df['Flop'][loc]] + [
-                st_df['Turn'][loc][0]]
-            rank_char = list(set(rank_char))
-            int_rank = [Card.CHAR_RANK_TO_INT_RANK[char] for char in rank_char]
-            if 14 in int_rank:
-                int_rank.append(1)
-            int_rank = sorted(int_rank)
-
-            diff = [int_rank[i + 1] - int_rank[i] \
-                    for i in range(len(int_rank) - 1)]
-            if '11' in ''.join(map(str, diff)) or '22' in ''.join(
-                map(str, diff)) or '12' in ''.join(
-                    map(str, diff)) or '21' in ''.join(map(str, diff)):
-                if '22' in ''.join(map(str, diff)):
-                    risk = 2
-                else:
-                    count = 0
-                    max_count = 0
-                    for num in diff:
-                        if num == 1 or num ==2:
-                            count +=1
-                            max_count = max(max_count,count)
-                        else:
-                            count = 0
-                    risk = max_count
-            else:
-                risk = 1
-            st_df['Turn Straight Risk'][loc] = risk
-        else:
-            continue
-
-    # Calc straight risk at river.
-    for loc in st_df.index:
-        if st_df['River'][loc] is not None:
-            rank_char = [card[0] for card in st_df['Flop'][loc]] + [
-                st_df['Turn'][loc][0]] + [st_df['River'][loc][0]]
-            rank_char = list(set(rank_char))
-            int_rank = [Card.CHAR_RANK_TO_INT_RANK[char] for char in rank_char]
-            if 14 in int_rank:
-                int_rank.append(1)
-            int_rank = sorted(int_rank)
-
-            diff = [int_rank[i + 1] - int_rank[i] \
-                    for i in range(len(int_rank) - 1)]
-            if '11' in ''.join(map(str, diff)) or '22' in ''.join(
-                map(str, diff)) or '12' in ''.join(
-                    map(str, diff)) or '21' in ''.join(map(str, diff)):
-                if '22' in ''.join(map(str, diff)):
-                    risk = 2
-                else:
-                    count = 0
-                    max_count = 0
-                    for num in diff:
-                        if num == 1 or num ==2:
-                            count +=1
-                            max_count = max(max_count,count)
-                        else:
-                            count = 0
-                    risk = max_count
-            else:
-                risk = 1
-            st_df['River Straight Risk'][loc] = risk
-        else:
-            continue
+    masks, dealt = board_rank_masks(st_df)
+    risk = np.where(dealt, straight_risk_table()[masks], np.nan)
+    st_df['Flop Straight Risk'] = risk[:, 0]
+    st_df['Turn Straight Risk'] = risk[:, 1]
+    st_df['River Straight Risk'] = risk[:, 2]
 
     poker_df_straight_risk = os.path.join(os.getcwd(),
                                           "poker_df_straight_risk.pkl")
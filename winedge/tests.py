@@ -7,20 +7,103 @@ Classes:
 - TestEvaluator(unittest.TestCase):
     Unit testing class for the evaluator.py module. Contains methods to unittest
     the evaluator.py module including hand evaluation and hand comparision
-    one shot tests.
+    one shot tests, the incremental hand state and the draws of partial hands.
+
+- TestLookupTable(unittest.TestCase):
+    Unit testing class for the lookup.py module. Contains methods to unittest
+    saving and memory mapping the binary lookup table file.
+
+- TestEquity(unittest.TestCase):
+    Unit testing class for the equity.py module. Contains methods to unittest
+    Monte Carlo and exact equity against known matchups and enumeration.
+
+- TestPreflop(unittest.TestCase):
+    Unit testing class for the preflop.py module. Contains methods to unittest
+    the shipped preflop table against known matchups and board enumeration.
+
+- TestRanges(unittest.TestCase):
+    Unit testing class for the ranges.py module. Contains methods to unittest
+    range parsing and range against range equity against enumeration.
+
+- TestHandHistory(unittest.TestCase):
+    Unit testing class for the hand_history.py module. Contains methods to
+    unittest parsing 888poker hand history files.
+
+- TestDataset(unittest.TestCase):
+    Unit testing class for the dataset.py module. Contains methods to unittest
+    the columnar schema and the partitioned Parquet dataset.
+
+- TestActions(unittest.TestCase):
+    Unit testing class for the actions.py module. Contains methods to unittest
+    the packed actions against the per game features.
+
+- TestStraightRisk(unittest.TestCase):
+    Unit testing class for the straight_risk_eval.py module. Contains methods
+    to unittest the straight risk table against known boards.
+
+- TestFlushRisk(unittest.TestCase):
+    Unit testing class for the adding_flush.py module. Contains methods to
+    unittest the suit counts of every street.
+
+- TestFeatures(unittest.TestCase):
+    Unit testing class for the features.py module. Contains methods to
+    unittest the stage ordering, the pipeline against the feature modules,
+    the river attribution of bluff_eval, the stage cache and chunked
+    processing.
+
+- TestHand(unittest.TestCase):
+    Unit testing class for the hand.py module. Contains methods to unittest
+    card index conversions and evaluating Hand and Board card masks.
+
+- TestBenchmark(unittest.TestCase):
+    Unit testing class for the benchmark.py module. Contains methods to
+    unittest the synthetic games, the JSON baselines and regression checks.
 
 - TestCard(unittest.TestCase):
     Unit testing class for the card.py module. Contains methods to unittest the
-    card.py module including a smoke test for card generation.
+    card.py module including a smoke test for card generation, suit
+    canonicalization and bulk parsing of card strings.
 
 
 """
 
+import itertools
+import os
+import random
+import tempfile
+import threading
 import unittest
+from collections import Counter
+
+import numpy as np
+import pandas as pd
 
 from .evaluator import Evaluator
+from .hand import Hand, Board, card_index, index_to_int, index_to_str
 from .lookup import LookupTable
 from .card import Card
+from .equity import equity, exact_equity, _exact_equity, DECK
+from .preflop import (hand_class, preflop_equity, load_preflop_table, canonical_boards,
+                      board_matchup_counts, CLASS_NAMES, COMBOS, COMBO_CLASS)
+from .ranges import Range, range_equity
+from .hand_history import (parse_hand_histories, find_hand_histories, hand_histories_to_dataframe,
+                           ingest_hand_histories, update_hand_histories, load_manifest,
+                           parse_files_to_columns, COLUMNS)
+from .dataset import (to_table, to_dataframe, write_dataset, read_dataset, read_poker_dataframe,
+                      iter_dataset, CARDS)
+from . import dataset
+from .actions import pack_actions, pack_table, ACTION_COLUMNS, STREETS
+from .add_aggression_column import check_aggression, add_aggression_columns
+from .add_fold_column import check_fold, add_fold_columns
+from .straight_risk_eval import (straight_risk, straight_risk_table, board_rank_masks,
+                                 straight_eval_to_df)
+from .adding_flush import board_suit_counts, flush_risk, flush_eval_to_df
+from .adding_rank import add_rank_to_pkl_df
+from .benchmark import (synthetic_games, run_benchmarks, save_results, load_results,
+                        compare_results)
+from .bluff_eval import bluff_eval
+from .features import (run_pipeline, iter_pipeline, resolve_stages, input_columns, stage_key,
+                       FeatureFrame, STAGES)
 
 class TestEvaluator(unittest.TestCase):
     """
@@ -236,6 +319,82 @@ class TestEvaluator(unittest.TestCase):
 
         self.assertEqual(hand_class, 9)
 
+    def best_of_combinations(self, cards):
+        """
+        Reference evaluation: best 5 card rank over every 5 card subset.
+        """
+        return min(self.evaluator._flop(combo) for combo in itertools.combinations(cards, 5))
+
+    def test_river_matches_combinations(self):
+        """
+        The direct 7 card lookup should agree with trying all 21 combinations,
+        including hands with 5, 6 and 7 cards of one suit.
+        """
+        rng = random.Random(583)
+        deck = [Card.new(rank + suit) for rank in Card.STR_RANKS for suit in 'shdc']
+        hearts = [card for card in deck if Card.get_suit_int(card) == 2]
+        for _ in range(2000):
+            cards = rng.sample(deck, 7)
+            self.assertEqual(self.evaluator.evaluate(cards[:2], cards[2:]),
+                             self.best_of_combinations(cards))
+        for suited in range(5, 8):
+            for _ in range(200):
+                cards = rng.sample(hearts, suited)
+                cards += rng.sample([card for card in deck if card not in hearts], 7 - suited)
+                self.assertEqual(self.evaluator.evaluate(cards[:2], cards[2:]),
+                                 self.best_of_combinations(cards))
+
+    def test_turn_matches_combinations(self):
+        """
+        The direct lookup for 6 cards should agree with all 6 combinations.
+        """
+        rng = random.Random(584)
+        deck = [Card.new(rank + suit) for rank in Card.STR_RANKS for suit in 'shdc']
+        for _ in range(2000):
+            cards = rng.sample(deck, 6)
+            self.assertEqual(self.evaluator.evaluate(cards[:2], cards[2:]),
+                             self.best_of_combinations(cards))
+
+    def test_evaluate_many_matches_evaluate(self):
+        """
+        The batch evaluator should return the same ranks, classes and
+        percentages as the one hand at a time functions.
+        """
+        rng = random.Random(585)
+        deck = [Card.new(rank + suit) for rank in Card.STR_RANKS for suit in 'shdc']
+        for size in (5, 6, 7):
+            hands = [rng.sample(deck, size) for _ in range(1000)]
+            ranks = self.evaluator.evaluate_many(np.array(hands))
+            self.assertEqual(ranks.dtype, np.int16)
+            expected = [self.evaluator.evaluate(hand, []) for hand in hands]
+            self.assertEqual(ranks.tolist(), expected)
+            self.assertEqual(self.evaluator.get_rank_class_many(ranks).tolist(),
+                             [self.evaluator.get_rank_class(rank) for rank in expected])
+            np.testing.assert_allclose(self.evaluator.get_rank_percentage_many(ranks),
+                                       [self.evaluator.get_rank_percentage(rank) for rank in expected])
+
+    def test_evaluate_many_with_board(self):
+        """
+        Hole cards and board can be passed separately like in evaluate.
+        """
+        hands = np.array([[Card.new('Ad'), Card.new('6h')], [Card.new('6c'), Card.new('Js')]])
+        board = np.array([[Card.new(card) for card in ('Ac', 'Ah', '8d', '7d', 'Jh')]] * 2)
+        ranks = self.evaluator.evaluate_many(hands, board)
+        self.assertEqual(ranks.tolist(), [self.evaluator.evaluate(list(map(int, hand)), list(map(int, board[0])))
+                                          for hand in hands])
+
+    def test_evaluate_many_invalid_input(self):
+        """
+        Test error handling of the batch evaluator.
+        """
+        hand = [Card.new(card) for card in ('Ah', '6s', 'Qc', 'Jd', 'Ah')]
+        with self.assertRaises(ValueError):
+            self.evaluator.evaluate_many(np.array([hand]))
+        with self.assertRaises(ValueError):
+            self.evaluator.evaluate_many(np.array([hand[:4]]))
+        with self.assertRaises(ValueError):
+            self.evaluator.get_rank_class_many(np.array([1, 7463]))
+
     def test_get_rank_class_invalid_hand_rank(self):
         """
         Test error handling
@@ -277,6 +436,1096 @@ class TestEvaluator(unittest.TestCase):
             # Both are wrong
             Card.new("Xk")
 
+    def test_hand_state(self):
+        """
+        Adding the turn and river to a hand state should give the rank of
+        evaluating the whole hand.
+        """
+        rng = random.Random(11)
+        deck = DECK.tolist()
+        for _ in range(500):
+            cards = rng.sample(deck, 7)
+            state = self.evaluator.state(cards[:2], cards[2:5])
+            self.assertEqual(state.rank, self.evaluator.evaluate(cards[:2], cards[2:5]))
+            turn = state.copy()
+            self.assertEqual(turn.add_card(cards[5]), self.evaluator.evaluate(cards[:2], cards[2:6]))
+            self.assertEqual(turn.add_card(cards[6]), self.evaluator.evaluate(cards[:2], cards[2:]))
+            self.assertEqual(state.size, 5)
+
+        state = self.evaluator.state(['Ah', 'Kh'])
+        self.assertIsNone(state.add_card('Qh'))
+        with self.assertRaises(ValueError):
+            state.add_card('Ah')
+        for card in ('Jh', 'Th', '2c', '3c'):
+            state.add_card(card)
+        self.assertEqual(state.rank, 1)
+        with self.assertRaises(ValueError):
+            state.add_card('4c')
+
+    def test_rank_tables(self):
+        """
+        Ranks, scalar or array, should map to the class of the highest class
+        maximum they do not exceed and to 1 - rank / 7462, and ranks that are
+        not integers from 0 to 7462 should be rejected.
+        """
+        ranks = np.arange(LookupTable.MAX_HIGH_CARD + 1)
+        classes = self.evaluator.get_rank_class(ranks)
+        for rank in (0, 1, 10, 11, 166, 167, 1599, 1600, 2467, 6185, 6186, 7462):
+            expected = min(LookupTable.MAX_TO_RANK_CLASS[maximum]
+                           for maximum in LookupTable.MAX_TO_RANK_CLASS if rank <= maximum)
+            self.assertEqual(self.evaluator.get_rank_class(rank), expected)
+            self.assertIsInstance(self.evaluator.get_rank_class(np.int64(rank)), int)
+            self.assertEqual(classes[rank], expected)
+            self.assertEqual(self.evaluator.get_rank_percentage(rank), 1 - rank / 7462)
+        np.testing.assert_array_equal(self.evaluator.get_rank_class_many(ranks), classes)
+        np.testing.assert_allclose(self.evaluator.get_rank_percentage(ranks), 1 - ranks / 7462)
+
+        names = self.evaluator.class_to_string(classes[[1, 7462, 3000]])
+        self.assertIsInstance(names, pd.Categorical)
+        self.assertEqual(list(names), ['Straight Flush', 'High Card', 'Two Pair'])
+        self.assertEqual(self.evaluator.class_to_string(7), 'Two Pair')
+        # whole numbers of other types give Python scalars too
+        for rank in (5.0, np.float64(5), np.array(5), True):
+            self.assertIs(type(self.evaluator.get_rank_class(rank)), int)
+            self.assertIs(type(self.evaluator.get_rank_percentage(rank)), float)
+        self.assertEqual(self.evaluator.get_rank_class(5.0), 1)
+        for rank in (-1, 7463, [5, 7463], 5.5, [5.5], float('nan'), None):
+            with self.assertRaisesRegex(ValueError, 'rank class'):
+                self.evaluator.get_rank_class(rank)
+            with self.assertRaisesRegex(ValueError, 'rank percentage'):
+                self.evaluator.get_rank_percentage(rank)
+
+    def test_evaluate_partial(self):
+        """
+        The draws of 2 to 6 cards should match the examples, and the outs of 4
+        and 5 cards should be the unseen cards that make a straight or a flush
+        better than the hand already made.
+        """
+        evaluate = self.evaluator.evaluate_partial
+        self.assertEqual(evaluate(['Ah', 'Kh']), (9, False, False, False, 0))
+        self.assertEqual(evaluate(['Ah', 'Ad'], ['As']), (6, False, False, False, 0))
+        self.assertEqual(evaluate(['5h', '5d'], ['5s', '5c']), (2, False, False, False, 0))
+        self.assertEqual(evaluate(['9h', '8h'], ['7h', '6c']), (9, False, True, False, 8))
+        self.assertEqual(evaluate(['Ah', '2d'], ['3h', '4c']), (9, False, False, True, 4))
+        self.assertEqual(evaluate(Hand(['Ah', 'Kh']), Board(['Qh', 'Jh'])), (9, True, False, True, 12))
+        self.assertEqual(evaluate(['9h', '8h'], ['7h', '6c', '5d']), (5, False, False, False, 0))
+        self.assertEqual(evaluate(['9h', '9d'], ['7h', '7c', '2h', '4h']), (7, True, False, False, 9))
+        # draws the made hand already beats are not counted
+        self.assertEqual(evaluate(['Ah', 'Kh'], ['Qh', 'Jh', '2h']), (4, False, False, False, 0))
+        self.assertEqual(evaluate(['9h', '8h'], ['7h', '6h', '5d']), (5, True, False, False, 9))
+        self.assertEqual(evaluate(['9h', '9d'], ['9c', '7h', '7c', '2h']), (3, False, False, False, 0))
+        for cards in (['Ah'], ['Ah', 'Kd', '2c', '3c', '4c', '5c', '6c']):
+            with self.assertRaises(ValueError):
+                evaluate(cards[:2], cards[2:])
+
+        rng = random.Random(12)
+        deck = DECK.tolist()
+        for _ in range(200):
+            size = rng.choice((4, 5))
+            cards = rng.sample(deck, size)
+            partial = evaluate(cards[:2], cards[2:])
+            made = []
+            for card in deck:
+                if card in cards:
+                    continue
+                improved = self.evaluator.get_rank_class(self.evaluator.evaluate(cards[:2], cards[2:] + [card]))
+                if (improved == 5 and partial.rank_class > 5) or (improved in (1, 4) and partial.rank_class > 4):
+                    made.append(card)
+            self.assertEqual(partial.outs, len(made), [Card.int_to_str(card) for card in cards])
+
+class TestLookupTable(unittest.TestCase):
+    """
+    This class defines methods for testing the lookup module.
+    """
+    def setUp(self):
+        """Builds a table in memory and a temporary directory for table files."""
+        self.table = LookupTable()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'lookup.bin')
+
+    def tearDown(self):
+        """Removes the temporary directory."""
+        self.tmpdir.cleanup()
+
+    def test_save_and_load(self):
+        """
+        A saved table should load back with the same arrays and dictionaries.
+        """
+        self.table.save(self.path)
+        loaded = LookupTable.load(self.path)
+        np.testing.assert_array_equal(loaded.flush_ranks, self.table.flush_ranks)
+        np.testing.assert_array_equal(loaded.unsuited_ranks, self.table.unsuited_ranks)
+        for name in LookupTable.PYTHON_TABLES:
+            self.assertEqual(getattr(loaded, name), getattr(self.table, name))
+
+    def test_shipped_table_is_current(self):
+        """
+        The shipped table file should match a freshly built table.
+        """
+        loaded = LookupTable.load()
+        np.testing.assert_array_equal(loaded.flush_ranks, self.table.flush_ranks)
+        np.testing.assert_array_equal(loaded.unsuited_ranks, self.table.unsuited_ranks)
+
+    def test_shared_table(self):
+        """
+        Evaluators should all reference one read-only table, including when
+        it is first requested from several threads at once.
+        """
+        tables = []
+        threads = [threading.Thread(target=lambda: tables.append(LookupTable.shared()))
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertTrue(all(table is tables[0] for table in tables))
+        self.assertIs(Evaluator().table, tables[0])
+        self.assertIs(LookupTable.warmup(), tables[0])
+        with self.assertRaises(ValueError):
+            tables[0].unsuited_ranks[0] = 1
+
+    def test_lazy_tables_threads(self):
+        """
+        Threads evaluating with a loaded table while its dictionaries are
+        first built should never see them half filled.
+        """
+        cards = [Card.new(card) for card in ('2h', '2s', '5s', 'Jc', 'Ah', '9d', 'Tc')]
+        expected = self.table.unsuited_lookup_7[Card.prime_product_from_hand(cards)]
+        for _ in range(5):
+            table = LookupTable.load()
+            barrier = threading.Barrier(8)
+            results, errors = [], []
+
+            def evaluate():
+                evaluator = Evaluator()
+                evaluator.table = table
+                barrier.wait()
+                try:
+                    results.append(evaluator.evaluate(cards[:2], cards[2:]))
+                except Exception as error:
+                    errors.append(error)
+
+            threads = [threading.Thread(target=evaluate) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(errors, [])
+            self.assertEqual(results, [expected] * 8)
+
+    def test_load_invalid_file(self):
+        """
+        Test error handling of corrupted or foreign table files.
+        """
+        self.table.save(self.path)
+        with open(self.path, 'r+b') as f:
+            f.seek(LookupTable.FILE_OFFSET + 100)
+            f.write(b'\xff\xff')
+        with self.assertRaises(ValueError):
+            LookupTable.load(self.path)
+
+        with open(self.path, 'wb') as f:
+            f.write(b'poker,hands\n' * 10)
+        with self.assertRaises(ValueError):
+            LookupTable.load(self.path)
+
+class TestEquity(unittest.TestCase):
+    """
+    This class defines methods for testing the equity module.
+    """
+    def setUp(self):
+        """Hole cards and a flop used by the tests."""
+        self.aces = [Card.new('Ah'), Card.new('As')]
+        self.kings = [Card.new('Kd'), Card.new('Kc')]
+        self.flop = [Card.new('Qh'), Card.new('7h'), Card.new('2d')]
+
+    def test_known_matchup(self):
+        """
+        Aces against kings preflop have about 81.3% equity.
+        """
+        result = equity(self.aces, [], self.kings, iterations=20000, seed=1)
+        self.assertAlmostEqual(result.equity, 0.8126, delta=0.01)
+        self.assertLess(result.interval[0], result.equity)
+        self.assertLess(result.equity, result.interval[1])
+        self.assertAlmostEqual(result.win + result.tie + result.loss, 1.0)
+        self.assertEqual(result.iterations, 20000)
+
+    def test_river_is_exact(self):
+        """
+        With the whole board and both hands known there is a single outcome.
+        """
+        board = self.flop + [Card.new('3c'), Card.new('Kh')]
+        result = equity(self.aces, board, self.kings)
+        self.assertEqual((result.win, result.tie, result.loss, result.iterations), (0.0, 0.0, 1.0, 1))
+
+    def test_seed_and_early_stop(self):
+        """
+        A seed makes the estimate reproducible, and a target width stops the
+        sampling once the interval is narrow enough.
+        """
+        first = equity(self.aces, self.flop, iterations=3000, seed=7)
+        self.assertEqual(first, equity(self.aces, self.flop, iterations=3000, seed=7))
+
+        result = equity(self.aces, self.flop, iterations=100000, seed=7, target_width=0.05)
+        self.assertLess(result.iterations, 100000)
+        self.assertLessEqual(result.interval[1] - result.interval[0], 0.05)
+
+    def test_exact_matches_enumeration(self):
+        """
+        Exact equity on the flop against a known hand should match scoring
+        every runout one at a time with the evaluator.
+        """
+        evaluator = Evaluator()
+        deck = [Card.new(rank + suit) for rank in Card.STR_RANKS for suit in 'shdc']
+        live = [card for card in deck if card not in self.aces + self.kings + self.flop]
+        outcomes = []
+        for runout in itertools.combinations(live, 2):
+            board = self.flop + list(runout)
+            hero = evaluator.evaluate(self.aces, board)
+            villain = evaluator.evaluate(self.kings, board)
+            outcomes.append((hero < villain) - (hero > villain))
+
+        result = exact_equity(self.aces, self.flop, self.kings)
+        self.assertEqual(result.iterations, len(outcomes))
+        self.assertAlmostEqual(result.win, outcomes.count(1) / len(outcomes))
+        self.assertAlmostEqual(result.tie, outcomes.count(0) / len(outcomes))
+        self.assertEqual(result.interval, (result.equity, result.equity))
+
+    def test_exact_chosen_and_cached(self):
+        """
+        On the turn equity should enumerate, and repeating the query with the
+        cards in another order should be served from the cache.
+        """
+        turn = self.flop + [Card.new('3c')]
+        result = equity(self.aces, turn)
+        self.assertEqual(result.iterations, 46 * 45 * 44 // 2)
+        self.assertEqual(result.interval[0], result.interval[1])
+
+        hits = _exact_equity.cache_info().hits
+        self.assertEqual(equity(self.aces[::-1], turn[::-1]), result)
+        self.assertEqual(_exact_equity.cache_info().hits, hits + 1)
+
+        # the same spot with hearts and diamonds swapped
+        swapped = Card.permute_suits(turn, {1: 1, 2: 4, 4: 2, 8: 8})
+        self.assertEqual(equity(Card.permute_suits(self.aces, {1: 1, 2: 4, 4: 2, 8: 8}), swapped),
+                         result)
+        self.assertEqual(_exact_equity.cache_info().hits, hits + 2)
+
+        sampled = equity(self.aces, turn, iterations=20000, seed=3, exact=False)
+        self.assertAlmostEqual(sampled.equity, result.equity, delta=0.01)
+
+    def test_invalid_input(self):
+        """
+        Test error handling of duplicate cards, wrong sizes and no iterations.
+        """
+        with self.assertRaises(ValueError):
+            equity(self.aces, self.flop, [Card.new('Ah'), Card.new('Kc')])
+        with self.assertRaises(ValueError):
+            equity(self.aces[:1], self.flop)
+        with self.assertRaises(ValueError):
+            equity(self.aces, self.flop * 2)
+        for iterations in (0, -5):
+            with self.assertRaises(ValueError):
+                equity(self.aces, self.flop, iterations=iterations, exact=False)
+        # unknown cards are rejected before they reach Card.canonicalize
+        for hero in ([self.aces[0], 12345], [self.aces[0], self.aces[0]]):
+            with self.assertRaises(ValueError):
+                exact_equity(hero, self.flop, self.kings)
+            with self.assertRaises(ValueError):
+                exact_equity(hero, self.flop + [Card.new('3c'), Card.new('4c')])
+
+class TestPreflop(unittest.TestCase):
+    """
+    This class defines methods for testing the preflop.py module.
+    """
+    def test_hand_class(self):
+        """
+        Hole cards should map to the class named after them, in any order.
+        """
+        self.assertEqual(CLASS_NAMES[hand_class([Card.new('As'), Card.new('Ah')])], 'AA')
+        self.assertEqual(CLASS_NAMES[hand_class([Card.new('Kd'), Card.new('Ad')])], 'AKs')
+        self.assertEqual(CLASS_NAMES[hand_class([Card.new('7c'), Card.new('2h')])], '72o')
+        self.assertEqual(hand_class('T9s'), CLASS_NAMES.index('T9s'))
+        self.assertEqual(len(set(CLASS_NAMES)), 169)
+        with self.assertRaises(ValueError):
+            hand_class('A1s')
+        with self.assertRaises(ValueError):
+            hand_class([Card.new('As'), Card.new('As')])
+
+    def test_known_matchups(self):
+        """
+        The table should agree with well known preflop equities, and the two
+        sides of a matchup should add up to the whole pot.
+        """
+        self.assertAlmostEqual(preflop_equity('AA', 'KK'), 0.8195, places=3)
+        self.assertAlmostEqual(preflop_equity('AA'), 0.8520, places=3)
+        self.assertAlmostEqual(preflop_equity('72o'), 0.3458, places=3)
+        self.assertAlmostEqual(preflop_equity([Card.new('Ah'), Card.new('Kh')],
+                                              [Card.new('2c'), Card.new('2d')]),
+                               preflop_equity('AKs', '22'))
+        table, _ = load_preflop_table()
+        np.testing.assert_allclose(table + table.T, 1, atol=1e-6)
+
+    def test_board_counts_match_enumeration(self):
+        """
+        The showdown counts on a board should match comparing every pair of
+        hands one at a time.
+        """
+        evaluator = Evaluator()
+        boards, weights = canonical_boards()
+        self.assertEqual(weights.sum(), 2598960)
+        board = boards[len(boards) // 3]
+        wins, ties, pairs = board_matchup_counts(board[None], [2])
+
+        cards = [int(card) for card in DECK[board]]
+        hands = [(set(combo), evaluator.evaluate([int(card) for card in DECK[combo]], cards), k)
+                 for combo, k in zip(COMBOS.tolist(), COMBO_CLASS.tolist())
+                 if not set(combo) & set(board.tolist())]
+        expected = np.zeros((3, 169, 169))
+        for first, rank, k in hands:
+            for second, other, j in hands:
+                if not first & second:
+                    expected[:, k, j] += (rank < other, rank == other, 1)
+        for counts, reference in zip((wins, ties, pairs), expected):
+            np.testing.assert_array_equal(counts, 2 * reference)
+
+class TestRanges(unittest.TestCase):
+    """
+    This class defines methods for testing the ranges.py module.
+    """
+    def test_parse(self):
+        """
+        Range strings should expand to the expected number of combinations.
+        """
+        self.assertEqual(len(Range('QQ+,AKs,T9s')), 18 + 4 + 4)
+        self.assertEqual(len(Range('22+')), 78)
+        self.assertEqual(len(Range('55-22')), 24)
+        self.assertEqual(len(Range('ATs+')), 16)
+        self.assertEqual(len(Range('A5s-A2s')), 16)
+        self.assertEqual(len(Range('AK, KQo')), 16 + 12)
+        self.assertEqual(len(Range('AhKh')), 1)
+        weights = Range('AK, AKs:0.5').weights
+        self.assertEqual(sorted(set(weights[weights > 0])), [0.5, 1.0])
+        for text in ['AKx', 'KAs', 'AA-KQ', 'AhAh', 'QQ:-1']:
+            with self.assertRaises(ValueError):
+                Range(text)
+
+    def test_single_hands_match_exact_equity(self):
+        """
+        Ranges of one hand should give the exact equity of equity.py.
+        """
+        hero = [Card.new('As'), Card.new('Ks')]
+        villain = [Card.new('Qh'), Card.new('Qd')]
+        flop = [Card.new('Ah'), Card.new('7d'), Card.new('2c')]
+        self.assertAlmostEqual(range_equity(hero, villain, flop).equity,
+                               exact_equity(hero, flop, villain).equity)
+        turn = flop + [Card.new('Ts')]
+        full = Range(np.ones(len(COMBOS)))
+        self.assertAlmostEqual(range_equity(hero, full, turn).equity,
+                               exact_equity(hero, turn).equity)
+
+    def test_river_matches_enumeration(self):
+        """
+        Weighted ranges on the river should match comparing every pair of
+        combinations one at a time, and a range against itself is even.
+        """
+        evaluator = Evaluator()
+        rng = np.random.default_rng(52)
+        hero = Range(rng.random(len(COMBOS)) * (rng.random(len(COMBOS)) < 0.2))
+        villain = Range('QQ+, AK, T9s, 76s:0.5, A5s-A2s:0.25')
+        board = [Card.new(card) for card in ['Ah', '7d', '2c', 'Ts', '9s']]
+        result = range_equity(hero, villain, board)
+
+        hands = [(set(combo), evaluator.evaluate([int(card) for card in DECK[combo]], board), i)
+                 for i, combo in enumerate(COMBOS.tolist())
+                 if not {int(card) for card in DECK[combo]} & set(board)]
+        pot = showdowns = 0
+        for first, rank, i in hands:
+            for second, other, j in hands:
+                if hero.weights[i] and villain.weights[j] and not first & second:
+                    weight = hero.weights[i] * villain.weights[j]
+                    pot += weight * ((rank < other) + (rank == other) / 2)
+                    showdowns += weight
+        self.assertAlmostEqual(result.equity, pot / showdowns)
+        self.assertAlmostEqual(range_equity(villain, villain, board).equity, 0.5)
+
+    def test_monte_carlo(self):
+        """
+        Sampled runouts should be reproducible and cover the preflop equity.
+        """
+        first = range_equity('AA', 'KK', iterations=2000, seed=3)
+        self.assertEqual(first, range_equity('AA', 'KK', iterations=2000, seed=3))
+        self.assertLessEqual(first.interval[0], preflop_equity('AA', 'KK'))
+        self.assertGreaterEqual(first.interval[1], preflop_equity('AA', 'KK'))
+        with self.assertRaises(ValueError):
+            range_equity('AA', 'AhAs', [Card.new('Ac'), Card.new('Ad'), Card.new('2c')])
+
+SAMPLE_GAME = """#Game No : 502745408
+***** 888poker Hand History for Game 502745408 *****
+$0.01/$0.02 Blinds No Limit Holdem - *** 06 06 2018 04:49:57
+Table Bedford 6 Max (Real Money)
+Seat 1 is the button
+Total number of players : 2
+Seat 1: ponte1001 ( $0.80 )
+Seat 4: Bolorig888 ( $1.01 )
+ponte1001 posts small blind [$0.01]
+Bolorig888 posts big blind [$0.02]
+** Dealing down cards **
+ponte1001 calls [$0.01]
+Bolorig888 checks
+** Dealing flop ** [ 2c, Qh, Jd ]
+Bolorig888 checks
+ponte1001 checks
+** Dealing turn ** [ 9h ]
+Bolorig888 bets [$0.04]
+ponte1001 calls [$0.04]
+** Dealing river ** [ Js ]
+Bolorig888 bets [$0.06]
+ponte1001 calls [$0.06]
+** Summary **
+Bolorig888 shows [ 9c, Qs ]
+ponte1001 mucks [ 9s, 6h ]
+Bolorig888 collected [ $0.23 ]
+"""
+
+FOLDED_GAME = """#Game No : 502745409
+***** 888poker Hand History for Game 502745409 *****
+$0.01/$0.02 Blinds No Limit Holdem - *** 06 06 2018 04:50:31
+Table Bedford 6 Max (Real Money)
+Seat 1 is the button
+Total number of players : 2
+Seat 1: Bolorig888 ( $1.22 )
+Seat 4: ponte1001 ( $0.59 )
+Bolorig888 posts small blind [$0.01]
+ponte1001 posts big blind [$0.02]
+** Dealing down cards **
+Bolorig888 folds
+** Summary **
+ponte1001 collected [ $0.03 ]
+"""
+
+class TestHandHistory(unittest.TestCase):
+    """
+    This class defines methods for testing the hand_history.py module.
+    """
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.first = os.path.join(self.directory.name, 'a.txt')
+        self.second = os.path.join(self.directory.name, 'b', 'c.txt')
+        os.makedirs(os.path.dirname(self.second))
+        with open(self.first, 'w') as f:
+            f.write(SAMPLE_GAME + '\n\n' + FOLDED_GAME)
+        # the last game of a file has no game after it
+        with open(self.second, 'w') as f:
+            f.write(FOLDED_GAME.replace('502745409', '502745410') + '\n' + SAMPLE_GAME[:-1])
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_parse_game(self):
+        """
+        Every field of the README example game should be parsed.
+        """
+        record = next(parse_hand_histories([self.first]))
+        self.assertEqual(record.game_id, '502745408')
+        self.assertEqual(record.file, 'a.txt')
+        self.assertEqual((record.player_sb, record.player_bb), ('ponte1001 ', 'Bolorig888 '))
+        self.assertEqual(record.preflop_actions, [('c', '0.01'), ('k', 0)])
+        self.assertEqual(record.flop_actions, [('k', 0), ('k', 0)])
+        self.assertEqual(record.river_actions, [('b', '0.06'), ('c', '0.06')])
+        self.assertEqual((record.flop, record.turn, record.river), (['2c', 'Qh', 'Jd'], '9h', 'Js'))
+        self.assertEqual((record.sb_stack, record.bb_stack), ('0.80', '1.01'))
+        self.assertEqual((record.sb_cards, record.bb_cards), ('[ 9s, 6h ]', '[ 9c, Qs ]'))
+        self.assertFalse(record.folded_pre)
+
+    def test_every_game_of_every_file(self):
+        """
+        Games should come out in file order, including the last game of each
+        file, with the counters updated.
+        """
+        stats = Counter()
+        df = hand_histories_to_dataframe(find_hand_histories(self.directory.name), stats)
+        self.assertEqual(list(df['Game ID']), ['502745408', '502745409', '502745410', '502745408'])
+        self.assertEqual(list(df['File']), ['a.txt', 'a.txt', 'c.txt', 'c.txt'])
+        self.assertEqual(list(df['Folded pre']), [False, True, True, False])
+        self.assertIsNone(df['Flop'][1])
+        self.assertEqual(stats, Counter(files=2, games=4, folded_pre=2))
+
+    def test_parallel_ingestion(self):
+        """
+        Parsing on a process pool should give the same rows in the same order
+        and the same counters as a single process.
+        """
+        paths = find_hand_histories(self.directory.name) * 3
+        stats, parallel_stats = Counter(), Counter()
+        expected = hand_histories_to_dataframe(paths, stats)
+        for processes in (1, 2):
+            parallel_stats.clear()
+            result = ingest_hand_histories(paths, processes, files_per_task=2, stats=parallel_stats)
+            pd.testing.assert_frame_equal(result, expected)
+            self.assertEqual(parallel_stats, stats)
+        self.assertEqual(len(ingest_hand_histories([], 1)), 0)
+        # equal action lists of different games are not the same list
+        self.assertIsNot(result['Flop actions'][0], result['Flop actions'][3])
+
+    def test_columns_chunk(self):
+        """
+        Worker chunks should hold every distinct value once, with unsigned
+        integer codes per column.
+        """
+        columns, stats, file_games = parse_files_to_columns([self.first, self.second] * 2)
+        self.assertEqual(file_games, [2, 2, 2, 2])
+        self.assertEqual(stats['games'], 8)
+        codes, uniques = columns[COLUMNS.index('Game ID')]
+        self.assertEqual(codes.dtype, np.uint8)
+        self.assertEqual(codes.tolist(), [0, 1, 2, 0] * 2)
+        self.assertEqual(uniques, ['502745408', '502745409', '502745410'])
+        codes, uniques = columns[COLUMNS.index('Flop actions')]
+        self.assertEqual(uniques, [[('k', 0), ('k', 0)], None])
+
+    def test_incremental_update(self):
+        """
+        Updates should only parse new or changed files, and give the games of
+        a full parse without duplicates, dropping the games a changed file no
+        longer holds.
+        """
+        output = os.path.join(self.directory.name, 'games.pkl')
+        stats = Counter()
+        update_hand_histories([self.first], output, stats=stats)
+        self.assertEqual(stats['files'], 1)
+
+        # the second file repeats a game of the first
+        stats = Counter()
+        df = update_hand_histories([self.first, self.second], output, stats=stats)
+        self.assertEqual((stats['files'], stats['skipped']), (1, 1))
+        # the newest parse of a game replaces the old row
+        self.assertEqual(list(df['Game ID']), ['502745409', '502745410', '502745408'])
+        self.assertEqual(list(df['File']), ['a.txt', 'c.txt', 'c.txt'])
+        pd.testing.assert_frame_equal(pd.read_pickle(output), df)
+
+        # touching a file does not reparse it, changing it does
+        os.utime(self.first)
+        stats = Counter()
+        update_hand_histories([self.first, self.second], output, stats=stats)
+        self.assertEqual(stats, Counter(skipped=2))
+        with open(self.second, 'a') as f:
+            f.write('\n' + FOLDED_GAME.replace('502745409', '502745411'))
+        stats = Counter()
+        df = update_hand_histories([self.first, self.second], output, stats=stats)
+        self.assertEqual((stats['files'], stats['games']), (1, 3))
+        self.assertEqual(sorted(df['Game ID']), ['502745408', '502745409', '502745410', '502745411'])
+
+        manifest = load_manifest(os.path.join(self.directory.name, 'games.manifest.json'))
+        entry = manifest['files'][os.path.abspath(self.second)]
+        self.assertEqual((entry['games'], entry['first_game'], entry['last_game']),
+                         (3, '502745408', '502745411'))
+
+        # games removed from a changed file are removed, and IDs need not be numbers
+        with open(self.second, 'w') as f:
+            f.write(FOLDED_GAME.replace('502745409', 'G502745410') + '\n' + SAMPLE_GAME)
+        df = update_hand_histories([self.first, self.second], output)
+        self.assertEqual(list(df['Game ID']), ['502745409', 'G502745410', '502745408'])
+        self.assertEqual(list(df['File']), ['a.txt', 'c.txt', 'c.txt'])
+        manifest = load_manifest(os.path.join(self.directory.name, 'games.manifest.json'))
+        entry = manifest['files'][os.path.abspath(self.second)]
+        self.assertEqual((entry['first_game'], entry['last_game']), ('502745408', 'G502745410'))
+
+    def test_update_same_file_name(self):
+        """
+        Changing a file should keep the games of another file with the same
+        name.
+        """
+        output = os.path.join(self.directory.name, 'games.pkl')
+        other = os.path.join(self.directory.name, 'b', 'a.txt')
+        with open(other, 'w') as f:
+            f.write(FOLDED_GAME.replace('502745409', '502745412'))
+        update_hand_histories([self.first, other], output)
+        with open(other, 'a') as f:
+            f.write('\n' + FOLDED_GAME.replace('502745409', '502745413'))
+        stats = Counter()
+        df = update_hand_histories([self.first, other], output, stats=stats)
+        self.assertEqual(stats['files'], 2)
+        self.assertEqual(list(df['Game ID']), ['502745408', '502745409', '502745412', '502745413'])
+
+    def test_invalid_game(self):
+        """
+        Games that cannot be parsed should be logged, counted and skipped.
+        """
+        with open(self.first, 'w') as f:
+            f.write(SAMPLE_GAME.replace('posts small blind', 'sits out') + FOLDED_GAME)
+        stats = Counter()
+        with self.assertLogs('winedge.hand_history', 'WARNING') as logs:
+            records = list(parse_hand_histories([self.first], stats))
+        self.assertEqual([record.game_id for record in records], ['502745409'])
+        self.assertEqual(stats['errors'], 1)
+        self.assertIn('a.txt', logs.output[0])
+
+@unittest.skipIf(dataset.pa is None, "pyarrow is not installed")
+class TestDataset(unittest.TestCase):
+    """
+    This class defines methods for testing the dataset.py module.
+    """
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        path = os.path.join(self.directory.name, 'games.txt')
+        with open(path, 'w') as f:
+            f.write(SAMPLE_GAME + FOLDED_GAME + SAMPLE_GAME.replace('502745408', '502745407')
+                    .replace('** Dealing river ** [ Js ]', '** Dealing river ** [ Jc ]')
+                    .replace('calls [$0.06]', 'calls [$1.25]'))
+        self.df = hand_histories_to_dataframe([path])
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_schema(self):
+        """
+        Cards should be stored as indices, actions as codes and cents, and
+        the conversion back should give the original dataframe.
+        """
+        table = to_table(self.df)
+        self.assertEqual(table.column('game_id').to_pylist(), [502745408, 502745409, 502745407])
+        self.assertEqual([CARDS[card] for card in table.column('board')[0].as_py()],
+                         ['2c', 'Qh', 'Jd', '9h', 'Js'])
+        self.assertIsNone(table.column('board')[1].as_py())
+        self.assertEqual(table.column('river_actions')[2].as_py(),
+                         [{'action': 3, 'cents': 6}, {'action': 2, 'cents': 125}])
+        self.assertEqual(table.column('sb_stack').to_pylist(), [80, 122, 80])
+        self.assertEqual(table.column('street').to_pylist(), ['river', 'preflop', 'river'])
+        pd.testing.assert_frame_equal(to_dataframe(table), self.df)
+
+    def test_partitioned_dataset(self):
+        """
+        The dataset should read back only the requested columns and streets,
+        and rewriting it should not duplicate games.
+        """
+        root = os.path.join(self.directory.name, 'dataset')
+        write_dataset(self.df, root)
+        write_dataset(self.df, root)
+        self.assertEqual(sorted(os.listdir(root)), ['street=preflop', 'street=river'])
+
+        df = read_dataset(root)
+        self.assertEqual(list(df.columns), list(self.df.columns))
+        self.assertEqual(sorted(df['Game ID']), sorted(self.df['Game ID']))
+        river = read_poker_dataframe(root, ['Game ID', 'River', 'SB cards'], streets=['river'])
+        self.assertEqual(list(river.columns), ['Game ID', 'River', 'SB cards'])
+        self.assertEqual(sorted(river['River']), ['Jc', 'Js'])
+
+    def test_dataset_replace_and_append(self):
+        """
+        Writing a batch should replace the streets it holds and keep the
+        others, while appending should keep every game already stored.
+        """
+        root = os.path.join(self.directory.name, 'dataset')
+        first, second = self.df.iloc[[0, 1]], self.df.iloc[[2]]
+        write_dataset(first, root)
+        write_dataset(second, root)
+        # the river game of the first batch is replaced, its preflop game kept
+        self.assertEqual(sorted(read_dataset(root)['Game ID']),
+                         sorted(self.df['Game ID'].iloc[[1, 2]]))
+
+        root = os.path.join(self.directory.name, 'appended')
+        write_dataset(first, root, append=True)
+        write_dataset(second, root, append=True)
+        self.assertEqual(sorted(read_dataset(root)['Game ID']), sorted(self.df['Game ID']))
+
+class TestActions(unittest.TestCase):
+    """
+    This class defines methods for testing the actions.py module.
+    """
+    def setUp(self):
+        rng = random.Random(7)
+        rows = []
+        for _ in range(300):
+            streets = [[(rng.choice('fkcbr'), rng.choice(['0.02', '1.25', 0]))
+                        for _ in range(rng.randint(1, 5))] for _ in range(rng.randint(1, 4))]
+            rows.append(streets + [None] * (4 - len(streets)))
+        self.df = pd.DataFrame(rows, columns=list(ACTION_COLUMNS))
+        self.packed = pack_actions(self.df)
+
+    @staticmethod
+    def actor(street, position):
+        """
+        Heads up the small blind (0) acts first preflop, the big blind (1)
+        on the later streets.
+        """
+        return (position % 2) ^ (street > 0)
+
+    def test_folds(self):
+        """
+        Fold flags and first fold actors should match the action lists and
+        check_fold.
+        """
+        fold_sb, fold_bb = self.packed.fold_flags()
+        df = add_fold_columns(self.df.copy())
+        first = self.packed.first_fold_actor()
+        for i, row in enumerate(self.df[list(ACTION_COLUMNS)].itertuples(index=False)):
+            folds = [(street, self.actor(street, position)) for street, actions in enumerate(row)
+                     if actions is not None
+                     for position, (action, _) in enumerate(actions) if action == 'f']
+            self.assertEqual(first[i], folds[0][1] if folds else -1)
+            streets = [street for street, _ in folds]
+            actors = {actor for street, actor in folds if street == min(streets, default=None)}
+            expected = (0 in actors, 1 in actors)
+            self.assertEqual((fold_sb[i], fold_bb[i]), expected)
+            self.assertEqual((df['fold_sb'][i], df['fold_bb'][i]), expected)
+            self.assertEqual(check_fold(*row), expected)
+
+    def test_aggression(self):
+        """
+        Aggression and bet counts of every street should match the action
+        lists and check_aggression.
+        """
+        df = add_aggression_columns(self.df.copy())
+        for index, (street, column) in enumerate(zip(STREETS, ACTION_COLUMNS)):
+            sb_bets, bb_bets = self.packed.bet_counts(street)
+            for i, actions in enumerate(self.df[column]):
+                expected = check_aggression(actions, street)
+                if expected is None:
+                    self.assertTrue(np.isnan(df[f'Aggr {street} SB'][i]))
+                    self.assertEqual((sb_bets[i], bb_bets[i]), (0, 0))
+                    continue
+                self.assertEqual((df[f'Aggr {street} SB'][i], df[f'Aggr {street} BB'][i]), expected)
+                bets = [self.actor(index, position) for position, (action, _) in enumerate(actions)
+                        if action in 'br']
+                self.assertEqual((sb_bets[i], bb_bets[i]), (bets.count(0), bets.count(1)))
+        self.assertEqual(self.packed.cents.max(), 125)
+
+    @unittest.skipIf(dataset.pa is None, "pyarrow is not installed")
+    def test_pack_table(self):
+        """
+        Packing the Arrow columns should give the same arrays as packing the
+        dataframe.
+        """
+        table = dataset.pa.table(
+            {f'{street}_actions': [dataset._actions(actions) for actions in self.df[column]]
+             for street, column in zip(STREETS, ACTION_COLUMNS)})
+        packed = pack_table(table.slice(10))
+        expected = pack_actions(self.df[10:])
+        for name in ('packed', 'cents', 'offsets'):
+            np.testing.assert_array_equal(getattr(packed, name), getattr(expected, name))
+
+class TestStraightRisk(unittest.TestCase):
+    """
+    This class defines methods for testing the straight_risk_eval.py module.
+    """
+    def test_known_boards(self):
+        """
+        Boards of every street should get the risk of their ranks, and NaN
+        streets should be marked as not dealt.
+        """
+        df = pd.DataFrame({'Flop': [['Ah', '2d', '3c'], ['Kc', '7d', '2h'], ['2c', '4d', '6h'], None],
+                           'Turn': ['4s', '7s', None, None], 'River': ['5d', 'Qh', None, None]})
+        masks, dealt = board_rank_masks(df)
+        risk = straight_risk_table()[masks]
+        self.assertEqual(masks[0, 2], 0b1000000001111)
+        self.assertEqual(risk[0].tolist(), [2, 3, 4])
+        self.assertEqual(risk[1].tolist(), [1, 1, 1])
+        self.assertEqual(risk[2, 0], 2)
+        self.assertEqual(dealt.tolist()[2:], [[True, False, False], [False, False, False]])
+
+    @staticmethod
+    def legacy_risk(rank_chars):
+        """
+        The per street loop body of the original straight_eval_to_df, kept
+        as an independent reference for the table.
+        """
+        int_rank = [Card.CHAR_RANK_TO_INT_RANK[char] for char in set(rank_chars)]
+        if 14 in int_rank:
+            int_rank.append(1)
+        int_rank = sorted(int_rank)
+        diff = [int_rank[i + 1] - int_rank[i] for i in range(len(int_rank) - 1)]
+        diff_str = ''.join(map(str, diff))
+        if '11' in diff_str or '22' in diff_str or '12' in diff_str or '21' in diff_str:
+            if '22' in diff_str:
+                return 2
+            count = 0
+            max_count = 0
+            for num in diff:
+                if num == 1 or num == 2:
+                    count += 1
+                    max_count = max(max_count, count)
+                else:
+                    count = 0
+            return max_count
+        return 1
+
+    def test_table_matches_rule(self):
+        """
+        The table should give the score of the original algorithm for every
+        board of 1 to 5 distinct ranks (paired boards included), with the ace
+        also counted low.
+        """
+        table = straight_risk_table()
+        for size in range(1, 6):
+            for ranks in itertools.combinations(Card.STR_RANKS, size):
+                mask = sum(1 << Card.STR_RANKS.index(rank) for rank in ranks)
+                self.assertEqual(table[mask], self.legacy_risk(ranks), ranks)
+        self.assertEqual(straight_risk([14, 2, 3, 4, 5]), 4)
+        self.assertEqual(straight_risk([13, 2]), 0)
+
+class TestFlushRisk(unittest.TestCase):
+    """
+    This class defines methods for testing the adding_flush.py module.
+    """
+    def test_suit_counts(self):
+        """
+        Suit counts should add up street by street without changing the
+        board columns.
+        """
+        flop = ['Ah', '2h', '3c']
+        df = pd.DataFrame({'Flop': [flop, ['Kd', '7d', '2d'], None],
+                           'Turn': ['4h', None, None], 'River': ['5h', None, None]})
+        counts, dealt = board_suit_counts(df)
+        self.assertEqual(counts[0].tolist(), [[0, 2, 0, 1], [0, 3, 0, 1], [0, 4, 0, 1]])
+        self.assertEqual(counts[1, 0].tolist(), [0, 0, 3, 0])
+        self.assertEqual(dealt[2].tolist(), [False, False, False])
+        self.assertEqual(flush_risk(counts.max(axis=2))[:2].tolist(), [[0, 1, 2], [1, 1, 1]])
+        self.assertEqual(flop, ['Ah', '2h', '3c'])
+
+class TestFeatures(unittest.TestCase):
+    """
+    This class defines methods for testing the features.py module.
+    """
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        path = os.path.join(self.directory.name, 'games.txt')
+        with open(path, 'w') as f:
+            f.write(SAMPLE_GAME + FOLDED_GAME + SAMPLE_GAME.replace('502745408', '502745407')
+                    .replace('bets [$0.06]', 'checks'))
+        self.df = hand_histories_to_dataframe([path])
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_resolve_stages(self):
+        """
+        Stages should run after the stages they read from, and only raw
+        columns should be read.
+        """
+        self.assertEqual([stage.name for stage in resolve_stages(['bluff', 'fold'])],
+                         ['rank', 'bluff', 'fold'])
+        columns = input_columns(resolve_stages(['bluff']))
+        self.assertIn('River actions', columns)
+        self.assertNotIn('SB Hand Strength', columns)
+        with self.assertRaises(KeyError):
+            resolve_stages(['unknown'])
+
+    def test_pipeline(self):
+        """
+        Every feature should match the feature modules, with NaN for the
+        games without showdown.
+        """
+        result = run_pipeline(self.df)
+        self.assertEqual(len(result), 3)
+        self.assertEqual(list(result['SB Handrank'][[0, 2]]), ['Two Pair', 'Two Pair'])
+        self.assertEqual(result['SB Handrank'].dtype, 'category')
+        self.assertTrue(pd.isna(result['SB Handrank'][1]))
+        self.assertTrue(np.isnan(result['aggSB'][1]))
+        self.assertTrue(np.isnan(result['Flush'][1]))
+
+        # the modules that keep the river games only store their row in 'index'
+        modules = [(add_rank_to_pkl_df, 'poker_dataframe_w_rank.pkl', 'rank'),
+                   (flush_eval_to_df, 'poker_dataframe_flush_risk.pkl', 'flush'),
+                   (straight_eval_to_df, 'poker_df_straight_risk.pkl', 'straight'),
+                   (bluff_eval, 'poker_df_w_bluff.pkl', 'bluff')]
+        for function, output, stage in modules:
+            expected = self.run_module(function, output)
+            rows = expected['index'] if 'index' in expected else expected.index
+            self.assertEqual(len(expected), 2 if stage != 'straight' else 3)
+            for column in STAGES[stage].outputs:
+                pd.testing.assert_series_equal(result[column][rows].reset_index(drop=True),
+                                               expected[column].reset_index(drop=True))
+        for function in (add_fold_columns, add_aggression_columns):
+            expected = function(self.df.copy())
+            for column in STAGES['fold'].outputs + STAGES['aggression'].outputs:
+                if column in expected:
+                    pd.testing.assert_series_equal(result[column], expected[column])
+
+        output = os.path.join(self.directory.name, 'features.pkl')
+        partial = run_pipeline(self.df, ['straight'], output)
+        pd.testing.assert_frame_equal(pd.read_pickle(output), partial)
+        self.assertEqual(list(partial.columns[-3:]), ['Flop Straight Risk', 'Turn Straight Risk',
+                                                      'River Straight Risk'])
+
+    def run_module(self, function, output):
+        """
+        Runs a feature module on the games saved as a pickle, and reads the
+        pickle it exports to the working directory.
+        """
+        path = os.path.join(self.directory.name, 'poker_dataframe.pkl')
+        self.df.to_pickle(path)
+        cwd = os.getcwd()
+        os.chdir(self.directory.name)
+        try:
+            function(path)
+        finally:
+            os.chdir(cwd)
+        return pd.read_pickle(os.path.join(self.directory.name, output))
+
+    def test_bluff_eval(self):
+        """
+        River bets should count for the player who made them, the big blind
+        being the first to act on the river.
+        """
+        river = self.df['River actions'][0]
+        self.assertEqual(river, [('b', '0.06'), ('c', '0.06')])
+        self.assertEqual(check_aggression(river, 'river'), (0, 1))
+        result = self.run_module(bluff_eval, 'poker_df_w_bluff.pkl')
+        self.assertEqual(list(result['Game ID']), ['502745408', '502745407'])
+        self.assertEqual(list(result['aggBB']), [4 / 3, 2 / 3])
+        self.assertEqual(list(result['aggSB']), [1, 1])
+
+    def test_stage_cache(self):
+        """
+        Stages should be loaded from the cache until their inputs or version
+        change.
+        """
+        cache = os.path.join(self.directory.name, 'cache')
+        stats = Counter()
+        expected = run_pipeline(self.df, cache_dir=cache, stats=stats)
+        self.assertEqual(stats, Counter(computed=len(STAGES)))
+        stats = Counter()
+        pd.testing.assert_frame_equal(run_pipeline(self.df, cache_dir=cache, stats=stats), expected)
+        self.assertEqual(stats, Counter(cached=len(STAGES)))
+
+        # a new river changes the board stages only
+        df = self.df.copy()
+        df.loc[0, 'River'] = 'Ts'
+        stats = Counter()
+        result = run_pipeline(df, ['straight', 'fold'], cache_dir=cache, stats=stats)
+        self.assertEqual(stats, Counter(computed=1, cached=1))
+        self.assertEqual(result['River Straight Risk'][0], 3)
+
+        frame = FeatureFrame(self.df)
+        stage = STAGES['straight']
+        self.assertEqual(stage_key(stage, frame), stage_key(stage, FeatureFrame(self.df.copy())))
+        self.assertNotEqual(stage_key(stage, frame), stage_key(stage._replace(version='2'), frame))
+
+    def test_chunks(self):
+        """
+        Chunks should give the rows of a single pass, with the bluff metric
+        normalized over the whole dataset.
+        """
+        df = pd.concat([self.df] * 3, ignore_index=True)
+        expected = run_pipeline(df)
+        chunks = list(iter_pipeline(df, batch_size=2))
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 2, 2, 2, 1])
+        pd.testing.assert_frame_equal(pd.concat(chunks), expected)
+        chunks = iter_pipeline(lambda: (df[start:start + 4] for start in (0, 4, 8)), ['bluff'])
+        pd.testing.assert_frame_equal(pd.concat(chunks)[['aggSB', 'SB Bluff Metric']],
+                                      expected[['aggSB', 'SB Bluff Metric']])
+
+    @unittest.skipIf(dataset.pa is None, "pyarrow is not installed")
+    def test_dataset_chunks(self):
+        """
+        Record batches of a Parquet dataset should give the features of the
+        whole dataset.
+        """
+        root = os.path.join(self.directory.name, 'dataset')
+        write_dataset(self.df, root)
+        self.assertEqual([len(df) for df in iter_dataset(root, ['Game ID'], batch_size=1)], [1, 1, 1])
+        expected = run_pipeline(root)
+        pd.testing.assert_frame_equal(pd.concat(iter_pipeline(root, batch_size=1)), expected)
+
+class TestHand(unittest.TestCase):
+    """
+    This class defines methods for testing the hand.py module.
+    """
+    def test_conversions(self):
+        """
+        Card indices should follow the deck order and convert both ways.
+        """
+        for index, card in enumerate(DECK.tolist()):
+            self.assertEqual(card_index(card), index)
+            self.assertEqual(index_to_int(index), card)
+            self.assertEqual(card_index(index_to_str(index)), index)
+            self.assertEqual(Card.int_to_str(card), index_to_str(index))
+        with self.assertRaises(ValueError):
+            card_index('1h')
+
+    def test_card_sets(self):
+        """
+        Hands and boards should hold distinct cards up to their size.
+        """
+        hand = Hand(['Ah', Card.new('Kd')])
+        self.assertEqual(len(hand), 2)
+        self.assertIn('Kd', hand)
+        self.assertNotIn('Ks', hand)
+        self.assertEqual(repr(hand), "Hand(['Kd', 'Ah'])")
+        self.assertEqual(hand, Hand.from_mask(hand.mask))
+        self.assertEqual(sorted(hand.to_ints()), sorted([Card.new('Ah'), Card.new('Kd')]))
+        self.assertEqual(hand.indices().tolist(), [card_index('Kd'), card_index('Ah')])
+        with self.assertRaises(ValueError):
+            hand.add('2c')
+        with self.assertRaises(ValueError):
+            Board(['2c', '2c'])
+        with self.assertRaises(ValueError):
+            Board.from_mask((1 << 6) - 1)
+        self.assertFalse(hand.isdisjoint(Board(['Ah', '2c', '3c'])))
+
+    def test_evaluate(self):
+        """
+        Evaluating card masks, alone or with a list of cards, should match
+        evaluating lists of cards.
+        """
+        evaluator = Evaluator()
+        rng = random.Random(3)
+        deck = DECK.tolist()
+        for size in (5, 6, 7) * 300:
+            cards = rng.sample(deck, size)
+            expected = evaluator.evaluate(cards[:2], cards[2:])
+            self.assertEqual(evaluator.evaluate(Hand(cards[:2]), Board(cards[2:])), expected)
+            self.assertEqual(evaluator.evaluate(Hand(cards[:2]), cards[2:]), expected)
+            self.assertEqual(evaluator.evaluate(cards[:2], Board(cards[2:])), expected)
+        with self.assertRaises(ValueError):
+            evaluator.evaluate(Hand(['Ah', 'Kd']), Board(['Ah', '2c', '3c']))
+        with self.assertRaises(ValueError):
+            evaluator.evaluate(Hand(['Ah', 'Kd']), [Card.new('Ah'), Card.new('2c'), Card.new('3c')])
+
+class TestBenchmark(unittest.TestCase):
+    """
+    This class defines methods for testing the benchmark.py module.
+    """
+    def test_synthetic_games(self):
+        """
+        The synthetic games should be reproducible and go through every
+        feature stage, with hands shown only on the river.
+        """
+        df = synthetic_games(200, seed=3)
+        pd.testing.assert_frame_equal(df, synthetic_games(200, seed=3))
+        self.assertEqual(list(df['Folded pre']), list(df['Flop'].isnull()))
+        self.assertEqual(list(df['SB cards'].isnull()), list(df['River'].isnull()))
+        result = run_pipeline(df)
+        self.assertEqual(result['SB Handrank'].isnull().sum(), df['River'].isnull().sum())
+
+    def test_baseline(self):
+        """
+        Results should survive a JSON round trip, and a throughput that drops
+        by more than the threshold fraction of the baseline should be flagged.
+        """
+        results = run_benchmarks(['evaluate', 'features'], hands=20, games=100)
+        self.assertIn('evaluate.7', results['results'])
+        self.assertIn('features.rank', results['results'])
+        for result in results['results'].values():
+            self.assertGreater(result['items_per_sec'], 0)
+            self.assertLessEqual(result['p50_us'], result['p99_us'])
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'baseline.json')
+            save_results(results, path)
+            baseline = load_results(path)
+        self.assertEqual(baseline, results)
+        self.assertFalse(any(row[-1] for row in compare_results(results, baseline)))
+
+        # 50% fewer items per second than the baseline, and 20% fewer
+        baseline['results']['evaluate.5']['items_per_sec'] *= 2
+        baseline['results']['evaluate.6']['items_per_sec'] *= 1.25
+        rows = {row[0]: row for row in compare_results(results, baseline, threshold=0.3)}
+        self.assertTrue(rows['evaluate.5'][-1])
+        self.assertAlmostEqual(rows['evaluate.5'][3], -0.5)
+        self.assertFalse(rows['evaluate.6'][-1])
+        self.assertAlmostEqual(rows['evaluate.6'][3], -0.2)
+
 class TestCard(unittest.TestCase):
     """
     This class defines methods for testing the card.py module.
@@ -287,3 +1536,58 @@ class TestCard(unittest.TestCase):
         """
         card = Card.new('Ah')
         self.assertIsNotNone(card)
+
+    def test_new_many(self):
+        """
+        Bulk parsing should match Card.new for every card and keep the shape
+        of the input.
+        """
+        cards = [rank + suit for rank in Card.STR_RANKS for suit in 'shdc']
+        self.assertEqual(Card.new_many(cards).tolist(), [Card.new(card) for card in cards])
+        self.assertEqual(Card.new_many(pd.Series(cards)).dtype, np.int32)
+        self.assertEqual(Card.new_many([['Ah', '2d', '3c'], ['Kc', '7d', '2h']]).shape, (2, 3))
+        self.assertEqual(Card.hole_cards_many(['[ 9c, Qs ]', '[ Ah, Kd ]']).tolist(),
+                         [[Card.new('9c'), Card.new('Qs')], [Card.new('Ah'), Card.new('Kd')]])
+        for malformed in (['Ah', '1h'], ['Ahh'], ['A'], [None], ['Äh']):
+            with self.assertRaises(ValueError):
+                Card.new_many(malformed)
+        for malformed in (['[ 9c Qs ]'], ['[ 9c, Qx ]'], ['[ 9c, Qs ] '], [None]):
+            with self.assertRaises(ValueError):
+                Card.hole_cards_many(malformed)
+
+    def test_canonicalize_isomorphic(self):
+        """
+        Situations that only differ by suit labels should canonicalize to the
+        same cards, and the permutation should map the input onto them.
+        """
+        hole = [Card.new('As'), Card.new('Ks')]
+        board = [Card.new('Qs'), Card.new('7h'), Card.new('2d')]
+        other_hole = [Card.new('Kh'), Card.new('Ah')]
+        other_board = [Card.new('2d'), Card.new('Qh'), Card.new('7s')]
+
+        canonical_hole, canonical_board, permutation = Card.canonicalize(hole, board)
+        self.assertEqual(Card.canonicalize(other_hole, other_board)[:2],
+                         (canonical_hole, canonical_board))
+        self.assertEqual(sorted(Card.permute_suits(hole, permutation), reverse=True), canonical_hole)
+        inverse = {new: old for old, new in permutation.items()}
+        self.assertEqual(sorted(Card.permute_suits(canonical_board, inverse)), sorted(board))
+
+        # offsuit hole cards are a different situation
+        offsuit = [Card.new('As'), Card.new('Kh')]
+        self.assertNotEqual(Card.canonicalize(offsuit, board)[:2], (canonical_hole, canonical_board))
+
+    def test_canonicalize_random_permutations(self):
+        """
+        Any relabelling of the suits should give the same canonical form.
+        """
+        rng = random.Random(586)
+        deck = [Card.new(rank + suit) for rank in Card.STR_RANKS for suit in 'shdc']
+        for _ in range(500):
+            cards = rng.sample(deck, 9)
+            suits = list(Card.INT_SUITS)
+            rng.shuffle(suits)
+            relabel = dict(zip(Card.INT_SUITS, suits))
+            moved = Card.permute_suits(cards, relabel)
+            self.assertEqual(Card.canonicalize(cards[:2], cards[2:7], cards[7:])[:3],
+                             Card.canonicalize(moved[:2], moved[2:7], moved[7:])[:3])
+